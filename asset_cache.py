@@ -0,0 +1,180 @@
+"""
+Process-wide cache of the assets add_brand_overlay draws with.
+
+- Fonts: the font file is looked up once (OVERLAY_FONT, then the usual
+  Arial / DejaVu names) and each size is loaded once.
+- Logos: downloaded once per URL, decoded, converted to RGBA and resized
+  to each target width once. Resized logos live in an in-memory LRU
+  (ASSET_CACHE_SIZE entries) backed by ASSET_CACHE_DIR on disk, which
+  also keeps the original download, so a restart or another worker only
+  re-resizes. Disk entries older than ASSET_CACHE_TTL are refetched.
+  Logos that fail to download or decode are remembered for
+  ASSET_NEGATIVE_TTL seconds instead of being retried on every overlay.
+
+Cached images are shared between callers: paste them, don't modify them.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageFont
+
+import http_client
+
+CACHE_DIR = Path(os.getenv("ASSET_CACHE_DIR", "cache/assets"))
+MAX_ENTRIES = int(os.getenv("ASSET_CACHE_SIZE", "256"))
+DISK_TTL = float(os.getenv("ASSET_CACHE_TTL", str(7 * 24 * 3600)))
+NEGATIVE_TTL = float(os.getenv("ASSET_NEGATIVE_TTL", "300"))
+LOGO_TIMEOUT = float(os.getenv("ASSET_LOGO_TIMEOUT", "5"))
+
+FONT_CANDIDATES = [name for name in (os.getenv("OVERLAY_FONT"), "arial.ttf", "Arial.ttf",
+                                     "DejaVuSans.ttf") if name]
+
+_font_lock = threading.Lock()
+_font_path = None  # resolved font file, False when none is available
+_fonts = {}
+
+
+def font(size: int):
+    """Overlay font at `size` (loaded once per size)."""
+    global _font_path
+    cached = _fonts.get(size)
+    if cached is not None:
+        return cached
+    with _font_lock:
+        if _font_path is None:
+            _font_path = False
+            for name in FONT_CANDIDATES:
+                try:
+                    ImageFont.truetype(name, 12)
+                    _font_path = name
+                    break
+                except OSError:
+                    continue
+            if not _font_path:
+                print("⚠️  No TrueType font found for overlays; using Pillow's default font")
+        loaded = ImageFont.truetype(_font_path, size) if _font_path else ImageFont.load_default()
+        _fonts[size] = loaded
+        return loaded
+
+
+class LogoCache:
+    """(logo_url, width) -> RGBA logo resized to that width; LRU in memory plus a disk tier."""
+
+    def __init__(self, directory: Path = CACHE_DIR, max_entries: int = MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._failed = {}  # logo_url -> time of the failed fetch
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.failures = 0
+
+    def _path(self, url: str, suffix: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}{suffix}"
+
+    def _read_disk(self, path: Path):
+        try:
+            if time.time() - path.stat().st_mtime < DISK_TTL:
+                return path.read_bytes()
+        except OSError:
+            pass
+        return None
+
+    def _write_disk(self, path: Path, data: bytes):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️  Could not write asset cache file {path}: {e}")
+
+    def _remember(self, key, logo):
+        with self._lock:
+            self._entries[key] = logo
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _original(self, url: str) -> bytes:
+        path = self._path(url, ".orig")
+        data = self._read_disk(path)
+        if data is None:
+            response = http_client.get(url, timeout=LOGO_TIMEOUT)
+            response.raise_for_status()
+            data = response.content
+            self.downloads += 1
+            self._write_disk(path, data)
+        return data
+
+    def get(self, url: str, width: int):
+        """The logo at `url` resized to `width` px wide (RGBA), or None if it can't be loaded."""
+        key = (url, width)
+        with self._lock:
+            logo = self._entries.get(key)
+            if logo is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return logo
+            failed_at = self._failed.get(url)
+            if failed_at is not None and time.time() - failed_at < NEGATIVE_TTL:
+                return None
+
+        resized_path = self._path(url, f".w{width}.png")
+        data = self._read_disk(resized_path)
+        if data is not None:
+            try:
+                logo = Image.open(BytesIO(data))
+                logo.load()
+                self.disk_hits += 1
+                self._remember(key, logo)
+                return logo
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable asset cache file {resized_path}: {e}")
+
+        self.misses += 1
+        try:
+            logo = Image.open(BytesIO(self._original(url)))
+            logo = logo.resize((width, max(1, int(logo.height * width / logo.width))), Image.Resampling.LANCZOS)
+            if logo.mode != 'RGBA':
+                logo = logo.convert('RGBA')
+        except Exception as e:
+            self.failures += 1
+            with self._lock:
+                if len(self._failed) > 10_000:
+                    self._failed.clear()
+                self._failed[url] = time.time()
+            print(f"⚠️  Could not load logo {url}: {e}")
+            return None
+
+        buffer = BytesIO()
+        logo.save(buffer, 'PNG')
+        self._write_disk(resized_path, buffer.getvalue())
+        self._remember(key, logo)
+        return logo
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "fonts": len(_fonts),
+        }
+
+
+logos = LogoCache()
@@ -0,0 +1,94 @@
+"""
+Benchmark: hydrated brand loading, old double-LEFT-JOIN query vs BRAND_PROFILE_SQL.
+
+For each palette size N it creates one brand with N colors and N social
+links (inside a transaction that is rolled back), then times both queries
+and reports how many intermediate rows each plan produced. The joined
+query builds N x N rows per brand before DISTINCT; the correlated
+subqueries touch N + N rows, so their cost grows linearly with the palette.
+
+Usage:
+    python bench_brand_queries.py [--sizes 1,4,16,64,256] [--iterations 200]
+"""
+
+import argparse
+import time
+
+import database
+
+OLD_JOIN_SQL = """
+    SELECT b.*,
+           COALESCE(array_agg(DISTINCT jsonb_build_object('name', bc.color_name, 'hex', bc.color_hex))
+           FILTER (WHERE bc.id IS NOT NULL), '{}') as colors,
+           COALESCE(array_agg(DISTINCT jsonb_build_object('platform', bs.platform, 'url', bs.url))
+           FILTER (WHERE bs.id IS NOT NULL), '{}') as social_links
+    FROM brands b
+    LEFT JOIN brand_colors bc ON b.id = bc.brand_id
+    LEFT JOIN brand_social_links bs ON b.id = bs.brand_id
+    WHERE b.id = %s
+    GROUP BY b.id
+"""
+
+NEW_SQL = database.BRAND_PROFILE_SQL + " WHERE b.id = %s"
+
+
+def _max_rows(plan: dict) -> int:
+    """Largest actual row count produced by any node of an EXPLAIN ANALYZE plan."""
+    rows = plan.get("Actual Rows", 0) * plan.get("Actual Loops", 1)
+    return max([rows] + [_max_rows(p) for p in plan.get("Plans", [])])
+
+
+def _time(cur, sql, brand_id, iterations):
+    cur.execute(sql, (brand_id,))  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        cur.execute(sql, (brand_id,))
+        cur.fetchall()
+    elapsed = time.perf_counter() - started
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, (brand_id,))
+    plan = cur.fetchone()[0][0]["Plan"]
+    return elapsed * 1000 / iterations, _max_rows(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,4,16,64,256", help="comma-separated palette sizes")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    conn = database.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("INSERT INTO conversations (conversation_id) VALUES ('bench-brands') ON CONFLICT DO NOTHING")
+        print(f"{'palette':>8} | {'join ms':>9} {'join rows':>10} | {'subquery ms':>11} {'subq rows':>10} | {'speedup':>7}")
+        print("-" * 70)
+        for n in sizes:
+            cur.execute("""
+                INSERT INTO brands (conversation_id, brand_name, domain)
+                VALUES ('bench-brands', %s, %s)
+                RETURNING id
+            """, (f"Bench {n}", f"bench-{n}.example"))
+            brand_id = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO brand_colors (brand_id, color_name, color_hex)
+                SELECT %s, 'color' || k, '#' || lpad(to_hex(k), 6, '0') FROM generate_series(1, %s) k
+            """, (brand_id, n))
+            cur.execute("""
+                INSERT INTO brand_social_links (brand_id, platform, url)
+                SELECT %s, 'platform' || k, 'https://social.example/' || k FROM generate_series(1, %s) k
+            """, (brand_id, n))
+            cur.execute("ANALYZE brand_colors")
+            cur.execute("ANALYZE brand_social_links")
+
+            old_ms, old_rows = _time(cur, OLD_JOIN_SQL, brand_id, args.iterations)
+            new_ms, new_rows = _time(cur, NEW_SQL, brand_id, args.iterations)
+            print(f"{n:>8} | {old_ms:>9.3f} {old_rows:>10,} | {new_ms:>11.3f} {new_rows:>10,} | {old_ms / new_ms:>6.1f}x")
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
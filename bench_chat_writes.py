@@ -0,0 +1,90 @@
+"""
+Benchmark: /chat write path, one call per write vs UnitOfWork vs write-behind.
+
+The old path ran create_conversation, save_message (user), save_message
+(assistant) and save_brand as four separate pool checkouts and commits.
+UnitOfWork buffers the same writes and flushes them in one transaction.
+With the message log running, messages leave the request path entirely
+and are COPYed in batches. All modes run against a throwaway
+conversation that is deleted afterwards.
+
+Usage:
+    python bench_chat_writes.py [--iterations 200] [--brand-every 5]
+"""
+
+import argparse
+import asyncio
+import time
+
+import async_database as adb
+import message_log
+
+CONVERSATION_ID = "bench-chat-writes"
+
+
+def _brand(i: int) -> dict:
+    return {
+        "brand_name": f"Bench {i}",
+        "domain": f"bench-chat-{i % 3}.example",
+        "colors": [{"name": "primary", "hex": f"#{i % 255:02x}3355"}],
+        "social_links": [{"platform": "x", "url": "https://x.com/bench"}],
+    }
+
+
+async def separate_calls(i: int, with_brand: bool):
+    await adb.create_conversation(CONVERSATION_ID)
+    await adb.save_message(CONVERSATION_ID, "user", f"hello {i}")
+    await adb.save_message(CONVERSATION_ID, "assistant", f"reply {i}")
+    if with_brand:
+        await adb.save_brand(CONVERSATION_ID, _brand(i))
+
+
+async def unit_of_work(i: int, with_brand: bool):
+    uow = adb.UnitOfWork(CONVERSATION_ID)
+    uow.add_message("user", f"hello {i}")
+    uow.add_message("assistant", f"reply {i}")
+    if with_brand:
+        uow.add_brand(_brand(i))
+    await uow.commit()
+
+
+async def _time(fn, iterations: int, brand_every: int):
+    started = time.perf_counter()
+    for i in range(iterations):
+        await fn(i, brand_every and i % brand_every == 0)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--brand-every", type=int, default=5, help="save a brand on every Nth request (0 = never)")
+    args = parser.parse_args()
+
+    await adb.init_pool()
+    pool = await adb.get_pool()
+    try:
+        await unit_of_work(0, True)  # warm up the pool and statement cache
+        await separate_calls(0, True)
+        old_ms = await _time(separate_calls, args.iterations, args.brand_every)
+        new_ms = await _time(unit_of_work, args.iterations, args.brand_every)
+        print(f"separate calls: {old_ms:8.3f} ms/request")
+        print(f"unit of work:   {new_ms:8.3f} ms/request  ({old_ms / new_ms:.1f}x)")
+
+        log = message_log.MessageLog()
+        message_log._log = log
+        await log.start(pool)
+        wb_ms = await _time(unit_of_work, args.iterations, args.brand_every)
+        await log.stop()
+        commits = log.batches + (args.iterations // args.brand_every if args.brand_every else 0)
+        print(f"write-behind:   {wb_ms:8.3f} ms/request  ({old_ms / wb_ms:.1f}x), "
+              f"{commits} commits for {args.iterations} requests ({log.flushed} messages)")
+    finally:
+        await pool.execute("DELETE FROM messages WHERE conversation_id = $1", CONVERSATION_ID)
+        await pool.execute("DELETE FROM brands WHERE conversation_id = $1", CONVERSATION_ID)
+        await pool.execute("DELETE FROM conversations WHERE conversation_id = $1", CONVERSATION_ID)
+        await adb.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+"""
+Read-through cache for hydrated brand profiles (brand row + colors + social links).
+
+Two kinds of entries, both in one in-process LRU:
+
+- ("brand", brand_id): one profile, used by the generate/caption routes
+  and /brands/{brand_id}/details
+- ("conversation", conversation_id, limit, after): a page of
+  get_brands_by_conversation, used by /brands/me
+
+Every entry records the version of its conversation at load time.
+Saving brands bumps that version (invalidate()), so older entries stop
+matching and age out of the LRU; a load that raced with a save is never
+served. Writers also send NOTIFY brand_cache '<conversation_id>' in the
+same transaction, and each process LISTENs (start_listener) and bumps the
+version locally, so invalidation reaches every worker. If the listener
+connection drops, the whole cache is dropped until it reconnects.
+
+Cached profiles are shallow copies; treat nested lists as read-only.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("BRAND_CACHE_SIZE", "5000"))
+ENABLED = os.getenv("BRAND_CACHE", "true").lower() in ("1", "true", "yes")
+
+CHANNEL = "brand_cache"
+
+
+class BrandCache:
+    """LRU of brand profiles validated against per-conversation versions."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, enabled: bool = ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (conversation_id, version, value)
+        self._versions = {}  # conversation_id -> sequence number of its last invalidation
+        self._sequence = 0
+        self._epoch = 0  # bumped by clear(); part of every version
+        self._lock = threading.Lock()
+        # While False (no LISTEN connection in a multi-worker setup) nothing is cached
+        self.listening = True
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.notifications = 0
+
+    def _version(self, conversation_id: str):
+        return (self._epoch, self._versions.get(conversation_id, 0))
+
+    def invalidate(self, conversation_id: str):
+        """Bump a conversation's version: its cached brands and pages are no longer served."""
+        if not conversation_id:
+            return
+        with self._lock:
+            if len(self._versions) >= 100_000:
+                self._clear()
+            self._sequence += 1
+            self._versions[conversation_id] = self._sequence
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._versions.clear()
+
+    def _lookup(self, key):
+        if not self.enabled or not self.listening:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            conversation_id, version, value = entry
+            if version != self._version(conversation_id):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _store(self, key, conversation_id: str, version, value):
+        if not self.enabled or not self.listening:
+            return
+        with self._lock:
+            if version != self._version(conversation_id):
+                return  # invalidated while loading
+            self._entries[key] = (conversation_id, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def profile(self, brand_id: int, load):
+        """Brand profile by id; `load()` is awaited on a miss."""
+        key = ("brand", brand_id)
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return dict(cached)
+        self.misses += 1
+        # The owning conversation is only known after loading: skip the store
+        # if it was invalidated after the load started
+        with self._lock:
+            epoch, sequence = self._epoch, self._sequence
+        brand = await load()
+        if brand:
+            conversation_id = brand.get("conversation_id")
+            version = self._version(conversation_id)
+            if version[0] == epoch and version[1] <= sequence:
+                self._store(key, conversation_id, version, brand)
+            return dict(brand)
+        return brand
+
+    async def conversation_brands(self, conversation_id: str, limit, after, load):
+        """A page of a conversation's brands; `load()` is awaited on a miss."""
+        key = ("conversation", conversation_id, limit, after)
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return [dict(b) for b in cached]
+        self.misses += 1
+        with self._lock:
+            version = self._version(conversation_id)
+        brands = await load()
+        self._store(key, conversation_id, version, brands)
+        # Page rows double as single-brand entries
+        for brand in brands:
+            self._store(("brand", brand["id"]), conversation_id, version, brand)
+        return [dict(b) for b in brands]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "listening": self.listening,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "notifications": self.notifications,
+        }
+
+
+cache = BrandCache()
+
+
+def invalidate(conversation_id: str):
+    cache.invalidate(conversation_id)
+
+
+async def notify(conn, conversation_id: str):
+    """Queue a cross-process invalidation on `conn` (asyncpg); sent when its transaction commits."""
+    await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, conversation_id)
+
+
+def _on_notification(connection, pid, channel, payload):
+    cache.notifications += 1
+    cache.invalidate(payload)
+
+
+def _on_terminate(connection):
+    print("⚠️  Brand cache listener disconnected; caching paused")
+    cache.listening = False
+    cache.clear()
+
+
+_listener = None
+_listener_task = None
+
+
+async def start_listener(connect, retry_seconds: float = 5):
+    """LISTEN for invalidations on a dedicated connection from `await connect()`, reconnecting as needed."""
+    global _listener_task
+
+    async def run():
+        global _listener
+        while True:
+            if _listener is None or _listener.is_closed():
+                try:
+                    _listener = await connect()
+                    _listener.add_termination_listener(_on_terminate)
+                    await _listener.add_listener(CHANNEL, _on_notification)
+                    # Anything written while we were not listening may be cached stale
+                    cache.clear()
+                    cache.listening = True
+                except Exception as e:
+                    cache.listening = False
+                    print(f"⚠️  Brand cache listener could not connect: {e}")
+            await asyncio.sleep(retry_seconds)
+
+    cache.listening = False
+    _listener_task = asyncio.create_task(run())
+
+
+async def stop_listener():
+    global _listener, _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        _listener_task = None
+    if _listener is not None and not _listener.is_closed():
+        _listener.remove_termination_listener(_on_terminate)
+        await _listener.close()
+    _listener = None
+
+
+def stats():
+    return cache.stats()
@@ -0,0 +1,273 @@
+"""
+Two-tier cache for Brandfetch lookups.
+
+Tier 1 is an in-process LRU; tier 2 is the brandfetch_cache table
+(migration 7), shared by every worker. Entries are raw responses keyed by
+normalized identifier ("https://www.Nike.com/" -> "nike.com"):
+
+- 200 responses are fresh for BRANDFETCH_CACHE_TTL seconds, 404s for
+  BRANDFETCH_NEGATIVE_TTL (negative caching). Other errors are not cached.
+- For BRANDFETCH_STALE_TTL seconds after that an entry is still served,
+  and a background thread refreshes it (stale-while-revalidate).
+- If a refetch fails, the last cached response is served instead.
+- Concurrent misses for the same identifier share one API call.
+
+stats() returns hit/miss counters; the server exposes them on /health/caches.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from database import get_connection
+
+TTL = float(os.getenv("BRANDFETCH_CACHE_TTL", str(7 * 24 * 3600)))
+NEGATIVE_TTL = float(os.getenv("BRANDFETCH_NEGATIVE_TTL", "3600"))
+STALE_TTL = float(os.getenv("BRANDFETCH_STALE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("BRANDFETCH_CACHE_SIZE", "1000"))
+DB_ENABLED = os.getenv("BRANDFETCH_CACHE_DB", "true").lower() in ("1", "true", "yes")
+
+CACHEABLE_STATUSES = (200, 404)
+
+
+def normalize_identifier(identifier: str) -> str:
+    """Canonical cache key: lowercase, no scheme, www., path or trailing dot."""
+    value = (identifier or "").strip().lower()
+    value = re.sub(r"^[a-z]+://", "", value)
+    value = value.split("/", 1)[0].split("?", 1)[0].rstrip(".")
+    if value.startswith("www."):
+        value = value[4:]
+    return value
+
+
+class BrandfetchCache:
+    """LRU + Postgres cache of (status_code, body) responses."""
+
+    def __init__(self, ttl: float = TTL, negative_ttl: float = NEGATIVE_TTL, stale_ttl: float = STALE_TTL,
+                 max_entries: int = MAX_ENTRIES, db: bool = DB_ENABLED):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.db = db
+        self._entries = OrderedDict()  # identifier -> (status_code, body, fetched_at)
+        self._lock = threading.Lock()
+        self._inflight = {}  # identifier -> threading.Event
+        self._refreshing = set()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.fetch_errors = 0
+        self.db_errors = 0
+
+    def _fresh_for(self, status_code: int) -> float:
+        return self.ttl if status_code == 200 else self.negative_ttl
+
+    def _age_state(self, entry) -> str:
+        """'fresh', 'stale' (serve and refresh) or 'expired'."""
+        status_code, _, fetched_at = entry
+        age = time.time() - fetched_at
+        fresh_for = self._fresh_for(status_code)
+        if age < fresh_for:
+            return "fresh"
+        if age < fresh_for + self.stale_ttl:
+            return "stale"
+        return "expired"
+
+    def _remember(self, identifier: str, entry):
+        with self._lock:
+            self._entries[identifier] = entry
+            self._entries.move_to_end(identifier)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _memory_get(self, identifier: str):
+        with self._lock:
+            entry = self._entries.get(identifier)
+            if entry is not None:
+                self._entries.move_to_end(identifier)
+            return entry
+
+    def _db_get(self, identifier: str):
+        if not self.db:
+            return None
+        conn = None
+        try:
+            conn = get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT status_code, body, EXTRACT(EPOCH FROM now()::timestamp - fetched_at)
+                FROM brandfetch_cache
+                WHERE identifier = %s
+            """, (identifier,))
+            row = cur.fetchone()
+            cur.close()
+            conn.rollback()
+            if row is None:
+                return None
+            status_code, body, age = row
+            return (status_code, body, time.time() - float(age))
+        except Exception as e:
+            self.db_errors += 1
+            print(f"⚠️  Brandfetch cache read failed for {identifier}: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _db_put(self, identifier: str, status_code: int, body: str):
+        if not self.db:
+            return
+        conn = None
+        try:
+            conn = get_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO brandfetch_cache (identifier, status_code, body, fetched_at)
+                VALUES (%s, %s, %s, now())
+                ON CONFLICT (identifier) DO UPDATE SET
+                    status_code = EXCLUDED.status_code,
+                    body = EXCLUDED.body,
+                    fetched_at = EXCLUDED.fetched_at
+            """, (identifier, status_code, body))
+            conn.commit()
+            cur.close()
+        except Exception as e:
+            self.db_errors += 1
+            print(f"⚠️  Brandfetch cache write failed for {identifier}: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _fetch(self, identifier: str, fetch):
+        """Call fetch(identifier) -> (status_code, body) and cache cacheable answers."""
+        status_code, body = fetch(identifier)
+        entry = (status_code, body, time.time())
+        if status_code in CACHEABLE_STATUSES:
+            self._remember(identifier, entry)
+            self._db_put(identifier, status_code, body)
+        else:
+            self.fetch_errors += 1
+        return entry
+
+    def _refresh_in_background(self, identifier: str, fetch):
+        with self._lock:
+            if identifier in self._refreshing:
+                return
+            self._refreshing.add(identifier)
+
+        def run():
+            try:
+                self._fetch(identifier, fetch)
+                self.refreshes += 1
+            except Exception as e:
+                self.fetch_errors += 1
+                print(f"⚠️  Brandfetch refresh failed for {identifier}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(identifier)
+
+        threading.Thread(target=run, name=f"brandfetch-refresh-{identifier}", daemon=True).start()
+
+    def _serve(self, identifier: str, entry, fetch):
+        state = self._age_state(entry)
+        if state == "expired":
+            return None
+        if state == "stale":
+            self.stale_hits += 1
+            self._refresh_in_background(identifier, fetch)
+        if entry[0] != 200:
+            self.negative_hits += 1
+        return entry[0], entry[1]
+
+    def get(self, identifier: str, fetch):
+        """(status_code, body) for `identifier`, calling fetch(normalized_identifier) on a miss.
+
+        fetch returns (status_code, body) and may raise; errors are only
+        raised when there is no cached response at all to fall back on.
+        """
+        identifier = normalize_identifier(identifier)
+
+        entry = self._memory_get(identifier)
+        if entry is not None:
+            served = self._serve(identifier, entry, fetch)
+            if served is not None:
+                self.memory_hits += 1
+                return served
+
+        stored = self._db_get(identifier)
+        if stored is not None:
+            served = self._serve(identifier, stored, fetch)
+            if served is not None:
+                self.db_hits += 1
+                self._remember(identifier, stored)
+                return served
+        entry = entry or stored
+
+        # Single flight: the first caller fetches, concurrent callers wait for it
+        with self._lock:
+            event = self._inflight.get(identifier)
+            leader = event is None
+            if leader:
+                event = self._inflight[identifier] = threading.Event()
+        if not leader:
+            event.wait(timeout=60)
+            cached = self._memory_get(identifier)
+            if cached is not None and self._age_state(cached) != "expired":
+                self.memory_hits += 1
+                return cached[0], cached[1]
+
+        self.misses += 1
+        try:
+            status_code, body, _ = self._fetch(identifier, fetch)
+            if status_code not in CACHEABLE_STATUSES and entry is not None:
+                return entry[0], entry[1]
+            return status_code, body
+        except Exception:
+            self.fetch_errors += 1
+            if entry is not None:
+                return entry[0], entry[1]
+            raise
+        finally:
+            if leader:
+                with self._lock:
+                    self._inflight.pop(identifier, None)
+                event.set()
+
+    def invalidate(self, identifier: str):
+        identifier = normalize_identifier(identifier)
+        with self._lock:
+            self._entries.pop(identifier, None)
+        if self.db:
+            conn = get_connection()
+            try:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM brandfetch_cache WHERE identifier = %s", (identifier,))
+                conn.commit()
+                cur.close()
+            finally:
+                conn.close()
+
+    def stats(self):
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else None,
+            "negative_hits": self.negative_hits,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "fetch_errors": self.fetch_errors,
+            "db_errors": self.db_errors,
+        }
+
+
+cache = BrandfetchCache()
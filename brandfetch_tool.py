@@ -1,27 +1,37 @@
 import requests
 from crewai.tools import tool
 
+import http_client
+from brandfetch_cache import cache
+
 
 class BrandfetchTool:
     def __init__(self, api_key: str):
         self.api_key = api_key
-    
+
+    def fetch(self, identifier: str):
+        """Uncached Brandfetch API call. Returns (status_code, body)."""
+        url = f"https://api.brandfetch.io/v2/brands/{identifier}"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        response = http_client.get(url, headers=headers, timeout=15)
+        return response.status_code, response.text
+
     def get_tool(self):
-        api_key = self.api_key
-        
+        fetch = self.fetch
+
         @tool("Brandfetch")
         def brandfetch_tool(website: str) -> str:
             """Fetches brand data including logos, colors, fonts, and firmographic information for any company using their website domain, stock ticker, ISIN, or crypto symbol. Examples: 'nike.com', 'NKE', 'BTC'"""
-            url = f"https://api.brandfetch.io/v2/brands/{website}"
-            headers = {
-                "Authorization": f"Bearer {api_key}"
-            }
-            
             try:
-                response = requests.get(url, headers=headers)
-                response.raise_for_status()
-                return response.text
+                status_code, body = cache.get(website, fetch)
+                if status_code == 404:
+                    return f"Error fetching brand data: no brand found for {website}"
+                if status_code >= 400:
+                    return f"Error fetching brand data: HTTP {status_code}"
+                return body
             except requests.exceptions.RequestException as e:
                 return f"Error fetching brand data: {str(e)}"
-        
+
         return brandfetch_tool
@@ -0,0 +1,237 @@
+"""
+Query-plan regression check for the hot lookup paths.
+
+Seeds a large synthetic dataset inside a single transaction, runs ANALYZE,
+then calls the real functions from database.py with a connection that
+EXPLAINs each SELECT instead of running it. Fails (exit code 1) if any of
+them falls back to a sequential scan on one of the big tables. Everything
+is rolled back at the end, so it is safe to point at a dev database that
+already has the migrations applied (python migrations.py).
+
+Usage:
+    python check_query_plans.py [--conversations 20000]
+"""
+
+import argparse
+import sys
+
+import database
+from partitions import parent_table
+
+HOT_TABLES = {
+    "users", "conversations", "brands", "brand_colors", "brand_social_links",
+    "generated_content", "scheduled_posts", "messages",
+}
+
+PREFIX = "plancheck-"
+
+
+def seed(cur, conversations: int):
+    """Insert a large dataset shaped like production (prefix keeps it apart from real rows)."""
+    n = conversations
+    statements = [
+        ("conversations", """
+            INSERT INTO conversations (conversation_id)
+            SELECT %(p)s || g FROM generate_series(1, %(n)s) g
+        """),
+        ("users", """
+            INSERT INTO users (username, password_hash)
+            SELECT %(p)s || g, 'x' FROM generate_series(1, %(n)s) g
+        """),
+        ("brands", """
+            INSERT INTO brands (conversation_id, brand_name, domain, created_at, updated_at)
+            SELECT %(p)s || (g %% %(n)s + 1), 'Brand ' || g, %(p)s || g || '.com',
+                   now() - g * interval '1 minute', now() - g * interval '1 minute'
+            FROM generate_series(1, %(n)s * 3) g
+        """),
+        ("brand_colors", """
+            INSERT INTO brand_colors (brand_id, color_name, color_hex)
+            SELECT b.id, 'color' || k, '#' || lpad(to_hex(k * 4000), 6, '0')
+            FROM brands b, generate_series(1, 6) k
+            WHERE b.domain LIKE %(like)s
+        """),
+        ("brand_social_links", """
+            INSERT INTO brand_social_links (brand_id, platform, url)
+            SELECT b.id, 'platform' || k, 'https://social.example/' || b.id || '/' || k
+            FROM brands b, generate_series(1, 4) k
+            WHERE b.domain LIKE %(like)s
+        """),
+        ("generated_content", """
+            INSERT INTO generated_content (brand_id, conversation_id, content_type, generated_image_url,
+                                           prompt_used, status, created_at, updated_at)
+            SELECT b.id, b.conversation_id, 'ugc_image', 'https://img.example/' || b.id || '/' || k,
+                   'prompt', 'completed', now() - (b.id * 4 + k) * interval '1 minute', now()
+            FROM brands b, generate_series(1, 4) k
+            WHERE b.domain LIKE %(like)s
+        """),
+        ("scheduled_posts", """
+            INSERT INTO scheduled_posts (content_id, conversation_id, caption, scheduled_time, status,
+                                         created_at, updated_at)
+            SELECT gc.id, gc.conversation_id, 'caption',
+                   CASE WHEN gc.id %% 100 = 0
+                        THEN now() + ((gc.id %% 5000) - 3) * interval '1 minute'  -- a handful are due
+                        ELSE gc.created_at END,
+                   CASE WHEN gc.id %% 100 = 0 THEN 'scheduled' ELSE 'posted' END,
+                   gc.created_at, gc.created_at
+            FROM generated_content gc
+            WHERE gc.conversation_id LIKE %(like)s
+        """),
+        ("messages", """
+            INSERT INTO messages (conversation_id, role, content, created_at)
+            SELECT %(p)s || (g %% %(n)s + 1), CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+                   'message ' || g, now() - g * interval '1 second'
+            FROM generate_series(1, %(n)s * 25) g
+        """),
+    ]
+    params = {"p": PREFIX, "n": n, "like": PREFIX + "%"}
+    for table, sql in statements:
+        cur.execute(sql, params)
+        print(f"  seeded {cur.rowcount:>9,} rows into {table}")
+    for table in sorted(HOT_TABLES):
+        cur.execute(f"ANALYZE {table}")
+
+
+class _ExplainCursor:
+    """Cursor stand-in: EXPLAINs SELECTs, skips writes, returns no rows."""
+
+    def __init__(self, real_cursor, plans: list):
+        self._cur = real_cursor
+        self._plans = plans
+
+    def execute(self, sql, params=None):
+        head = sql.lstrip().split(None, 1)[0].upper()
+        if head not in ("SELECT", "WITH"):
+            return
+        self._cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        self._plans.append((sql, self._cur.fetchone()[0][0]["Plan"]))
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        self._cur.close()
+
+
+class _ExplainConnection:
+    """Connection stand-in handed to database.py functions during the check."""
+
+    def __init__(self, real_conn, plans: list):
+        self._conn = real_conn
+        self._plans = plans
+
+    def cursor(self, cursor_factory=None):
+        return _ExplainCursor(self._conn.cursor(), self._plans)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _big_relations(cur):
+    """Hot tables, and their monthly partitions that hold data (seq scans on empty ones are fine)."""
+    cur.execute("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p')")
+    return {
+        name for name, rows in cur.fetchall()
+        if name in HOT_TABLES or (parent_table(name) in HOT_TABLES and rows >= 1000)
+    }
+
+
+def _seq_scans(plan: dict, big: set):
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in big:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child, big)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20000,
+                        help="number of synthetic users/conversations to seed (default 20000)")
+    args = parser.parse_args()
+
+    conn = database.get_connection()
+    cur = conn.cursor()
+    failures = []
+
+    try:
+        print(f"🌱 Seeding synthetic dataset ({args.conversations:,} conversations)...")
+        seed(cur, args.conversations)
+
+        conversation_id = f"{PREFIX}{args.conversations // 2}"
+        cur.execute("SELECT id, domain FROM brands WHERE conversation_id = %s LIMIT 1", (conversation_id,))
+        brand_id, domain = cur.fetchone()
+        cur.execute("SELECT now() - interval '1 day', 2147483647")
+        after = tuple(cur.fetchone())  # a keyset deep into the data, as a later page would send
+        big = _big_relations(cur)
+
+        checks = [
+            ("get_conversation_history", lambda: database.get_conversation_history(conversation_id)),
+            ("get_conversation_history (scroll-back)",
+             lambda: database.get_conversation_history(conversation_id, 51, before=after)),
+            ("get_conversation_history (delta)",
+             lambda: database.get_conversation_history(conversation_id, 51, after=after)),
+            ("get_brands_by_conversation", lambda: database.get_brands_by_conversation(conversation_id)),
+            ("get_brand_by_domain", lambda: database.get_brand_by_domain(domain)),
+            ("get_generated_content_by_brand", lambda: database.get_generated_content_by_brand(brand_id)),
+            ("get_generated_content_by_conversation", lambda: database.get_generated_content_by_conversation(conversation_id)),
+            ("get_scheduled_posts_by_conversation", lambda: database.get_scheduled_posts_by_conversation(conversation_id)),
+            ("get_all_brands (page)", lambda: database.get_all_brands(51, after)),
+            ("get_brands_by_conversation (page)", lambda: database.get_brands_by_conversation(conversation_id, 51, after)),
+            ("get_generated_content_by_brand (page)", lambda: database.get_generated_content_by_brand(brand_id, 51, after)),
+            ("get_generated_content_by_conversation (page)",
+             lambda: database.get_generated_content_by_conversation(conversation_id, 51, after)),
+            ("get_scheduled_posts_by_conversation (page)",
+             lambda: database.get_scheduled_posts_by_conversation(conversation_id, 51, after)),
+            ("get_due_scheduled_posts", database.get_due_scheduled_posts),
+            ("get_video_task_by_provider_id", lambda: database.get_video_task_by_provider_id("plancheck-task")),
+            ("get_generating_video_tasks", database.get_generating_video_tasks),
+            ("get_user_by_username", lambda: database.get_user_by_username(conversation_id.upper())),
+        ]
+
+        original_get_connection = database.get_connection
+        try:
+            for name, call in checks:
+                plans = []
+                database.get_connection = lambda: _ExplainConnection(conn, plans)
+                call()
+                if not plans:
+                    failures.append(name)
+                    print(f"❌ {name}: no SELECT captured")
+                    continue
+                scans = sorted({t for _, plan in plans for t in _seq_scans(plan, big)})
+                if scans:
+                    failures.append(name)
+                    print(f"❌ {name}: sequential scan on {', '.join(scans)}")
+                else:
+                    cost = max(plan["Total Cost"] for _, plan in plans)
+                    print(f"✅ {name}: index plan (cost {cost:,.1f})")
+        finally:
+            database.get_connection = original_get_connection
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    if failures:
+        print(f"\n❌ {len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} fell back to sequential scans. "
+              "Run `python migrations.py` and check the indexes.")
+        sys.exit(1)
+    print("\n✅ All hot queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
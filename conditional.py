@@ -0,0 +1,62 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for the dashboard list endpoints.
+
+A list's version is a fingerprint of the tables it reads: (row count,
+max(updated_at)) per table for the conversation, from an index-only scan
+(get_list_version). Every insert or update moves max(updated_at) and every
+delete moves the count, so an unchanged fingerprint means an unchanged
+list. The fingerprint is read before the list itself, so the ETag sent
+with a page is never newer than the page.
+
+A request whose If-None-Match (or, without one, If-Modified-Since) still
+matches gets a 304 before the list query runs.
+"""
+
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# Tables each list reads (joined tables change the rows too)
+LIST_TABLES = {
+    "brands": ("brands",),
+    "generated_content": ("generated_content", "brands"),
+    "scheduled_posts": ("scheduled_posts", "generated_content", "brands"),
+}
+
+
+def validators(versions, *params) -> dict:
+    """ETag / Last-Modified headers for `versions` [(table, count, max_updated_at)] and the request `params`."""
+    key = repr((params, [(table, count, updated.isoformat() if updated else None)
+                         for table, count, updated in versions]))
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:32] + '"'
+    headers = {
+        "ETag": etag,
+        # Revalidate on every use; never stored by shared caches
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    last_modified = max((updated for _, _, updated in versions if updated), default=None)
+    if last_modified is not None:
+        # updated_at is a naive server-clock timestamp; it is only compared with itself, so label it GMT
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def is_current(request_headers, headers: dict) -> bool:
+    """True if the client's cached copy (If-None-Match / If-Modified-Since) matches `headers`."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Last-Modified has whole-second precision: a change later in the same
+        # second would be missed, so only a strictly older Last-Modified matches.
+        # Deletes do not move Last-Modified either; clients should prefer the ETag.
+        return parsedate_to_datetime(last_modified) < since
+    return False
@@ -0,0 +1,326 @@
+"""
+PostgreSQL connection pool for the sync (psycopg2) data layer.
+
+Connections are borrowed with getconn() and handed back when the caller
+calls .close() on the returned PooledConnection, so existing code that
+does `conn = get_connection() ... conn.close()` keeps working unchanged.
+`with get_connection() as conn:` commits on a clean exit and rolls back
+on an exception, like a plain psycopg2 connection, then returns it.
+
+The pool is bounded (DB_POOL_MAX_SIZE), recycles connections older than
+DB_POOL_MAX_LIFETIME seconds, health-checks connections that have been idle
+longer than DB_POOL_HEALTH_CHECK_INTERVAL seconds, and keeps counters that
+describe how saturated it is (see stats()).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection became available within acquire_timeout."""
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Proxy around a pooled psycopg2 connection. close() returns it to the pool."""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self):
+        if self._entry is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return self._entry.conn
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.raw, name, value)
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    @property
+    def closed(self):
+        return self._entry is None or self._entry.conn.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._entry is not None and not self._entry.conn.closed:
+                if exc_type is None:
+                    self._entry.conn.commit()
+                else:
+                    try:
+                        self._entry.conn.rollback()
+                    except psycopg2.Error:
+                        pass
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Safety net for code paths that forget to close: never leak a slot.
+        if getattr(self, "_entry", None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe psycopg2 connection pool."""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10,
+                 max_lifetime: float = 1800.0, max_idle: float = 300.0,
+                 health_check_interval: float = 30.0, acquire_timeout: float = 10.0,
+                 connect_kwargs: dict = None):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("pool requires 0 <= min_size <= max_size and max_size >= 1")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = connect_kwargs or {}
+
+        self._idle = deque()
+        self._size = 0  # open connections, idle + in use
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        # Saturation metrics
+        self._acquired = 0
+        self._created = 0
+        self._discarded = 0
+        self._failed_health_checks = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._peak_in_use = 0
+
+    # --- public API ---
+
+    def getconn(self, timeout: float = None) -> PooledConnection:
+        """Borrow a connection, waiting up to `timeout` seconds when the pool is saturated."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"no database connection available within {timeout:.1f}s "
+                            f"(pool size {self.max_size} saturated)"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()  # LIFO keeps the hot connections warm
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    entry = _PoolEntry(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(entry):
+                self._discard(entry)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._acquired += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+                self._peak_in_use = max(self._peak_in_use, self._size - len(self._idle))
+            return PooledConnection(self, entry)
+
+    def stats(self) -> dict:
+        """Current size and saturation counters."""
+        with self._cond:
+            idle = len(self._idle)
+            in_use = self._size - idle
+            return {
+                "max_size": self.max_size,
+                "min_size": self.min_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": in_use,
+                "waiting": self._waiting,
+                "saturation": round(in_use / self.max_size, 3),
+                "peak_in_use": self._peak_in_use,
+                "acquired_total": self._acquired,
+                "created_total": self._created,
+                "discarded_total": self._discarded,
+                "failed_health_checks": self._failed_health_checks,
+                "timeouts_total": self._timeouts,
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / self._acquired, 3) if self._acquired else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+    def prefill(self):
+        """Open connections up to min_size."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = _PoolEntry(self._connect())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.appendleft(entry)
+                self._cond.notify()
+
+    def prune(self):
+        """Close idle connections past max_idle/max_lifetime, keeping min_size open."""
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            keep = deque()
+            while self._idle:
+                entry = self._idle.popleft()
+                expired = now - entry.created_at > self.max_lifetime
+                idle_too_long = now - entry.last_used > self.max_idle
+                if expired or (idle_too_long and self._size - len(stale) > self.min_size):
+                    stale.append(entry)
+                else:
+                    keep.append(entry)
+            self._idle = keep
+        for entry in stale:
+            self._discard(entry)
+
+    def close(self):
+        """Close every idle connection and refuse new borrows. In-use connections close on return."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    # --- internals ---
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_usable(self, entry) -> bool:
+        conn = entry.conn
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if now - entry.created_at > self.max_lifetime:
+            return False
+        if now - entry.last_used > self.health_check_interval:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                with self._cond:
+                    self._failed_health_checks += 1
+                return False
+        return True
+
+    def _reset(self, conn) -> bool:
+        """Return a connection to a clean session state; False if it cannot be reused."""
+        if conn.closed:
+            return False
+        try:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, entry):
+        entry.last_used = time.monotonic()
+        reusable = self._reset(entry.conn) and not self._closed
+        if reusable and entry.last_used - entry.created_at <= self.max_lifetime:
+            with self._cond:
+                if not self._closed:
+                    self._idle.append(entry)
+                    self._cond.notify()
+                    return
+        self._discard(entry)
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+
+def pool_from_env(dsn: str, prefix: str = "DB_POOL") -> ConnectionPool:
+    """Build a pool configured from <prefix>_* environment variables."""
+    return ConnectionPool(
+        dsn,
+        min_size=int(os.getenv(f"{prefix}_MIN_SIZE", "1")),
+        max_size=int(os.getenv(f"{prefix}_MAX_SIZE", "10")),
+        max_lifetime=float(os.getenv(f"{prefix}_MAX_LIFETIME", "1800")),
+        max_idle=float(os.getenv(f"{prefix}_MAX_IDLE", "300")),
+        health_check_interval=float(os.getenv(f"{prefix}_HEALTH_CHECK_INTERVAL", "30")),
+        acquire_timeout=float(os.getenv(f"{prefix}_ACQUIRE_TIMEOUT", "10")),
+    )
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the Kie.ai endpoints this app uses, for trying the
+generation flows and callbacks without an API key or credits.
+
+    python fake_kie.py --port 8900 --delay 3
+
+and start the API with
+
+    KIE_API_BASE=http://127.0.0.1:8900 KIE_API_KEY=fake
+    KIE_CALLBACK_URL=http://127.0.0.1:8000 KIE_CALLBACK_SECRET=dev-secret
+
+Tasks finish `--delay` seconds after they are created. Their status can
+be polled like the real API, and when the task was created with a
+callBackUrl the result is POSTed there (in Kie.ai's callback format) as
+soon as it is ready; --no-callbacks leaves only polling. A prompt
+containing "[fail]" (e.g. a brand named "[fail]") makes the task fail.
+--status-errors N makes the status endpoints answer 503 for the first N
+seconds after startup, like a Kie.ai outage.
+Result URLs point at placeholder files served by this process.
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from io import BytesIO
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from PIL import Image
+
+import http_client
+
+app = FastAPI(title="Fake Kie.ai")
+
+settings = {"delay": 3.0, "callbacks": True, "status_errors_until": 0.0}
+tasks = {}  # task_id -> task
+_lock = threading.Lock()
+
+
+def _new_task(kind: str, model: str, prompt: str, callback_url: str, base_url: str) -> str:
+    task_id = f"fake_{kind}_{uuid.uuid4().hex[:12]}"
+    suffix = "png" if kind == "image" else "mp4"
+    with _lock:
+        tasks[task_id] = {
+            "kind": kind,
+            "model": model,
+            "created": time.time(),
+            "fail": "[fail]" in (prompt or ""),
+            "url": f"{base_url}files/{task_id}.{suffix}",
+        }
+    print(f"📥 Fake Kie.ai {kind} task {task_id} ({model})")
+    if callback_url and settings["callbacks"]:
+        threading.Timer(settings["delay"], _fire_callback, args=(task_id, callback_url)).start()
+    return task_id
+
+
+def _done(task: dict) -> bool:
+    return time.time() - task["created"] >= settings["delay"]
+
+
+def _image_record(task_id: str, task: dict) -> dict:
+    record = {"taskId": task_id, "model": task["model"], "state": "waiting", "resultJson": "",
+              "failCode": None, "failMsg": None, "costTime": None}
+    if _done(task):
+        if task["fail"]:
+            record.update(state="fail", failCode="500", failMsg="Fake failure requested by the prompt")
+        else:
+            record.update(state="success", resultJson=json.dumps({"resultUrls": [task["url"]]}),
+                          costTime=int(settings["delay"] * 1000))
+    return record
+
+
+def _video_callback_body(task_id: str, task: dict) -> dict:
+    if task["fail"]:
+        return {"code": 501, "msg": "Fake failure requested by the prompt", "data": {"taskId": task_id}}
+    return {"code": 200, "msg": "Veo3 video generated successfully.",
+            "data": {"taskId": task_id, "info": {"resultUrls": [task["url"]], "originUrls": [],
+                                                  "resolution": "720p"}, "fallbackFlag": False}}
+
+
+def _fire_callback(task_id: str, callback_url: str):
+    task = tasks[task_id]
+    if task["kind"] == "image":
+        body = {"code": 200, "msg": "success", "data": _image_record(task_id, task)}
+    else:
+        body = _video_callback_body(task_id, task)
+    for attempt in range(3):
+        try:
+            response = http_client.post(callback_url, json=body, timeout=10)
+            print(f"✅ Callback for {task_id} delivered ({response.status_code})")
+            return
+        except Exception as e:
+            print(f"⚠️  Callback for {task_id} failed (attempt {attempt + 1}): {e}")
+            time.sleep(1)
+
+
+@app.post("/api/v1/jobs/createTask")
+async def create_task(request: Request):
+    body = await request.json()
+    task_id = _new_task("image", body.get("model"), (body.get("input") or {}).get("prompt"),
+                        body.get("callBackUrl"), str(request.base_url))
+    return {"code": 200, "msg": "success", "data": {"taskId": task_id}}
+
+
+def _outage():
+    if time.time() < settings["status_errors_until"]:
+        return Response('{"code": 503, "msg": "Fake outage"}', status_code=503, media_type="application/json")
+    return None
+
+
+@app.get("/api/v1/jobs/recordInfo")
+async def record_info(taskId: str):
+    outage = _outage()
+    if outage is not None:
+        return outage
+    task = tasks.get(taskId)
+    if task is None or task["kind"] != "image":
+        return {"code": 404, "msg": "Task not found", "data": None}
+    return {"code": 200, "msg": "success", "data": _image_record(taskId, task)}
+
+
+@app.post("/api/v1/veo/generate")
+async def veo_generate(request: Request):
+    body = await request.json()
+    task_id = _new_task("video", body.get("model"), body.get("prompt"), body.get("callBackUrl"),
+                        str(request.base_url))
+    return {"code": 200, "msg": "success", "data": {"taskId": task_id}}
+
+
+@app.get("/api/v1/veo/record-info")
+async def veo_record_info(taskId: str):
+    outage = _outage()
+    if outage is not None:
+        return outage
+    task = tasks.get(taskId)
+    if task is None or task["kind"] != "video":
+        return {"code": 404, "msg": "Task not found", "data": None}
+    data = {"taskId": taskId, "successFlag": 0, "response": None, "errorCode": None, "errorMessage": None}
+    if _done(task):
+        if task["fail"]:
+            data.update(successFlag=2, errorCode=501, errorMessage="Fake failure requested by the prompt")
+        else:
+            data.update(successFlag=1, response={"resultUrls": [task["url"]], "resolution": "720p"})
+    return {"code": 200, "msg": "success", "data": data}
+
+
+@app.get("/files/{name}")
+async def placeholder_file(name: str):
+    if name.endswith(".mp4"):
+        return Response(b"\x00\x00\x00\x18ftypmp42", media_type="video/mp4")
+    buffer = BytesIO()
+    Image.new("RGB", (512, 512), (255, 107, 0)).save(buffer, "PNG")
+    return Response(buffer.getvalue(), media_type="image/png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=3.0, help="seconds until a task finishes")
+    parser.add_argument("--no-callbacks", action="store_true", help="never call callBackUrl")
+    parser.add_argument("--status-errors", type=float, default=0.0,
+                        help="seconds after startup during which status checks return 503")
+    args = parser.parse_args()
+    settings.update(delay=args.delay, callbacks=not args.no_callbacks,
+                    status_errors_until=time.time() + args.status_errors)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
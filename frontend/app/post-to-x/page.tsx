@@ -4,6 +4,7 @@ import { useState, useEffect, useRef } from "react";
 import { useSearchParams, useRouter } from "next/navigation";
 import { toast } from "sonner";
 import { useAuth } from "@/contexts/AuthContext";
+import { fetchAllPages } from "@/lib/fetchAllPages";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -69,11 +70,8 @@ export default function PostToXPage() {
   const fetchContentDetails = async () => {
     if (!contentId) return;
     try {
-      const response = await fetch(`${API_BASE}/generated-content/me`, {
-        headers: authHeader(),
-      });
-      const data = await response.json();
-      const item = data.content?.find((c: any) => c.id === parseInt(contentId, 10));
+      const items = await fetchAllPages<ContentData>(`${API_BASE}/generated-content/me`, "content", authHeader());
+      const item = items.find((c) => c.id === parseInt(contentId, 10));
       if (item) {
         setContent(item);
       }
@@ -5,6 +5,7 @@ import Image from "next/image";
 import { useRouter } from "next/navigation";
 import { toast } from "sonner";
 import { useAuth } from "@/contexts/AuthContext";
+import { fetchAllPages } from "@/lib/fetchAllPages";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -40,11 +41,7 @@ export default function ContentCreatorDashboard({
 
   const fetchBrands = async () => {
     try {
-      const response = await fetch(`${API_BASE}/brands/me`, {
-        headers: authHeader(),
-      });
-      const data = await response.json();
-      setBrands(data.brands || []);
+      setBrands(await fetchAllPages<Brand>(`${API_BASE}/brands/me`, "brands", authHeader()));
     } catch (error) {
       console.error("Error fetching brands:", error);
     } finally {
@@ -183,6 +180,22 @@ function BrandContentCreator({
     }
   };
 
+  const waitForJob = async (jobId: number) => {
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const response = await fetch(`${API_BASE}/jobs/${jobId}`, {
+        headers: authHeader(),
+      });
+      const job = await response.json().catch(() => ({}));
+      if (!response.ok) {
+        return { status: "failed", error: job.detail };
+      }
+      if (job.status === "completed" || job.status === "failed") {
+        return job;
+      }
+    }
+  };
+
   const handleGenerateContent = async () => {
     if (!productImage) {
       toast.warning("Please upload a product image first");
@@ -202,7 +215,13 @@ function BrandContentCreator({
         body: formData,
       });
 
-      const data = await response.json().catch(() => ({}));
+      let data = await response.json().catch(() => ({}));
+
+      // Queued as a background job: poll until it finishes
+      if (response.status === 202 && data.job_id) {
+        const job = await waitForJob(data.job_id);
+        data = job.status === "completed" ? job.result : { detail: job.error || "Failed to generate content" };
+      }
 
       if (response.ok && data.success) {
         setGeneratedImage(data.generated_image_url);
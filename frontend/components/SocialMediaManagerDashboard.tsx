@@ -3,6 +3,7 @@
 import { useState, useEffect, useRef, useCallback } from "react";
 import { useRouter } from "next/navigation";
 import { useAuth } from "@/contexts/AuthContext";
+import { fetchAllPages } from "@/lib/fetchAllPages";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -160,11 +161,7 @@ export default function SocialMediaManagerDashboard({
 
   const fetchGeneratedContent = async () => {
     try {
-      const response = await fetch(`${API_BASE}/generated-content/me`, {
-        headers: authHeader(),
-      });
-      const data = await response.json();
-      setContent(data.content || []);
+      setContent(await fetchAllPages<GeneratedContent>(`${API_BASE}/generated-content/me`, "content", authHeader()));
     } catch (error) {
       console.error("Error fetching generated content:", error);
     } finally {
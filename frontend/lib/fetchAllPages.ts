@@ -0,0 +1,27 @@
+/**
+ * Fetch every page of a cursor-paginated list endpoint (/brands/me,
+ * /generated-content/me, /scheduled-posts/me, ...) and return the items
+ * under `key` from all pages, following `next_cursor` until it is null.
+ */
+export async function fetchAllPages<T = any>(
+  url: string,
+  key: string,
+  headers: HeadersInit = {},
+  pageSize = 200
+): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ limit: String(pageSize) });
+    if (cursor) params.set("cursor", cursor);
+    const separator = url.includes("?") ? "&" : "?";
+    const response = await fetch(`${url}${separator}${params}`, { headers });
+    if (!response.ok) {
+      throw new Error(`${url} returned ${response.status}`);
+    }
+    const data = await response.json();
+    items.push(...(data[key] || []));
+    cursor = data.next_cursor || null;
+  } while (cursor);
+  return items;
+}
@@ -0,0 +1,70 @@
+"""
+Content-addressed deduplication for /generate-ugc.
+
+A generation request is identified by a hash of the conversation, the
+product image bytes, the brand profile version (brand id + updated_at)
+and the prompt generate_marketing_prompt builds from it. The hash is
+stored on the generated_content row (request_hash, migrations 9-10), so:
+
+- an identical request within UGC_DEDUP_WINDOW seconds returns the
+  existing completed row instead of re-uploading and paying for a new
+  Nano Banana task;
+- an identical request while the first is still running shares it: on
+  Postgres the hash is the job's dedup_key (jobs.py), so it attaches to
+  the queued job across workers; other backends generate in the request
+  and share it within the process (InFlight).
+
+Callers pass force=true to skip both.
+"""
+
+import asyncio
+import hashlib
+import os
+
+WINDOW = float(os.getenv("UGC_DEDUP_WINDOW", "3600"))
+
+
+def request_hash(conversation_id: str, brand_data: dict, product_bytes: bytes, prompt: str) -> str:
+    digest = hashlib.sha256()
+    for part in (
+        conversation_id,
+        str(brand_data.get("id")),
+        str(brand_data.get("updated_at")),
+        hashlib.sha256(product_bytes).hexdigest(),
+        prompt,
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class InFlight:
+    """Single flight per key: concurrent callers share one running generation."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.started = 0
+        self.attached = 0
+
+    async def run(self, key: str, start):
+        """Await the generation for `key`, starting `start()` unless one is already running.
+
+        Returns (result, attached) where attached is True for callers that
+        joined an existing generation.
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self.attached += 1
+            # shield: a joiner disconnecting must not cancel the shared generation
+            return await asyncio.shield(task), True
+        task = asyncio.ensure_future(start())
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self.started += 1
+        return await asyncio.shield(task), False
+
+    def stats(self):
+        return {"in_flight": len(self._tasks), "started": self.started, "attached": self.attached}
+
+
+inflight = InFlight()
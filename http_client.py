@@ -0,0 +1,192 @@
+"""
+Shared outbound HTTP client for the provider APIs (Kie.ai, tmpfiles.org,
+TweetAPI, Brandfetch, logo and image downloads).
+
+Two faces over per-process connection pools, so calls to the same host
+reuse warm keep-alive (TLS) connections instead of opening a new one each
+time:
+
+- sync: get() / post() / request(), a requests.Session. Same arguments,
+  return value and exceptions as requests.get / requests.post.
+- async: async_request(), an httpx.AsyncClient for the API routes. It
+  speaks HTTP/2 when the optional h2 package is installed
+  (pip install "httpx[http2]").
+
+Both cap concurrent connections per host at HTTP_MAX_PER_HOST (further
+callers wait for a free one) and apply default connect/read timeouts
+(HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT) when a call passes none.
+
+Retry policy (HTTP_RETRIES times, exponential backoff from
+HTTP_RETRY_BACKOFF seconds, honouring Retry-After):
+- connection failures are retried for every method (nothing was sent);
+- 429/502/503/504 responses and read errors only for idempotent methods,
+  so a POST that creates a provider task is never sent twice.
+"""
+
+import asyncio
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # async face unavailable
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = httpx is not None
+except ImportError:
+    HTTP2 = False
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_requests = 0
+
+
+def _retry_policy():
+    return Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def session() -> requests.Session:
+    """The process-wide session (recreated after fork: pooled sockets must not be shared)."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                new = requests.Session()
+                adapter = HTTPAdapter(pool_connections=32, pool_maxsize=MAX_PER_HOST,
+                                      pool_block=True, max_retries=_retry_policy())
+                new.mount("https://", adapter)
+                new.mount("http://", adapter)
+                _session, _session_pid = new, os.getpid()
+    return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """requests.request through the shared pool, with default timeouts and retries."""
+    global _requests
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    _requests += 1
+    return session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+# --- async face ---
+
+_async_client = None
+_host_limits = {}
+_async_requests = 0
+_async_retries = 0
+
+
+def _client():
+    global _async_client
+    if httpx is None:
+        raise RuntimeError("httpx is required for async HTTP calls")
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=MAX_PER_HOST * 8),
+        )
+    return _async_client
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(MAX_PER_HOST)
+    return limit
+
+
+def _backoff(attempt: int, response=None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return RETRY_BACKOFF * 2 ** attempt * (0.5 + random.random())
+
+
+async def async_request(method: str, url: str, **kwargs):
+    """httpx request through the shared async client, with the same limits and retry policy.
+
+    Returns an httpx.Response; raises httpx.RequestError subclasses once retries run out.
+    """
+    global _async_requests, _async_retries
+    method = method.upper()
+    client = _client()
+    _async_requests += 1
+    attempt = 0
+    while True:
+        try:
+            async with _host_limit(url):
+                response = await client.request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            if attempt >= RETRIES:
+                raise
+            delay = _backoff(attempt)
+        except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError):
+            if attempt >= RETRIES or method not in IDEMPOTENT_METHODS:
+                raise
+            delay = _backoff(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= RETRIES or method not in IDEMPOTENT_METHODS:
+                return response
+            await response.aclose()
+            delay = _backoff(attempt, response)
+        attempt += 1
+        _async_retries += 1
+        await asyncio.sleep(delay)
+
+
+async def aclose():
+    """Close the async client (server shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    _host_limits.clear()
+
+
+def stats():
+    return {
+        "http2": HTTP2,
+        "max_per_host": MAX_PER_HOST,
+        "sync_requests": _requests,
+        "async_requests": _async_requests,
+        "async_retries": _async_retries,
+    }
@@ -1,12 +1,23 @@
 import os
-import requests
 import time
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from io import BytesIO
 
+import asset_cache
+import http_client
+import kie_callbacks
+import task_poller
+
 load_dotenv()
 
+# Seconds to wait for the generated image when adding the overlay
+OVERLAY_DOWNLOAD_TIMEOUT = float(os.getenv("OVERLAY_DOWNLOAD_TIMEOUT", "30"))
+
+KIE_API_BASE = os.getenv("KIE_API_BASE", "https://api.kie.ai").rstrip("/")
+IMAGE_MODEL = "google/nano-banana-edit"
+IMAGE_TIMEOUT = 120  # seconds to wait for a Nano Banana Edit result
+
 
 def generate_marketing_prompt(brand_data):
     """Generate marketing image prompt with brand name for Nano Banana Edit"""
@@ -80,11 +91,14 @@ OUTPUT: Photorealistic, high-resolution image suitable for social media marketin
 def add_brand_overlay(image_url: str, brand_data: dict, output_path: str):
     """
     Add brand logo and name overlay to generated image
+
+    Fonts and resized logos come from asset_cache, so repeated overlays for
+    the same brand only download the generated image and composite.
     """
     print(f"🎨 Adding brand overlay...")
     
     # Download the generated image
-    response = requests.get(image_url)
+    response = http_client.get(image_url, timeout=OVERLAY_DOWNLOAD_TIMEOUT)
     response.raise_for_status()
     img = Image.open(BytesIO(response.content))
     
@@ -109,21 +123,9 @@ def add_brand_overlay(image_url: str, brand_data: dict, output_path: str):
     
     if logo_url:
         try:
-            # Download logo
-            logo_response = requests.get(logo_url, timeout=5)
-            if logo_response.status_code == 200:
-                logo = Image.open(BytesIO(logo_response.content))
-                
-                # Resize logo to fit (max 150px width)
-                logo_max_width = min(150, width // 4)
-                logo_ratio = logo_max_width / logo.width
-                logo_new_height = int(logo.height * logo_ratio)
-                logo = logo.resize((logo_max_width, logo_new_height), Image.Resampling.LANCZOS)
-                
-                # Convert logo to RGBA
-                if logo.mode != 'RGBA':
-                    logo = logo.convert('RGBA')
-                
+            # Logo resized to fit (max 150px width), cached per URL and width
+            logo = asset_cache.logos.get(logo_url, min(150, width // 4))
+            if logo is not None:
                 # Position logo in top-left corner with padding
                 logo_x = 20
                 logo_y = 20
@@ -141,19 +143,8 @@ def add_brand_overlay(image_url: str, brand_data: dict, output_path: str):
     # Add brand name at bottom
     brand_name = brand_data.get('brand_name', 'Brand')
     
-    # Try to load a nice font, fallback to default
-    try:
-        # Try to use a system font
-        font_size = max(24, height // 25)
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            try:
-                font = ImageFont.truetype("Arial.ttf", font_size)
-            except:
-                font = ImageFont.load_default()
-    except:
-        font = ImageFont.load_default()
+    # System font (resolved once) at this size, falling back to the default font
+    font = asset_cache.font(max(24, height // 25))
     
     # Get text size
     bbox = draw.textbbox((0, 0), brand_name, font=font)
@@ -198,7 +189,7 @@ def upload_to_tmpfiles(file_path: str):
     
     with open(file_path, 'rb') as f:
         files = {'file': f}
-        response = requests.post(url, files=files)
+        response = http_client.post(url, files=files, timeout=(http_client.CONNECT_TIMEOUT, 60))
         response.raise_for_status()
     
     result = response.json()
@@ -215,26 +206,49 @@ def upload_to_tmpfiles(file_path: str):
         raise Exception(f"Failed to upload to tmpfiles.org: {result}")
 
 
-def generate_ugc_image_nano_banana(product_image_url: str, brand_data: dict):
-    """
-    Generate marketing image using Kie.ai Nano Banana Edit API
-    """
+class ImageTaskFailed(Exception):
+    """Kie.ai reported the Nano Banana Edit task as failed; retrying the same task cannot help."""
+
+
+class ImageTaskPending(Exception):
+    """No result within the wait; the task may still finish and can be waited on again."""
+
+
+def _pushed_image_result(pushed: dict, prompt: str):
+    """wait_for_ugc_image's result from a callback / task poller result."""
+    if pushed['state'] != 'success':
+        raise ImageTaskFailed(f"Image generation failed: {pushed['error']}")
+    print(f"✅ Marketing image generated successfully!")
+    print(f"🖼️  URL: {pushed['urls'][0]}")
+    return {
+        'success': True,
+        'image_url': pushed['urls'][0],
+        'task_id': pushed['task_id'],
+        'cost_time': pushed.get('cost_time'),
+        'prompt': prompt
+    }
+
+
+def _kie_headers():
     api_key = os.getenv("KIE_API_KEY")
     if not api_key:
         raise ValueError("KIE_API_KEY not found in environment variables")
-    
-    # Generate marketing prompt
-    prompt = generate_marketing_prompt(brand_data)
-    
-    # Step 1: Create task
-    create_url = "https://api.kie.ai/api/v1/jobs/createTask"
-    headers = {
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
+
+
+def create_ugc_image_task(product_image_url: str, brand_data: dict):
+    """Create a Nano Banana Edit task. Returns (task_id, prompt)."""
+    headers = _kie_headers()
+    
+    # Generate marketing prompt
+    prompt = generate_marketing_prompt(brand_data)
     
+    create_url = f"{KIE_API_BASE}/api/v1/jobs/createTask"
     payload = {
-        "model": "google/nano-banana-edit",
+        "model": IMAGE_MODEL,
         "input": {
             "prompt": prompt,
             "image_urls": [product_image_url],
@@ -242,12 +256,15 @@ def generate_ugc_image_nano_banana(product_image_url: str, brand_data: dict):
             "image_size": "1:1"
         }
     }
+    callback = kie_callbacks.callback_url("image")
+    if callback:
+        payload["callBackUrl"] = callback
     
     print(f"🎨 Creating marketing image with Nano Banana Edit...")
     print(f"📸 Product image: {product_image_url}")
     print(f"📝 Prompt: {prompt[:150]}...")
     
-    response = requests.post(create_url, headers=headers, json=payload)
+    response = http_client.post(create_url, headers=headers, json=payload)
     response.raise_for_status()
     
     result = response.json()
@@ -257,19 +274,42 @@ def generate_ugc_image_nano_banana(product_image_url: str, brand_data: dict):
     
     task_id = result['data']['taskId']
     print(f"✅ Task created: {task_id}")
-    
-    # Step 2: Poll for results
-    query_url = f"https://api.kie.ai/api/v1/jobs/recordInfo?taskId={task_id}"
-    max_attempts = 60
+    return task_id, prompt
+
+
+def wait_for_ugc_image(task_id: str, prompt: str, timeout: float = None, age: float = 0):
+    """Wait for a Nano Banana Edit task created by create_ugc_image_task.
+
+    Raises ImageTaskFailed when Kie.ai reports the task failed and
+    ImageTaskPending when it has not finished within `timeout` seconds.
+    `age` is how many seconds ago the task was created, when waiting again.
+    """
+    headers = _kie_headers()
+    timeout = IMAGE_TIMEOUT if timeout is None else timeout
+    
+    # The shared task poller (and the callback, when enabled) delivers the result;
+    # without a poller in this process (scripts), poll here.
+    if task_poller.poller.track(task_id, "image", IMAGE_MODEL, age=age):
+        pushed = kie_callbacks.waiters.wait(task_id, timeout)
+        task_poller.poller.done(task_id, completed=pushed is not None)
+        if pushed is None:
+            raise ImageTaskPending(f"Image generation timed out after {timeout} seconds")
+        return _pushed_image_result(pushed, prompt)
+    
+    query_url = f"{KIE_API_BASE}/api/v1/jobs/recordInfo?taskId={task_id}"
+    poll_interval = kie_callbacks.FALLBACK_POLL_INTERVAL if kie_callbacks.enabled() else 2
+    deadline = time.monotonic() + timeout
     attempt = 0
     
-    while attempt < max_attempts:
+    while time.monotonic() < deadline:
         attempt += 1
-        time.sleep(2)
+        pushed = kie_callbacks.waiters.wait(task_id, min(poll_interval, max(0, deadline - time.monotonic())))
+        if pushed is not None:
+            return _pushed_image_result(pushed, prompt)
         
-        print(f"⏳ Checking status... (attempt {attempt}/{max_attempts})")
+        print(f"⏳ Checking status... (attempt {attempt})")
         
-        status_response = requests.get(query_url, headers=headers)
+        status_response = http_client.get(query_url, headers=headers)
         status_response.raise_for_status()
         
         status_data = status_response.json()
@@ -299,12 +339,20 @@ def generate_ugc_image_nano_banana(product_image_url: str, brand_data: dict):
         elif state == 'fail':
             fail_msg = task_data.get('failMsg', 'Unknown error')
             fail_code = task_data.get('failCode', 'N/A')
-            raise Exception(f"Image generation failed: [{fail_code}] {fail_msg}")
+            raise ImageTaskFailed(f"Image generation failed: [{fail_code}] {fail_msg}")
         
         elif state == 'waiting':
             continue
     
-    raise Exception(f"Image generation timed out after {max_attempts * 2} seconds")
+    raise ImageTaskPending(f"Image generation timed out after {timeout} seconds")
+
+
+def generate_ugc_image_nano_banana(product_image_url: str, brand_data: dict):
+    """
+    Generate marketing image using Kie.ai Nano Banana Edit API
+    """
+    task_id, prompt = create_ugc_image_task(product_image_url, brand_data)
+    return wait_for_ugc_image(task_id, prompt)
 
 
 def generate_ugc_prompt(brand_data):
@@ -341,7 +389,7 @@ def generate_ugc_prompt(brand_data):
     print(f"📸 Product image: {product_image_url}")
     print(f"📝 Prompt: {prompt[:100]}...")
     
-    response = requests.post(create_url, headers=headers, json=payload)
+    response = http_client.post(create_url, headers=headers, json=payload)
     response.raise_for_status()
     
     result = response.json()
@@ -363,7 +411,7 @@ def generate_ugc_prompt(brand_data):
         
         print(f"⏳ Checking status... (attempt {attempt}/{max_attempts})")
         
-        status_response = requests.get(query_url, headers=headers)
+        status_response = http_client.get(query_url, headers=headers)
         status_response.raise_for_status()
         
         status_data = status_response.json()
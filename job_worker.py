@@ -0,0 +1,226 @@
+"""
+Workers for the Postgres job queue (jobs.py).
+
+    python job_worker.py                  # JOB_WORKER_THREADS worker threads
+    python job_worker.py --processes 4    # 4 processes with that many threads each
+
+The API server also runs JOB_WORKERS worker threads of its own (default
+2, Postgres backend only); set JOB_WORKERS=0 on the API when dedicated
+worker processes are deployed.
+
+Each process keeps one LISTEN connection on the jobs channel and wakes
+its idle workers when a job is enqueued; otherwise they poll every
+JOB_POLL_INTERVAL seconds (which also picks up retries and expired
+leases). While a job runs, its lease is extended every third of
+JOB_VISIBILITY_TIMEOUT. The same connection listens on kie_tasks and
+hands Kie.ai callback results to the generations waiting on them; each
+worker process also runs its own task poller (task_poller.py).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import select
+import socket
+import threading
+import time
+
+import psycopg2
+import requests
+
+import database
+import jobs
+import kie_callbacks
+import task_poller
+from image_generator import ImageTaskFailed, create_ugc_image_task, wait_for_ugc_image
+
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "4"))
+
+
+def run_generate_ugc(job: dict, worker_id: str) -> dict:
+    """Nano Banana Edit generation for /generate-ugc; the product image is already uploaded.
+
+    The Kie.ai task id is saved on the job as soon as the task exists, so a
+    retried attempt (timeout, status check errors, lost lease) waits on that
+    task again instead of creating and paying for another one.
+    """
+    payload = job["payload"]
+    brand_data = database.get_brand_profile(payload["brand_id"])
+    if not brand_data:
+        raise jobs.PermanentJobError("Brand not found")
+
+    task_id = payload.get("task_id")
+    if task_id is None:
+        try:
+            task_id, prompt = create_ugc_image_task(payload["product_image_url"], brand_data)
+        except requests.exceptions.ConnectionError:
+            raise  # the request never reached Kie.ai: retry
+        except Exception as e:
+            # Kie.ai may have created a task anyway (5xx, read timeout); never send createTask twice
+            raise jobs.PermanentJobError(str(e))
+        jobs.save_progress(job, worker_id, {"task_id": task_id, "prompt": prompt, "task_created_at": time.time()})
+        age = 0
+    else:
+        prompt = payload["prompt"]
+        age = max(0, time.time() - payload.get("task_created_at", time.time()))
+        print(f"🔁 Job {job['id']} resuming Kie.ai task {task_id}")
+
+    try:
+        result = wait_for_ugc_image(task_id, prompt, age=age)
+    except ImageTaskFailed as e:
+        raise jobs.PermanentJobError(str(e))
+    # Anything else (ImageTaskPending, status check errors) is retried on the same task
+
+    content_id = database.save_generated_content(
+        brand_id=payload["brand_id"],
+        conversation_id=job["conversation_id"],
+        product_image_url=payload["product_image_url"],
+        generated_image_url=result['image_url'],
+        prompt_used=result['prompt'],
+        request_hash=payload.get("request_hash"),
+    )
+    if content_id is None:
+        raise Exception("Could not save generated content")
+    print(f"✅ Content saved to database! ID: {content_id}")
+
+    return {
+        "success": True,
+        "content_id": content_id,
+        "product_image_url": payload["product_image_url"],
+        "generated_image_url": result['image_url'],
+        "prompt": result['prompt'],
+        "task_id": result.get('task_id'),
+        "cost_time_ms": result.get('cost_time'),
+    }
+
+
+HANDLERS = {
+    "generate_ugc": run_generate_ugc,
+}
+
+
+class WorkerPool:
+    """Worker threads in this process, woken by NOTIFY jobs."""
+
+    def __init__(self, threads: int = WORKER_THREADS, kinds: list = None):
+        self.threads = threads
+        self.kinds = kinds or list(HANDLERS)
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+        self.completed = 0
+        self.failed_attempts = 0
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._listen, name="job-listener", daemon=True)]
+        for i in range(self.threads):
+            self._threads.append(threading.Thread(target=self._work, args=(f"{self.name}:{i}",),
+                                                  name=f"job-worker-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"✅ Job workers started ({self.threads} threads, kinds: {', '.join(self.kinds)})")
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Stop claiming jobs. Jobs still running are left to finish or be re-leased elsewhere."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wait(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(database.DATABASE_URL)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {jobs.CHANNEL}; LISTEN {kie_callbacks.CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        if notify.channel == kie_callbacks.CHANNEL:
+                            kie_callbacks.waiters.publish(json.loads(notify.payload))
+                        else:
+                            self._wake.set()
+            except Exception as e:
+                print(f"⚠️  Job listener disconnected, polling only: {e}")
+                self._stop.wait(POLL_INTERVAL)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _work(self, worker_id: str):
+        while not self._stop.is_set():
+            job = jobs.claim(worker_id, self.kinds)
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(job, worker_id)
+
+    def _run(self, job: dict, worker_id: str):
+        print(f"⏳ Job {job['id']} ({job['kind']}) attempt {job['attempts']}/{job['max_attempts']}")
+        running = threading.Event()
+
+        def keep_leased():
+            while not running.wait(jobs.VISIBILITY_TIMEOUT / 3):
+                if not jobs.heartbeat(job, worker_id):
+                    print(f"⚠️  Job {job['id']} lease lost; its result will be discarded")
+                    return
+
+        threading.Thread(target=keep_leased, name=f"job-lease-{job['id']}", daemon=True).start()
+        try:
+            result = HANDLERS[job["kind"]](job, worker_id)
+            if jobs.complete(job, worker_id, result):
+                self.completed += 1
+                print(f"✅ Job {job['id']} completed")
+        except jobs.PermanentJobError as e:
+            jobs.fail(job, worker_id, str(e), permanent=True)
+            self.failed_attempts += 1
+            print(f"❌ Job {job['id']} failed: {e}")
+        except Exception as e:
+            jobs.fail(job, worker_id, str(e))
+            self.failed_attempts += 1
+            print(f"⚠️  Job {job['id']} attempt {job['attempts']} failed: {e}")
+        finally:
+            running.set()
+
+    def stats(self):
+        return {"threads": self.threads, "completed": self.completed, "failed_attempts": self.failed_attempts}
+
+
+def _run_process(threads: int):
+    task_poller.poller.start_in_thread()
+    database.replicas.start_sharing(database.DATABASE_URL)
+    WorkerPool(threads).start().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.threads)
+        return
+    processes = [multiprocessing.Process(target=_run_process, args=(args.threads,), name=f"job-worker-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
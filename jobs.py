@@ -0,0 +1,272 @@
+"""
+Durable background job queue in Postgres (jobs table, migration 11).
+
+The API enqueues jobs and reads their status (async, asyncpg); worker
+threads and processes (job_worker.py) claim them with
+SELECT ... FOR UPDATE SKIP LOCKED (sync, psycopg2), so any number of
+workers share the table and no job is handed to two of them at once.
+
+- A claimed job is leased for JOB_VISIBILITY_TIMEOUT seconds: its
+  run_after moves to the lease expiry and the worker extends it
+  (heartbeat) while the job runs. If the worker dies, the lease runs out
+  and another worker claims the job again.
+- A failed attempt is retried after JOB_RETRY_DELAY * 2^(attempt - 1)
+  seconds, up to max_attempts. PermanentJobError fails the job at once.
+- A handler can record progress in its payload (save_progress), e.g. the
+  provider task it created, so a retried attempt resumes that task
+  instead of starting a new one.
+- A job with a dedup_key is unique while unfinished: enqueueing the same
+  key again returns the existing job.
+- Enqueue sends NOTIFY jobs in the same transaction, so idle workers wake
+  up at once instead of waiting for their next poll.
+"""
+
+import os
+
+from psycopg2.extras import Json, RealDictCursor
+
+import async_database as adb
+from database import get_connection
+
+CHANNEL = "jobs"
+
+VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help."""
+
+
+def public(job: dict) -> dict:
+    """A job as returned by the API."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "completed_at": job["completed_at"],
+    }
+
+
+# --- API side (asyncpg) ---
+
+async def enqueue(kind: str, conversation_id: str, payload: dict, dedup_key: str = None,
+                  max_attempts: int = MAX_ATTEMPTS):
+    """Queue a job. Returns (job, created); created is False if an unfinished job had the same dedup_key."""
+    pool = await adb.get_pool()
+    async with pool.acquire() as conn:
+        for _ in range(3):
+            async with conn.transaction():
+                row = await conn.fetchrow("""
+                    INSERT INTO jobs (kind, conversation_id, payload, dedup_key, max_attempts)
+                    VALUES ($1, $2, $3, $4, $5)
+                    ON CONFLICT (conversation_id, dedup_key) WHERE status IN ('queued', 'running')
+                    DO NOTHING
+                    RETURNING *
+                """, kind, conversation_id, payload, dedup_key, max_attempts)
+                if row is not None:
+                    await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, kind)
+                    return dict(row), True
+                row = await conn.fetchrow("""
+                    SELECT * FROM jobs
+                    WHERE conversation_id = $1 AND dedup_key = $2 AND status IN ('queued', 'running')
+                """, conversation_id, dedup_key)
+                if row is not None:
+                    return dict(row), False
+            # The conflicting job finished in between: insert again
+    raise RuntimeError(f"Could not enqueue {kind} job")
+
+
+async def get_job(job_id: int, conversation_id: str):
+    """A job if it belongs to the conversation, else None."""
+    pool = await adb.get_pool()
+    row = await pool.fetchrow(
+        "SELECT * FROM jobs WHERE id = $1 AND conversation_id = $2", job_id, conversation_id
+    )
+    return dict(row) if row else None
+
+
+async def get_unfinished_job(conversation_id: str, dedup_key: str):
+    """The queued or running job with this dedup_key, if any."""
+    pool = await adb.get_pool()
+    row = await pool.fetchrow("""
+        SELECT * FROM jobs
+        WHERE conversation_id = $1 AND dedup_key = $2 AND status IN ('queued', 'running')
+    """, conversation_id, dedup_key)
+    return dict(row) if row else None
+
+
+# --- Worker side (psycopg2) ---
+
+def claim(worker_id: str, kinds: list = None):
+    """Lease the oldest runnable job (queued and due, or running with an expired lease), or None.
+
+    A job whose lease expired on its last attempt is failed instead of being run again.
+    """
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        while True:
+            kind_filter = "AND kind = ANY(%(kinds)s)" if kinds else ""
+            cur.execute(f"""
+                UPDATE jobs j
+                SET status = 'running',
+                    attempts = j.attempts + 1,
+                    locked_by = %(worker_id)s,
+                    run_after = LOCALTIMESTAMP + make_interval(secs => %(lease)s),
+                    started_at = COALESCE(j.started_at, LOCALTIMESTAMP),
+                    updated_at = LOCALTIMESTAMP
+                FROM (
+                    SELECT id FROM jobs
+                    WHERE status IN ('queued', 'running') AND run_after <= LOCALTIMESTAMP
+                    {kind_filter}
+                    ORDER BY run_after, id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                ) next
+                WHERE j.id = next.id
+                RETURNING j.*
+            """, {"worker_id": worker_id, "lease": VISIBILITY_TIMEOUT, "kinds": kinds})
+            job = cur.fetchone()
+            conn.commit()
+            if job is None:
+                return None
+            job = dict(job)
+            if job["attempts"] > job["max_attempts"]:
+                _finish(cur, job, worker_id, 'failed', error=job["error"] or "Worker lost the job (lease expired)")
+                conn.commit()
+                continue
+            return job
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error claiming job: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _finish(cur, job: dict, worker_id: str, status: str, result=None, error: str = None):
+    cur.execute("""
+        UPDATE jobs
+        SET status = %s, result = %s, error = %s, locked_by = NULL,
+            completed_at = LOCALTIMESTAMP, updated_at = LOCALTIMESTAMP
+        WHERE id = %s AND locked_by = %s AND attempts = %s AND status = 'running'
+    """, (status, Json(result) if result is not None else None, error, job["id"], worker_id, job["attempts"]))
+    return cur.rowcount == 1
+
+
+def heartbeat(job: dict, worker_id: str) -> bool:
+    """Extend the lease on a running job. False if the lease was lost to another worker."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET run_after = LOCALTIMESTAMP + make_interval(secs => %s), updated_at = LOCALTIMESTAMP
+            WHERE id = %s AND locked_by = %s AND attempts = %s AND status = 'running'
+        """, (VISIBILITY_TIMEOUT, job["id"], worker_id, job["attempts"]))
+        conn.commit()
+        return cur.rowcount == 1
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️  Could not extend lease on job {job['id']}: {e}")
+        return True
+    finally:
+        cur.close()
+        conn.close()
+
+
+def save_progress(job: dict, worker_id: str, fields: dict) -> bool:
+    """Merge `fields` into the running job's payload, here and in the table. False if not stored."""
+    job["payload"].update(fields)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET payload = payload || %s, updated_at = LOCALTIMESTAMP
+            WHERE id = %s AND locked_by = %s AND attempts = %s AND status = 'running'
+        """, (Json(fields), job["id"], worker_id, job["attempts"]))
+        conn.commit()
+        return cur.rowcount == 1
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️  Could not save progress of job {job['id']}: {e}")
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+
+def complete(job: dict, worker_id: str, result: dict) -> bool:
+    """Store the result. False if the lease was lost (another worker owns the job now)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        done = _finish(cur, job, worker_id, 'completed', result=result)
+        conn.commit()
+        return done
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error completing job {job['id']}: {e}")
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+
+def fail(job: dict, worker_id: str, error: str, permanent: bool = False) -> bool:
+    """Record a failed attempt: requeue with backoff, or fail the job after its last attempt."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if permanent or job["attempts"] >= job["max_attempts"]:
+            done = _finish(cur, job, worker_id, 'failed', error=error)
+        else:
+            delay = RETRY_DELAY * 2 ** (job["attempts"] - 1)
+            cur.execute("""
+                UPDATE jobs
+                SET status = 'queued', error = %s, locked_by = NULL,
+                    run_after = LOCALTIMESTAMP + make_interval(secs => %s), updated_at = LOCALTIMESTAMP
+                WHERE id = %s AND locked_by = %s AND attempts = %s AND status = 'running'
+            """, (error, delay, job["id"], worker_id, job["attempts"]))
+            done = cur.rowcount == 1
+        conn.commit()
+        return done
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error failing job {job['id']}: {e}")
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+
+def prune(retention_days: float = RETENTION_DAYS) -> int:
+    """Delete completed and failed jobs older than `retention_days`. Returns the number deleted."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM jobs
+            WHERE status IN ('completed', 'failed')
+              AND completed_at < LOCALTIMESTAMP - make_interval(secs => %s)
+        """, (retention_days * 86400,))
+        conn.commit()
+        return cur.rowcount
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error pruning jobs: {e}")
+        return 0
+    finally:
+        cur.close()
+        conn.close()
@@ -0,0 +1,193 @@
+"""
+Signed completion callbacks for Kie.ai tasks (Nano Banana Edit images,
+Veo videos).
+
+When KIE_CALLBACK_URL (the public base URL of this API) and
+KIE_CALLBACK_SECRET are set, tasks are created with a callBackUrl of
+
+    {KIE_CALLBACK_URL}/callbacks/kie/{kind}?ts=<unix time>&sig=<hmac>
+
+where sig is HMAC-SHA256(KIE_CALLBACK_SECRET, "{kind}:{ts}"). The
+callback route rejects URLs with a bad signature or older than
+KIE_CALLBACK_MAX_AGE seconds.
+
+- video: the callback updates the ugc_video row in generated_content.
+- image: the callback is handed to the thread waiting on the task
+  (`waiters`). On Postgres it goes out as NOTIFY kie_tasks and the job
+  worker listener of each process publishes it; on SQLite the
+  generation runs in the API process and gets it directly.
+
+Polling stays as the fallback: while callbacks are on, the task poller
+(task_poller.py) and image waits without one check a task no more often
+than every KIE_FALLBACK_POLL_INTERVAL seconds.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import async_database as adb
+
+CHANNEL = "kie_tasks"
+
+CALLBACK_URL = os.getenv("KIE_CALLBACK_URL", "").rstrip("/")
+CALLBACK_SECRET = os.getenv("KIE_CALLBACK_SECRET", "")
+MAX_AGE = float(os.getenv("KIE_CALLBACK_MAX_AGE", str(2 * 24 * 3600)))
+FALLBACK_POLL_INTERVAL = float(os.getenv("KIE_FALLBACK_POLL_INTERVAL", "15"))
+
+KINDS = ("image", "video")
+
+
+def enabled() -> bool:
+    return bool(CALLBACK_URL and CALLBACK_SECRET)
+
+
+def _signature(kind: str, ts: str) -> str:
+    return hmac.new(CALLBACK_SECRET.encode(), f"{kind}:{ts}".encode(), hashlib.sha256).hexdigest()
+
+
+def callback_url(kind: str):
+    """The signed callBackUrl for a new task of this kind, or None when callbacks are off."""
+    if not enabled():
+        return None
+    ts = str(int(time.time()))
+    return f"{CALLBACK_URL}/callbacks/kie/{kind}?" + urlencode({"ts": ts, "sig": _signature(kind, ts)})
+
+
+def verify(kind: str, ts: str, sig: str) -> bool:
+    """True if (ts, sig) were issued by callback_url(kind) and have not expired."""
+    if not enabled() or kind not in KINDS or not ts or not sig:
+        return False
+    try:
+        age = time.time() - int(ts)
+    except ValueError:
+        return False
+    if age < -300 or age > MAX_AGE:
+        return False
+    return hmac.compare_digest(_signature(kind, ts), sig)
+
+
+# --- Payloads ---
+# Callbacks and status responses are normalised to {"task_id", "state": "success" | "fail", "urls", "error", ...}
+
+def parse_image(body: dict):
+    """A jobs/createTask callback (same `data` as jobs/recordInfo)."""
+    data = body.get("data") or {}
+    task_id = data.get("taskId")
+    if not task_id:
+        return None
+    state = data.get("state")
+    if state not in ("success", "fail"):
+        state = "fail" if body.get("code") not in (None, 200) else None
+    if state is None:
+        return None  # not a final state
+    urls = []
+    if state == "success":
+        try:
+            urls = json.loads(data.get("resultJson") or "{}").get("resultUrls") or []
+        except ValueError:
+            urls = []
+        if not urls:
+            state = "fail"
+    return {
+        "task_id": task_id,
+        "state": state,
+        "urls": urls,
+        "error": None if state == "success" else
+        f"[{data.get('failCode', 'N/A')}] {data.get('failMsg') or body.get('msg') or 'Unknown error'}",
+        "cost_time": data.get("costTime"),
+    }
+
+
+def parse_video(body: dict):
+    """A veo/generate callback: code 200 with data.info.resultUrls, anything else is a failure."""
+    data = body.get("data") or {}
+    task_id = data.get("taskId")
+    if not task_id:
+        return None
+    info = data.get("info") or {}
+    urls = info.get("resultUrls") or []
+    success = body.get("code") == 200 and bool(urls)
+    return {
+        "task_id": task_id,
+        "state": "success" if success else "fail",
+        "urls": urls,
+        "error": None if success else body.get("msg") or "Video generation failed",
+        "resolution": info.get("resolution"),
+    }
+
+
+def parse_video_record(body: dict):
+    """A veo/record-info response, or None while the video is still generating."""
+    data = body.get("data") or {}
+    task_id = data.get("taskId")
+    flag = data.get("successFlag", 0)
+    if not task_id or flag == 0:
+        return None
+    response = data.get("response") or {}
+    urls = response.get("resultUrls") or []
+    success = flag == 1 and bool(urls)
+    return {
+        "task_id": task_id,
+        "state": "success" if success else "fail",
+        "urls": urls,
+        "error": None if success else data.get("errorMessage") or body.get("msg") or "Video generation failed",
+        "resolution": response.get("resolution"),
+    }
+
+
+# Callback bodies; jobs/recordInfo answers in the same shape as the image callback
+PARSERS = {"image": parse_image, "video": parse_video}
+
+
+# --- Waiters ---
+
+class TaskWaiters:
+    """Task results handed from callbacks to the threads waiting on them.
+
+    Results that arrive before anyone waits (the callback can beat the
+    createTask response) are kept for a while, up to `max_results`.
+    """
+
+    def __init__(self, max_results: int = 1000):
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._cond = threading.Condition()
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, result: dict):
+        with self._cond:
+            self._results[result["task_id"]] = result
+            self._results.move_to_end(result["task_id"])
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            self.published += 1
+            self._cond.notify_all()
+
+    def wait(self, task_id: str, timeout: float):
+        """The result for task_id, or None if none arrived within `timeout` seconds."""
+        with self._cond:
+            self._cond.wait_for(lambda: task_id in self._results, timeout)
+            result = self._results.pop(task_id, None)
+            if result is not None:
+                self.delivered += 1
+            return result
+
+    def stats(self):
+        return {"enabled": enabled(), "pending_results": len(self._results),
+                "published": self.published, "delivered": self.delivered}
+
+
+waiters = TaskWaiters()
+
+
+async def notify(result: dict):
+    """Pass a result to the other processes' waiters (Postgres only)."""
+    pool = await adb.get_pool()
+    await pool.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(result))
@@ -0,0 +1,211 @@
+"""
+Optional write-behind log for chat messages.
+
+With MESSAGE_WRITE_BEHIND=true, save_message and UnitOfWork do not insert
+messages on the request path. They append them to a bounded in-process
+queue, and a background task bulk-loads the queue with COPY whenever
+MESSAGE_LOG_BATCH_SIZE messages are waiting or MESSAGE_LOG_FLUSH_INTERVAL
+seconds have passed. Each flush is one transaction: the COPY plus one
+UPDATE that moves last_message_at forward once per conversation in the
+batch. The log is started and drained in the server lifespan.
+
+A flush that fails because the database is unavailable keeps its batch
+and retries with exponential backoff (up to MESSAGE_LOG_MAX_BACKOFF
+seconds) until it goes through; meanwhile the queue fills up and appends
+wait for the flusher (backpressure). Only when the batch fails on bad
+data (a conversation that no longer exists, say) is it written row by
+row, and only the rows rejected for their data are dropped.
+
+Trade-off: messages still in the queue are lost if the process is killed
+without a clean shutdown (or the database is still down after `retries`
+attempts during shutdown), and message ids are not known on the request
+path.
+"""
+
+import asyncio
+import os
+
+ENABLED = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+
+COLUMNS = ("conversation_id", "role", "content", "created_at")
+
+
+class MessageLog:
+    """Bounded queue of (conversation_id, role, content, created_at) rows plus its flusher task."""
+
+    def __init__(self, max_queue: int = 10_000, batch_size: int = 500, flush_interval: float = 0.5,
+                 retries: int = 3, max_backoff: float = 30.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries  # attempts per batch once stop() has begun
+        self.max_backoff = max_backoff
+        self._queue = None
+        self._task = None
+        self._pool = None
+        self._running = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self, pool):
+        """Start the flusher on the current event loop, writing through `pool` (asyncpg)."""
+        if self._running:
+            return
+        self._pool = pool
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        self._running = True
+        print(f"✅ Message write-behind enabled (batch {self.batch_size}, every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop accepting messages and flush everything still queued."""
+        if not self._running:
+            return
+        self._running = False
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def append(self, conversation_id: str, role: str, content: str, created_at):
+        await self._queue.put((conversation_id, role, content, created_at))
+        self.enqueued += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            batch = []
+            deadline = loop.time() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+            if item is None:
+                stopping = True
+                # Anything appended after stop() began is still in the queue
+                while not self._queue.empty():
+                    leftover = self._queue.get_nowait()
+                    if leftover is not None:
+                        batch.append(leftover)
+            if batch:
+                await self._flush(batch)
+
+    async def _write(self, rows: list):
+        """COPY rows and move last_message_at forward, in one transaction."""
+        last_message_at = {}
+        for conversation_id, _, _, created_at in rows:
+            previous = last_message_at.get(conversation_id)
+            if previous is None or created_at > previous:
+                last_message_at[conversation_id] = created_at
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table("messages", records=rows, columns=COLUMNS)
+                await conn.execute("""
+                    UPDATE conversations c
+                    SET last_message_at = GREATEST(c.last_message_at, v.last_message_at)
+                    FROM unnest($1::varchar[], $2::timestamp[]) AS v(conversation_id, last_message_at)
+                    WHERE c.conversation_id = v.conversation_id
+                """, list(last_message_at), list(last_message_at.values()))
+        self.flushed += len(rows)
+
+    async def _write_rows(self, batch: list) -> list:
+        """Write row by row, dropping rows rejected for their data. Returns the rows left
+        unwritten by any other error, for the caller to retry."""
+        for i, row in enumerate(batch):
+            try:
+                await self._write([row])
+            except Exception as e:
+                if not _is_data_error(e):
+                    return batch[i:]
+                self.dropped += 1
+                print(f"❌ Dropped message for {row[0]}: {e}")
+        return []
+
+    async def _flush(self, batch: list):
+        attempt = 0
+        while batch:
+            attempt += 1
+            try:
+                await self._write(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if _is_data_error(e):
+                    # One bad row fails the whole COPY; write row by row so only the bad ones are lost
+                    batch = await self._write_rows(batch)
+                    if not batch:
+                        self.batches += 1
+                        return
+                self.failed_flushes += 1
+                print(f"⚠️  Message log flush of {len(batch)} rows failed (attempt {attempt}): {e}")
+            if not self._running and attempt >= self.retries:
+                self.dropped += len(batch)
+                print(f"❌ Dropped {len(batch)} messages: database still unavailable at shutdown")
+                return
+            await asyncio.sleep(min(0.2 * 2 ** attempt, self.max_backoff))
+
+    def stats(self):
+        return {
+            "enabled": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+        }
+
+
+def _is_data_error(e: Exception) -> bool:
+    """Postgres rejected the rows themselves (data exception / integrity violation), not the connection."""
+    return str(getattr(e, "sqlstate", "") or "")[:2] in ("22", "23")
+
+
+_log = MessageLog(
+    max_queue=int(os.getenv("MESSAGE_LOG_MAX_QUEUE", "10000")),
+    batch_size=int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("MESSAGE_LOG_FLUSH_INTERVAL", "0.5")),
+    max_backoff=float(os.getenv("MESSAGE_LOG_MAX_BACKOFF", "30")),
+)
+
+
+def running() -> bool:
+    """True while the write-behind flusher is accepting messages."""
+    return _log.running
+
+
+async def start(pool):
+    """Start the write-behind flusher if MESSAGE_WRITE_BEHIND is set."""
+    if ENABLED:
+        await _log.start(pool)
+
+
+async def stop():
+    await _log.stop()
+
+
+async def append(conversation_id: str, role: str, content: str, created_at):
+    await _log.append(conversation_id, role, content, created_at)
+
+
+def stats():
+    return _log.stats()
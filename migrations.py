@@ -0,0 +1,397 @@
+"""
+Versioned schema migrations for the BrandSync database.
+
+setup_database() creates the base tables; everything after that (indexes,
+new columns, backfills) is a numbered Migration in MIGRATIONS. Applied
+versions are recorded in schema_migrations, so running the migrator again
+only applies what is new.
+
+Index migrations are built with CREATE INDEX CONCURRENTLY so they can run
+against a live database without blocking writes. Those statements cannot
+run inside a transaction, so concurrent migrations run in autocommit mode;
+a build that failed half-way leaves an INVALID index behind, which is
+dropped and rebuilt on the next run.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied / pending versions
+"""
+
+import json
+import sys
+
+from psycopg2.extras import execute_values
+
+from database import get_connection
+from partitions import partition_messages
+
+# Arbitrary constant: serialises migrators started by several app instances.
+MIGRATION_LOCK_ID = 72_310_001
+
+
+class Migration:
+    """One schema change.
+
+    statements      plain SQL run in a single transaction
+    indexes         (name, "table (columns) [WHERE ...]") built CONCURRENTLY
+    drop_indexes    index names dropped CONCURRENTLY after the builds
+    func            callable(conn) for data backfills; runs after statements
+    """
+
+    def __init__(self, version: int, name: str, statements=(), indexes=(), drop_indexes=(), func=None):
+        self.version = version
+        self.name = name
+        self.statements = list(statements)
+        self.indexes = list(indexes)
+        self.drop_indexes = list(drop_indexes)
+        self.func = func
+
+    @property
+    def concurrent(self) -> bool:
+        return bool(self.indexes or self.drop_indexes)
+
+
+def _backfill_video_tasks(conn, batch_size: int = 1000):
+    """Move {prompt, video_task_id} JSON out of prompt_used into the video task columns."""
+    cur = conn.cursor()
+    try:
+        last_id, moved = 0, 0
+        while True:
+            cur.execute("""
+                SELECT id, prompt_used FROM generated_content
+                WHERE content_type = 'ugc_video' AND provider_task_id IS NULL AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for content_id, prompt_used in rows:
+                try:
+                    metadata = json.loads(prompt_used)
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                if isinstance(metadata, dict) and metadata.get('video_task_id'):
+                    updates.append((content_id, metadata['video_task_id'], metadata.get('prompt')))
+            if updates:
+                execute_values(cur, """
+                    UPDATE generated_content gc
+                    SET provider_task_id = v.task_id,
+                        prompt_used = v.prompt,
+                        started_at = COALESCE(gc.started_at, gc.created_at),
+                        completed_at = CASE WHEN gc.status IN ('completed', 'failed')
+                                            THEN COALESCE(gc.completed_at, gc.updated_at) END
+                    FROM (VALUES %s) AS v(id, task_id, prompt)
+                    WHERE gc.id = v.id
+                """, updates)
+                moved += len(updates)
+        print(f"  backfilled {moved:,} video tasks")
+    finally:
+        cur.close()
+
+
+MIGRATIONS = [
+    Migration(
+        1, "hot lookup indexes",
+        indexes=[
+            # History / listing queries filter by conversation and sort by time; id breaks ties
+            ("idx_messages_conversation_created", "messages (conversation_id, created_at, id)"),
+            ("idx_generated_content_conversation_created", "generated_content (conversation_id, created_at, id)"),
+            ("idx_generated_content_brand", "generated_content (brand_id)"),
+            ("idx_brands_domain", "brands (domain, created_at)"),
+            ("idx_brand_colors_brand", "brand_colors (brand_id)"),
+            ("idx_brand_social_links_brand", "brand_social_links (brand_id)"),
+            ("idx_scheduled_posts_conversation", "scheduled_posts (conversation_id, scheduled_time)"),
+            # get_due_scheduled_posts only ever looks at posts still waiting to go out
+            ("idx_scheduled_posts_due", "scheduled_posts (scheduled_time) WHERE status = 'scheduled'"),
+            # get_user_by_username matches LOWER(username) = LOWER(%s)
+            ("idx_users_username_lower", "users (LOWER(username))"),
+        ],
+    ),
+    Migration(
+        2, "brand palette fingerprint",
+        statements=[
+            # save_brands skips rewriting colors/social links when this is unchanged
+            "ALTER TABLE brands ADD COLUMN IF NOT EXISTS palette_hash VARCHAR(40)",
+        ],
+    ),
+    Migration(
+        3, "keyset pagination indexes",
+        indexes=[
+            # List endpoints page with (sort column, id) row comparisons; these cover
+            # filter + order + tiebreak so every page is a short index range scan
+            ("idx_brands_conversation_created", "brands (conversation_id, created_at, id)"),
+            ("idx_brands_created", "brands (created_at, id)"),
+            ("idx_generated_content_brand_created", "generated_content (brand_id, created_at, id)"),
+            ("idx_scheduled_posts_conversation_time", "scheduled_posts (conversation_id, scheduled_time, id)"),
+        ],
+        # Superseded by the wider indexes above (same leading column)
+        drop_indexes=["idx_generated_content_brand", "idx_scheduled_posts_conversation"],
+    ),
+    Migration(
+        # Copies every message under an exclusive lock: schedule it for a quiet window
+        4, "partition messages by month",
+        func=partition_messages,
+    ),
+    Migration(
+        5, "video task columns",
+        statements=[
+            """
+            ALTER TABLE generated_content
+                ADD COLUMN IF NOT EXISTS provider_task_id VARCHAR(255),
+                ADD COLUMN IF NOT EXISTS model VARCHAR(50),
+                ADD COLUMN IF NOT EXISTS aspect_ratio VARCHAR(16),
+                ADD COLUMN IF NOT EXISTS resolution VARCHAR(32),
+                ADD COLUMN IF NOT EXISTS started_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP
+            """,
+        ],
+        func=_backfill_video_tasks,
+    ),
+    Migration(
+        6, "video provider task index",
+        indexes=[
+            # Status polls and provider callbacks look tasks up by the provider's id
+            ("idx_generated_content_provider_task",
+             "generated_content (provider_task_id) WHERE provider_task_id IS NOT NULL"),
+        ],
+    ),
+    Migration(
+        7, "brandfetch cache",
+        statements=[
+            # Shared tier of brandfetch_cache.py: raw responses (including 404s) by normalized identifier
+            """
+            CREATE TABLE IF NOT EXISTS brandfetch_cache (
+                identifier VARCHAR(255) PRIMARY KEY,
+                status_code INTEGER NOT NULL,
+                body TEXT,
+                fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    Migration(
+        8, "list version indexes",
+        indexes=[
+            # Conditional GETs fingerprint each dashboard list with count(*) + max(updated_at)
+            # per conversation; these make that an index-only scan
+            ("idx_brands_conversation_updated", "brands (conversation_id, updated_at)"),
+            ("idx_generated_content_conversation_updated", "generated_content (conversation_id, updated_at)"),
+            ("idx_scheduled_posts_conversation_updated", "scheduled_posts (conversation_id, updated_at)"),
+        ],
+    ),
+    Migration(
+        9, "generation request hash",
+        statements=[
+            # generation_dedup.py: hash of the inputs that produced a generated_content row
+            "ALTER TABLE generated_content ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64)",
+        ],
+    ),
+    Migration(
+        10, "generation request hash index",
+        indexes=[
+            ("idx_generated_content_request_hash",
+             "generated_content (conversation_id, request_hash, created_at) WHERE request_hash IS NOT NULL"),
+        ],
+    ),
+    Migration(
+        11, "job queue",
+        statements=[
+            # jobs.py: durable background jobs. run_after is when a queued job may
+            # start, or when a running job's lease (visibility timeout) expires.
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,
+                conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+                payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                dedup_key VARCHAR(64),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+                locked_by VARCHAR(255),
+                result JSONB,
+                error TEXT,
+                created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+                started_at TIMESTAMP,
+                completed_at TIMESTAMP
+            )
+            """,
+            # New table: plain (non-concurrent) index builds are instant
+            # Workers claim the oldest runnable job with FOR UPDATE SKIP LOCKED
+            """
+            CREATE INDEX IF NOT EXISTS idx_jobs_runnable
+            ON jobs (run_after, id) WHERE status IN ('queued', 'running')
+            """,
+            # At most one unfinished job per request fingerprint (enqueue attaches to it)
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup_unfinished
+            ON jobs (conversation_id, dedup_key) WHERE status IN ('queued', 'running')
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_conversation ON jobs (conversation_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (completed_at) WHERE status IN ('completed', 'failed')",
+        ],
+    ),
+    Migration(
+        12, "generating videos index",
+        indexes=[
+            # video_reconciler.py pages through the videos still generating
+            ("idx_generated_content_generating_videos",
+             "generated_content (id) WHERE content_type = 'ugc_video' AND status = 'generating'"),
+        ],
+    ),
+    Migration(
+        13, "revoked tokens",
+        statements=[
+            # token_cache.py: logouts, by SHA-256 of the token; expires_at NULL for tokens without exp
+            """
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                token_hash VARCHAR(64) PRIMARY KEY,
+                expires_at TIMESTAMP,
+                revoked_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at)",
+        ],
+    ),
+]
+
+
+def _ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def _drop_invalid_index(cur, name: str):
+    """Drop an index left INVALID by an interrupted CONCURRENTLY build."""
+    cur.execute("""
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+          AND c.relnamespace = current_schema()::regnamespace
+          AND NOT i.indisvalid
+    """, (name,))
+    if cur.fetchone():
+        print(f"⚠️  Rebuilding invalid index {name}")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def _apply(conn, migration: Migration):
+    cur = conn.cursor()
+    try:
+        if migration.concurrent:
+            conn.autocommit = True
+            for name, spec in migration.indexes:
+                _drop_invalid_index(cur, name)
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {spec}")
+            for name in migration.drop_indexes:
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            conn.autocommit = False
+
+        for statement in migration.statements:
+            cur.execute(statement)
+        if migration.func:
+            migration.func(conn)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+            (migration.version, migration.name),
+        )
+        conn.commit()
+    except Exception:
+        if not conn.autocommit:
+            conn.rollback()
+        conn.autocommit = False
+        raise
+    finally:
+        cur.close()
+
+
+def apply_migrations(target: int = None):
+    """Apply pending migrations in version order. Returns the versions applied."""
+    conn = get_connection()
+    cur = conn.cursor()
+    applied_now = []
+
+    try:
+        conn.autocommit = True
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        _ensure_migrations_table(cur)
+        done = _applied_versions(cur)
+        conn.autocommit = False
+
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in done:
+                continue
+            if target is not None and migration.version > target:
+                break
+            print(f"⏳ Applying migration {migration.version}: {migration.name}")
+            _apply(conn, migration)
+            applied_now.append(migration.version)
+            print(f"✅ Migration {migration.version} applied")
+
+        if not applied_now:
+            print("✅ Database schema is up to date")
+        return applied_now
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        try:
+            conn.rollback()
+            conn.autocommit = True
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        except Exception:
+            pass
+        cur.close()
+        conn.close()
+
+
+def migration_status():
+    """List every known migration with whether it has been applied."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        _ensure_migrations_table(cur)
+        conn.commit()
+        done = _applied_versions(cur)
+        return [
+            {"version": m.version, "name": m.name, "applied": m.version in done}
+            for m in sorted(MIGRATIONS, key=lambda m: m.version)
+        ]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def check_schema():
+    """Raise if the database is missing migrations (server startup)."""
+    pending = [row["version"] for row in migration_status() if not row["applied"]]
+    if pending:
+        raise RuntimeError(
+            f"database schema is missing migrations {pending}; run `python migrations.py` first"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        for row in migration_status():
+            mark = "✅" if row["applied"] else "⏳"
+            print(f"{mark} {row['version']:>4}  {row['name']}")
+    else:
+        apply_migrations()
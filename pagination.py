@@ -0,0 +1,50 @@
+"""
+Keyset (cursor) pagination helpers shared by the data layers and the API.
+
+A cursor is an opaque, URL-safe token holding the sort value and id of the
+last row of the previous page. Queries continue with a row comparison such
+as `(created_at, id) < (%s, %s)`, which an index on (..., created_at, id)
+answers directly, so page N costs the same as page 1.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat() if sort_value else None, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (sort_value, id) from a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor("invalid pagination cursor")
+
+
+def page_size(limit: int = None) -> int:
+    """Clamp a client-supplied page size to [1, MAX_PAGE_SIZE]."""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def paginate(rows: list, limit: int, sort_key: str = "created_at"):
+    """Split rows fetched with LIMIT limit + 1 into (page, next_cursor)."""
+    page = rows[:limit]
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(last[sort_key], last["id"])
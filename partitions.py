@@ -0,0 +1,231 @@
+"""
+Monthly range partitions for the messages table.
+
+Migration 4 turns messages into a table partitioned by month on
+created_at (messages_y2026m01, messages_y2026m02, ... plus a
+messages_default catch-all). After that:
+
+- ensure_partitions() creates the next PARTITION_MONTHS_AHEAD months
+  ahead of time, so inserts never land in the default partition. Rows
+  that did land there are moved into the new partition when it is
+  created.
+- apply_retention() detaches partitions older than
+  MESSAGES_RETENTION_MONTHS (0 = keep everything). Detached partitions
+  stay in the database as ordinary tables, ready to dump or drop. With
+  MESSAGES_RETENTION_MODE=drop they are dropped straight away.
+
+maintain_partitions() does both; the server runs it at startup and then
+daily.
+
+Usage:
+    python partitions.py            # create upcoming partitions, apply retention
+    python partitions.py status     # list partitions with row estimates
+"""
+
+import os
+import re
+import sys
+from datetime import date
+
+from database import get_connection
+
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+RETENTION_MONTHS = int(os.getenv("MESSAGES_RETENTION_MONTHS", "0"))
+RETENTION_MODE = os.getenv("MESSAGES_RETENTION_MODE", "detach")
+
+_PARTITION_NAME = re.compile(r"^(?P<parent>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month `offset` months after `day`'s month."""
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def parent_table(relname: str):
+    """Parent table of a partition named by this module, or None."""
+    match = _PARTITION_NAME.match(relname)
+    if match:
+        return match.group("parent")
+    if relname.endswith("_default"):
+        return relname[:-len("_default")]
+    return None
+
+
+def is_partitioned(cur, table: str) -> bool:
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def _partitions(cur, table: str):
+    """Monthly partitions currently attached to `table`, oldest first, as (name, month)."""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+    months = []
+    for (name,) in cur.fetchall():
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("parent") == table:
+            months.append((name, date(int(match.group("year")), int(match.group("month")), 1)))
+    return sorted(months, key=lambda p: p[1])
+
+
+def _create_partition(cur, table: str, month: date) -> bool:
+    """Create and attach the partition for `month`, moving its rows out of the default partition."""
+    name = partition_name(table, month)
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0]:
+        return False
+    lower, upper = month, month_start(month, 1)
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default
+            WHERE created_at >= %s AND created_at < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (lower, upper))
+    if cur.rowcount:
+        print(f"  moved {cur.rowcount:,} rows from {table}_default into {name}")
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (lower, upper))
+    return True
+
+
+def _ensure(cur, table: str, first: date, last: date):
+    created = []
+    month = first
+    while month <= last:
+        if _create_partition(cur, table, month):
+            created.append(partition_name(table, month))
+        month = month_start(month, 1)
+    return created
+
+
+def ensure_partitions(table: str = "messages", months_ahead: int = MONTHS_AHEAD):
+    """Create partitions from the current month through `months_ahead` months out."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if not is_partitioned(cur, table):
+            return []
+        today = date.today()
+        created = _ensure(cur, table, month_start(today), month_start(today, months_ahead))
+        conn.commit()
+        for name in created:
+            print(f"✅ Created partition {name}")
+        return created
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def apply_retention(table: str = "messages", retention_months: int = RETENTION_MONTHS, mode: str = RETENTION_MODE):
+    """Detach (or drop) monthly partitions that ended more than `retention_months` ago."""
+    if retention_months <= 0:
+        return []
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if not is_partitioned(cur, table):
+            return []
+        cutoff = month_start(date.today(), -retention_months)
+        expired = [name for name, month in _partitions(cur, table) if month < cutoff]
+        for name in expired:
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if mode == "drop":
+                cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        for name in expired:
+            print(f"🗄️  {'Dropped' if mode == 'drop' else 'Detached'} partition {name}")
+        return expired
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def maintain_partitions():
+    """Scheduler job: create upcoming partitions, then apply retention."""
+    try:
+        ensure_partitions()
+        apply_retention()
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {e}")
+
+
+def partition_messages(conn):
+    """Migration 4: rebuild messages as a monthly partitioned table, copying existing rows."""
+    cur = conn.cursor()
+    try:
+        if is_partitioned(cur, "messages"):
+            return
+        cur.execute("LOCK TABLE messages IN ACCESS EXCLUSIVE MODE")
+        cur.execute("SELECT min(created_at) FROM messages")
+        oldest = cur.fetchone()[0] or date.today()
+
+        cur.execute("ALTER TABLE messages RENAME TO messages_unpartitioned")
+        cur.execute("ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey")
+        cur.execute("DROP INDEX IF EXISTS idx_messages_conversation_created")
+        cur.execute("""
+            CREATE TABLE messages (
+                id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+                conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+                role VARCHAR(20) NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        cur.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+        cur.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+        cur.execute("CREATE INDEX idx_messages_conversation_created ON messages (conversation_id, created_at, id)")
+        _ensure(cur, "messages", month_start(oldest), month_start(date.today(), MONTHS_AHEAD))
+
+        cur.execute("""
+            INSERT INTO messages (id, conversation_id, role, content, created_at)
+            SELECT id, conversation_id, role, content, COALESCE(created_at, CURRENT_TIMESTAMP)
+            FROM messages_unpartitioned
+        """)
+        print(f"  copied {cur.rowcount:,} messages into monthly partitions")
+        cur.execute("DROP TABLE messages_unpartitioned")
+    finally:
+        cur.close()
+
+
+def partition_status(table: str = "messages"):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT c.relname, c.reltuples::bigint, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, (table,))
+        return [{"name": name, "rows": max(rows, 0), "bounds": bounds} for name, rows, bounds in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        for row in partition_status():
+            print(f"{row['name']:<24} {row['rows']:>12,}  {row['bounds']}")
+    else:
+        maintain_partitions()
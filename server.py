@@ -1,26 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from crewai import Agent, Task, Crew, LLM
 from brandfetch_tool import BrandfetchTool
+import asset_cache
+import brandfetch_cache
+import brand_cache
+import conditional
+import generation_dedup
+import http_client
+import job_worker
+import jobs
+import kie_callbacks
+import token_cache
 import os
 from dotenv import load_dotenv
 import uvicorn
 import json
 import re
+import time
 import jwt
 import bcrypt
+import httpx
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
-from database import save_brand, create_conversation, save_message, get_brand_by_domain, get_brands_by_conversation, get_all_brands, save_generated_content, get_generated_content_by_brand, get_generated_content_by_conversation, save_scheduled_post, get_scheduled_posts_by_conversation, get_due_scheduled_posts, update_scheduled_post_after_publish, save_conversation_x_account, get_conversation_x_account, create_user, get_user_by_username, save_video_generation_task, get_video_task_id, update_video_generation_status
+from database import get_pool, get_due_scheduled_posts, update_scheduled_post_after_publish
+from database import REPLICA_URLS, refresh_replica_lag
+import storage
+import task_poller
+import video_reconciler
+import workspace_io
+from partitions import maintain_partitions
+from pagination import DEFAULT_PAGE_SIZE, InvalidCursor, decode_cursor, encode_cursor, page_size, paginate
 from image_generator import generate_marketing_prompt, generate_ugc_image_nano_banana, upload_to_tmpfiles
-from video_generator import start_video_generation, check_video_status
+from video_generator import start_video_generation
 from twitter_utils import generate_caption_with_ai, post_to_twitter
 from fastapi import UploadFile, File, Form
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
@@ -28,6 +48,9 @@ load_dotenv()
 
 scheduler = BackgroundScheduler()
 
+# Job queue worker threads run in the API process (0 when job_worker.py processes are deployed)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
 
 def process_due_scheduled_posts():
     """Run by scheduler: post any due scheduled posts to X and update DB."""
@@ -50,10 +73,38 @@ def process_due_scheduled_posts():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler.add_job(process_due_scheduled_posts, "interval", minutes=1, id="scheduled_posts")
+    job_workers = None
+    await store.start()
+    await task_poller.poller.start()
+    await reconciler.start()
+    if store.name == "postgres":
+        maintain_partitions()
+        scheduler.add_job(process_due_scheduled_posts, "interval", minutes=1, id="scheduled_posts")
+        scheduler.add_job(lambda: get_pool().prune(), "interval", seconds=60, id="db_pool_prune")
+        scheduler.add_job(maintain_partitions, "interval", hours=24, id="partition_maintenance")
+        if REPLICA_URLS:
+            refresh_replica_lag()
+            scheduler.add_job(refresh_replica_lag, "interval", seconds=2, id="replica_lag")
+        scheduler.add_job(jobs.prune, "interval", hours=1, id="job_prune")
+        if JOB_WORKERS > 0:
+            job_workers = job_worker.WorkerPool(JOB_WORKERS).start()
     scheduler.start()
     yield
     scheduler.shutdown(wait=False)
+    if job_workers is not None:
+        job_workers.stop()
+    await reconciler.stop()
+    await task_poller.poller.stop()
+    await http_client.aclose()
+    await store.stop()
+
+
+store = storage.get_backend()
+if store.name != "postgres":
+    # The shared Brandfetch cache tier lives in Postgres
+    brandfetch_cache.cache.db = False
+
+reconciler = video_reconciler.VideoReconciler(store)
 
 
 app = FastAPI(title="IIT Gandhinagar Social Media Agent API", lifespan=lifespan)
@@ -81,6 +132,7 @@ app.add_middleware(
 # Auth: JWT and password hashing (bcrypt directly to avoid passlib/bcrypt version issues)
 JWT_SECRET = os.getenv("JWT_SECRET", "brandpilot-secret-change-in-production")
 JWT_ALGORITHM = "HS256"
+JWT_EXPIRES_SECONDS = int(os.getenv("JWT_EXPIRES_SECONDS", str(7 * 24 * 3600)))
 security = HTTPBearer(auto_error=False)
 
 
@@ -101,15 +153,35 @@ def _verify_password(password: str, password_hash: str) -> bool:
         return False
 
 
-def get_current_username(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    """Extract username from JWT. Raises 401 if missing or invalid."""
+def _issue_token(username: str, user_id) -> str:
+    now = time.time()
+    return jwt.encode(
+        {"username": username, "sub": str(user_id), "iat": now, "exp": int(now) + JWT_EXPIRES_SECONDS},
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM,
+    )
+
+
+async def get_current_username(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """Extract username from JWT. Raises 401 if missing or invalid.
+
+    Verified tokens are cached until their exp, so repeat requests skip jwt.decode.
+    """
     if not credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    token = credentials.credentials
+    username = token_cache.cache.get(token)
+    if username:
+        return username
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         username = payload.get("username")
         if not username:
             raise HTTPException(status_code=401, detail="Invalid token")
+        digest = token_cache.token_hash(token)
+        if token_cache.cache.is_revoked(digest) or await store.is_token_revoked(digest):
+            raise HTTPException(status_code=401, detail="Token revoked")
+        token_cache.cache.put(token, username, payload.get("exp"), digest)
         return username
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -180,20 +252,16 @@ async def signup(req: AuthRequest):
         raise HTTPException(status_code=400, detail="Username and password required")
     if len(username) < 2:
         raise HTTPException(status_code=400, detail="Username too short")
-    user = get_user_by_username(username)
+    user = await store.get_user_by_username(username)
     if user:
         raise HTTPException(status_code=400, detail="Username already taken")
     password_hash = _hash_password(password)
-    user_id = create_user(username, password_hash)
+    user_id = await store.create_user(username, password_hash)
     if not user_id:
         raise HTTPException(status_code=400, detail="Username already taken")
-    create_conversation(username)
+    await store.create_conversation(username)
     canonical = username.strip().lower()
-    token = jwt.encode(
-        {"username": canonical, "sub": str(user_id)},
-        JWT_SECRET,
-        algorithm=JWT_ALGORITHM,
-    )
+    token = _issue_token(canonical, user_id)
     return {"token": token, "username": canonical}
 
 
@@ -204,18 +272,62 @@ async def login(req: AuthRequest):
     password = req.password or ""
     if not username or not password:
         raise HTTPException(status_code=400, detail="Username and password required")
-    user = get_user_by_username(username)
+    user = await store.get_user_by_username(username)
     if not user or not _verify_password(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     canonical = user["username"]
-    token = jwt.encode(
-        {"username": canonical, "sub": str(user["id"])},
-        JWT_SECRET,
-        algorithm=JWT_ALGORITHM,
-    )
+    token = _issue_token(canonical, user["id"])
     return {"token": token, "username": canonical}
 
 
+@app.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security),
+                 username: str = Depends(get_current_username)):
+    """Revoke the presented token in every API process."""
+    exp = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("exp")
+    digest = token_cache.token_hash(credentials.credentials)
+    await store.revoke_token(digest, datetime.fromtimestamp(exp) if exp is not None else None)
+    token_cache.cache.revoke(digest, exp)
+    return {"username": username, "revoked": True}
+
+
+@app.get("/health/db-pool")
+async def db_pool_health():
+    """Connection pool size and saturation metrics, plus the message write-behind queue and replica lag."""
+    return store.stats()
+
+
+@app.get("/health/caches")
+async def cache_health():
+    """Hit/miss counters for the in-process caches."""
+    return {"brandfetch": brandfetch_cache.cache.stats(), "brand_profiles": brand_cache.stats(),
+            "tokens": token_cache.cache.stats(), "ugc_generations": generation_dedup.inflight.stats(),
+            "overlay_assets": asset_cache.logos.stats(), "http": http_client.stats(),
+            "kie_callbacks": kie_callbacks.waiters.stats(), "kie_poller": task_poller.poller.stats(),
+            "video_reconciler": reconciler.stats()}
+
+
+async def _brand_profile(brand_id: int):
+    # Misses read the primary: a lagging replica must not seed the cache with an old profile
+    return await brand_cache.cache.profile(brand_id, lambda: store.get_brand_profile(brand_id))
+
+
+async def _conversation_brands(conversation_id: str, limit: int, after: tuple, cached: bool = True):
+    if not cached:
+        return await store.get_brands_by_conversation(conversation_id, limit, after)
+    return await brand_cache.cache.conversation_brands(
+        conversation_id, limit, after, lambda: store.get_brands_by_conversation(conversation_id, limit, after)
+    )
+
+
+async def _list_headers(resource: str, conversation_id: str, *params):
+    """ETag / Last-Modified headers for a dashboard list, or None if its version could not be read."""
+    versions = await store.get_list_version(conversation_id, conditional.LIST_TABLES[resource])
+    if versions is None:
+        return None
+    return conditional.validators(versions, resource, conversation_id, *params)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     try:
@@ -320,14 +432,15 @@ def parse_brand_data_from_response(agent_response: str, raw_brandfetch_data: str
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, username: str = Depends(get_current_username)):
+async def chat(request: ChatRequest, response: Response, username: str = Depends(get_current_username)):
     try:
         # Use authenticated username as conversation key
         conversation_id = username
-        create_conversation(conversation_id)
+        # All writes for this request go out in one transaction at the end
+        uow = store.UnitOfWork(conversation_id)
         
         # Save user message
-        save_message(conversation_id, "user", request.message)
+        uow.add_message("user", request.message)
         
         task = Task(
             description=f"""
@@ -388,7 +501,7 @@ async def chat(request: ChatRequest, username: str = Depends(get_current_usernam
             response_text = str(result)
         
         # Save assistant message
-        save_message(conversation_id, "assistant", response_text)
+        uow.add_message("assistant", response_text)
         
         # Check if brand data was fetched (look for BrandSync Complete or brand analysis)
         brand_synced = False
@@ -410,10 +523,14 @@ async def chat(request: ChatRequest, username: str = Depends(get_current_usernam
             
             # Save to database if we have minimum required data
             if brand_data.get('brand_name') and brand_data.get('domain'):
-                brand_id = save_brand(conversation_id, brand_data)
-                if brand_id:
-                    brand_synced = True
-                    print(f"✅ Brand saved to database! ID: {brand_id}")
+                uow.add_brand(brand_data)
+        
+        await uow.commit()
+        response.headers["Server-Timing"] = f"db;dur={uow.db_time_ms:.1f}"
+        if uow.brand_ids and uow.brand_ids[0]:
+            brand_id = uow.brand_ids[0]
+            brand_synced = True
+            print(f"✅ Brand saved to database! ID: {brand_id}")
         
         return ChatResponse(
             response=response_text,
@@ -438,34 +555,131 @@ async def chat(request: ChatRequest, username: str = Depends(get_current_usernam
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _keyset(cursor: str = None):
+    """Decode a ?cursor= query param, rejecting tokens we did not issue."""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _history_page(conversation_id: str, limit: int, before: str, after: str, since: datetime):
+    """One window of a conversation's messages, oldest first.
+
+    No cursor: the latest `limit` messages. before=<before_cursor>: the page
+    of older messages. after=<after_cursor> or since=<timestamp>: only what
+    arrived since the client last synced; has_more means call again.
+    """
+    before_key = _keyset(before)
+    after_key = _keyset(after)
+    if since and not after_key:
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        after_key = (since, 2**31 - 1)  # everything strictly after `since`
+    size = page_size(limit)
+    rows = await store.get_conversation_history(conversation_id, size + 1, before_key, after_key)
+    has_more = len(rows) > size
+    if after_key:
+        messages = rows[:size]
+        older = bool(messages)
+    else:
+        messages = rows[1:] if has_more else rows  # the extra row is the oldest one
+        older, has_more = has_more, False
+    return {
+        "messages": messages,
+        "conversation_id": conversation_id,
+        "before_cursor": encode_cursor(messages[0]["created_at"], messages[0]["id"]) if older else None,
+        "after_cursor": (
+            encode_cursor(messages[-1]["created_at"], messages[-1]["id"]) if messages
+            else encode_cursor(*after_key) if after_key else None
+        ),
+        "has_more": has_more,
+    }
+
+
+@app.get("/messages/me")
+async def get_my_messages(limit: int = DEFAULT_PAGE_SIZE, before: str = None, after: str = None,
+                          since: datetime = None, username: str = Depends(get_current_username)):
+    """Get chat history for the authenticated user: latest messages, scroll-back, or delta since last sync."""
+    try:
+        return await _history_page(username, limit, before, after, since)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/messages/conversation/{conversation_id}")
+async def get_conversation_messages(conversation_id: str, limit: int = DEFAULT_PAGE_SIZE, before: str = None,
+                                    after: str = None, since: datetime = None,
+                                    username: str = Depends(get_current_username)):
+    """Get chat history for a conversation; only allowed for own username."""
+    if conversation_id != username:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        return await _history_page(conversation_id, limit, before, after, since)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/brands")
-async def get_brands():
-    """Get all saved brands"""
+async def get_brands(limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Get saved brands, newest first (pass next_cursor back as ?cursor= for the next page)"""
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        brands = get_all_brands()
-        return {"brands": brands}
+        brands, next_cursor = paginate(await store.get_all_brands(size + 1, after), size)
+        return {"brands": brands, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/brands/me")
-async def get_my_brands(username: str = Depends(get_current_username)):
-    """Get all brands for the authenticated user (username = conversation key)."""
+async def get_my_brands(request: Request, response: Response,
+                        limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+                        username: str = Depends(get_current_username)):
+    """Get brands for the authenticated user (username = conversation key), newest first."""
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        brands = get_brands_by_conversation(username)
-        return {"brands": brands, "username": username}
+        headers = await _list_headers("brands", username, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        # Pages served with an ETag skip the page cache: it can trail another worker's
+        # write by a NOTIFY round-trip, and a page older than its ETag stays "current"
+        brands, next_cursor = paginate(
+            await _conversation_brands(username, size + 1, after, cached=headers is None), size
+        )
+        response.headers.update(headers or {})
+        return {"brands": brands, "username": username, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/brands/conversation/{conversation_id}")
-async def get_conversation_brands(conversation_id: str, username: str = Depends(get_current_username)):
-    """Get all brands for a conversation; only allowed for own username."""
+async def get_conversation_brands(request: Request, response: Response,
+                                  conversation_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+                                  username: str = Depends(get_current_username)):
+    """Get brands for a conversation; only allowed for own username."""
     if conversation_id != username:
         raise HTTPException(status_code=403, detail="Forbidden")
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        brands = get_brands_by_conversation(conversation_id)
-        return {"brands": brands, "conversation_id": conversation_id}
+        headers = await _list_headers("brands", conversation_id, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        # Pages served with an ETag skip the page cache: it can trail another worker's
+        # write by a NOTIFY round-trip, and a page older than its ETag stays "current"
+        brands, next_cursor = paginate(
+            await _conversation_brands(conversation_id, size + 1, after, cached=headers is None), size
+        )
+        response.headers.update(headers or {})
+        return {"brands": brands, "conversation_id": conversation_id, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -474,7 +688,7 @@ async def get_conversation_brands(conversation_id: str, username: str = Depends(
 async def get_brand(domain: str):
     """Get a specific brand by domain"""
     try:
-        brand = get_brand_by_domain(domain)
+        brand = await store.get_brand_by_domain(domain)
         if not brand:
             raise HTTPException(status_code=404, detail="Brand not found")
         return brand
@@ -488,34 +702,12 @@ async def get_brand(domain: str):
 async def get_brand_details(brand_id: int):
     """Get detailed brand information by ID"""
     try:
-        from database import get_connection
-        from psycopg2.extras import RealDictCursor
-        
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get brand with colors and social links
-        cur.execute("""
-            SELECT b.*,
-                   array_agg(DISTINCT jsonb_build_object('name', bc.color_name, 'hex', bc.color_hex)) 
-                   FILTER (WHERE bc.id IS NOT NULL) as colors,
-                   array_agg(DISTINCT jsonb_build_object('platform', bs.platform, 'url', bs.url)) 
-                   FILTER (WHERE bs.id IS NOT NULL) as social_links
-            FROM brands b
-            LEFT JOIN brand_colors bc ON b.id = bc.brand_id
-            LEFT JOIN brand_social_links bs ON b.id = bs.brand_id
-            WHERE b.id = %s
-            GROUP BY b.id
-        """, (brand_id,))
-        
-        brand = cur.fetchone()
-        cur.close()
-        conn.close()
+        brand = await _brand_profile(brand_id)
         
         if not brand:
             raise HTTPException(status_code=404, detail="Brand not found")
         
-        return dict(brand)
+        return brand
     except HTTPException:
         raise
     except Exception as e:
@@ -526,86 +718,57 @@ async def get_brand_details(brand_id: int):
 async def generate_ugc_content(
     brand_id: int = Form(...),
     product_image: UploadFile = File(...),
+    force: bool = Form(False),
     username: str = Depends(get_current_username),
 ):
-    """Generate UGC marketing image for a brand"""
+    """Generate UGC marketing image for a brand.
+
+    On Postgres the generation runs as a background job: the response is 202
+    with a job_id to poll at /jobs/{job_id}. An identical request (same product
+    image, brand profile and prompt) within UGC_DEDUP_WINDOW returns the earlier
+    image, or the job still generating it; force=true always generates a new one.
+    """
     try:
         # Get brand details
-        from database import get_connection
-        from psycopg2.extras import RealDictCursor
-        
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT b.*,
-                   COALESCE(array_agg(DISTINCT jsonb_build_object('name', bc.color_name, 'hex', bc.color_hex)) 
-                   FILTER (WHERE bc.id IS NOT NULL), '{}') as colors
-            FROM brands b
-            LEFT JOIN brand_colors bc ON b.id = bc.brand_id
-            WHERE b.id = %s
-            GROUP BY b.id
-        """, (brand_id,))
-        
-        brand = cur.fetchone()
-        cur.close()
-        conn.close()
+        brand_data = await _brand_profile(brand_id)
         
-        if not brand:
+        if not brand_data:
             raise HTTPException(status_code=404, detail="Brand not found")
         
-        brand_data = dict(brand)
-        
-        # Save uploaded product image
-        import shutil
-        from pathlib import Path
-        import uuid
-        
-        # Generate unique filename
-        file_extension = product_image.filename.split('.')[-1]
-        unique_filename = f"{brand_id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-        
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(product_image.file, buffer)
-        
-        print(f"💾 Product image saved locally: {file_path}")
-        
-        # Upload to tmpfiles.org to get public URL
-        product_image_url = upload_to_tmpfiles(str(file_path))
-        
-        # Generate marketing image using Nano Banana Edit
-        print(f"🎨 Generating marketing image for {brand_data['brand_name']}...")
-        
-        result = generate_ugc_image_nano_banana(product_image_url, brand_data)
-        
-        if not result['success']:
-            raise HTTPException(status_code=500, detail="Image generation failed")
-        
-        generated_image_url = result['image_url']
-        prompt = result['prompt']
-        
-        # Save to database (username = conversation key)
-        content_id = save_generated_content(
-            brand_id=brand_id,
-            conversation_id=username,
-            product_image_url=product_image_url,
-            generated_image_url=generated_image_url,
-            prompt_used=prompt
-        )
-        
-        print(f"✅ Content saved to database! ID: {content_id}")
-        
-        return {
-            "success": True,
-            "content_id": content_id,
-            "product_image_url": product_image_url,
-            "generated_image_url": generated_image_url,
-            "prompt": prompt,
-            "task_id": result.get('task_id'),
-            "cost_time_ms": result.get('cost_time')
-        }
+        product_bytes = await product_image.read()
+        prompt = generate_marketing_prompt(brand_data)
+        request_hash = generation_dedup.request_hash(username, brand_data, product_bytes, prompt)
+        
+        if not force:
+            since = datetime.now() - timedelta(seconds=generation_dedup.WINDOW)
+            existing = await store.get_generated_content_by_hash(username, request_hash, since)
+            if existing:
+                print(f"♻️  Identical request: reusing generated content {existing['id']}")
+                return {
+                    "success": True,
+                    "content_id": existing['id'],
+                    "product_image_url": existing['product_image_url'],
+                    "generated_image_url": existing['generated_image_url'],
+                    "prompt": existing['prompt_used'],
+                    "task_id": existing.get('provider_task_id'),
+                    "cost_time_ms": None,
+                    "deduplicated": True,
+                }
+        
+        if store.name == "postgres":
+            return await _enqueue_ugc(brand_id, product_image.filename, product_bytes, username, request_hash, force)
+        
+        # Backends without the job queue generate in the request
+        def start():
+            return _generate_ugc(brand_id, brand_data, product_image.filename, product_bytes, username, request_hash)
+        
+        if force:
+            return {**await start(), "deduplicated": False}
+        result, attached = await generation_dedup.inflight.run(request_hash, start)
+        return {**result, "deduplicated": attached}
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -613,6 +776,94 @@ async def generate_ugc_content(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _upload_product_image(brand_id: int, filename: str, product_bytes: bytes) -> str:
+    """Save the product image locally and upload it to tmpfiles.org; returns its public URL."""
+    import uuid
+    
+    # Save uploaded product image
+    file_extension = filename.split('.')[-1]
+    unique_filename = f"{brand_id}_{uuid.uuid4().hex[:8]}.{file_extension}"
+    file_path = UPLOAD_DIR / unique_filename
+    file_path.write_bytes(product_bytes)
+    
+    print(f"💾 Product image saved locally: {file_path}")
+    
+    # Upload to tmpfiles.org to get public URL (blocking HTTP: off the event loop)
+    return await run_in_threadpool(upload_to_tmpfiles, str(file_path))
+
+
+async def _enqueue_ugc(brand_id: int, filename: str, product_bytes: bytes, username: str,
+                       request_hash: str, force: bool):
+    """Queue a generate_ugc job (or attach to the identical one still running); 202 with its id."""
+    dedup_key = None if force else request_hash
+    job = await jobs.get_unfinished_job(username, dedup_key) if dedup_key else None
+    created = False
+    if job is None:
+        product_image_url = await _upload_product_image(brand_id, filename, product_bytes)
+        job, created = await jobs.enqueue("generate_ugc", username, {
+            "brand_id": brand_id,
+            "product_image_url": product_image_url,
+            "request_hash": request_hash,
+        }, dedup_key=dedup_key)
+    print(f"📥 Generation job {job['id']} {'queued' if created else 'already in progress'}")
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "deduplicated": not created,
+    })
+
+
+async def _generate_ugc(brand_id: int, brand_data: dict, filename: str, product_bytes: bytes,
+                        username: str, request_hash: str):
+    """Upload the product image, run Nano Banana Edit and save the result."""
+    product_image_url = await _upload_product_image(brand_id, filename, product_bytes)
+    
+    # Generate marketing image using Nano Banana Edit
+    print(f"🎨 Generating marketing image for {brand_data['brand_name']}...")
+    
+    result = await run_in_threadpool(generate_ugc_image_nano_banana, product_image_url, brand_data)
+    
+    if not result['success']:
+        raise HTTPException(status_code=500, detail="Image generation failed")
+    
+    generated_image_url = result['image_url']
+    prompt = result['prompt']
+    
+    # Save to database (username = conversation key)
+    content_id = await store.save_generated_content(
+        brand_id=brand_id,
+        conversation_id=username,
+        product_image_url=product_image_url,
+        generated_image_url=generated_image_url,
+        prompt_used=prompt,
+        request_hash=request_hash,
+    )
+    
+    print(f"✅ Content saved to database! ID: {content_id}")
+    
+    return {
+        "success": True,
+        "content_id": content_id,
+        "product_image_url": product_image_url,
+        "generated_image_url": generated_image_url,
+        "prompt": prompt,
+        "task_id": result.get('task_id'),
+        "cost_time_ms": result.get('cost_time')
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: int, username: str = Depends(get_current_username)):
+    """Status of a background job; `result` is set once it has completed."""
+    if store.name != "postgres":
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await jobs.get_job(job_id, username)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.public(job)
+
+
 @app.post("/generate-video")
 async def generate_video_content(
     brand_id: int = Form(...),
@@ -624,31 +875,11 @@ async def generate_video_content(
     """Start video generation for a brand using Veo 3.1 API"""
     try:
         # Get brand details
-        from database import get_connection
-        from psycopg2.extras import RealDictCursor
-        
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT b.*,
-                   COALESCE(array_agg(DISTINCT jsonb_build_object('name', bc.color_name, 'hex', bc.color_hex)) 
-                   FILTER (WHERE bc.id IS NOT NULL), '{}') as colors
-            FROM brands b
-            LEFT JOIN brand_colors bc ON b.id = bc.brand_id
-            WHERE b.id = %s
-            GROUP BY b.id
-        """, (brand_id,))
+        brand_data = await _brand_profile(brand_id)
         
-        brand = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if not brand:
+        if not brand_data:
             raise HTTPException(status_code=404, detail="Brand not found")
         
-        brand_data = dict(brand)
-        
         # Save uploaded product image
         import shutil
         import uuid
@@ -662,30 +893,33 @@ async def generate_video_content(
         
         print(f"💾 Product image saved locally: {file_path}")
         
-        # Upload to tmpfiles.org to get public URL
-        product_image_url = upload_to_tmpfiles(str(file_path))
+        # Upload to tmpfiles.org to get public URL (blocking HTTP: off the event loop)
+        product_image_url = await run_in_threadpool(upload_to_tmpfiles, str(file_path))
         
         # Start video generation (async - returns task ID immediately)
         print(f"🎬 Starting video generation for {brand_data['brand_name']}...")
         
-        result = start_video_generation(product_image_url, brand_data, model, aspect_ratio)
+        result = await run_in_threadpool(start_video_generation, product_image_url, brand_data, model, aspect_ratio)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=result.get('error', 'Video generation failed'))
         
         # Save to database with status='generating'
-        content_id = save_video_generation_task(
+        content_id = await store.save_video_generation_task(
             brand_id=brand_id,
             conversation_id=username,
             product_image_url=product_image_url,
             prompt_used=result['prompt'],
-            video_task_id=result['task_id']
+            video_task_id=result['task_id'],
+            model=model,
+            aspect_ratio=aspect_ratio,
         )
         
         if not content_id:
             raise HTTPException(status_code=500, detail="Failed to save video task to database")
         
         print(f"✅ Video task saved to database! Content ID: {content_id}, Task ID: {result['task_id']}")
+        task_poller.poller.track(result['task_id'], "video", model, on_done=reconciler.finish)
         
         return {
             "success": True,
@@ -710,10 +944,10 @@ async def get_video_status(
     content_id: int,
     username: str = Depends(get_current_username),
 ):
-    """Check the status of a video generation task"""
+    """Status of a video generation task (read from the database only)"""
     try:
         # Get task info from database
-        task_info = get_video_task_id(content_id)
+        task_info = await store.get_video_task_id(content_id)
         
         if not task_info:
             raise HTTPException(status_code=404, detail="Video task not found")
@@ -727,6 +961,7 @@ async def get_video_status(
             return {
                 "status": "completed",
                 "video_url": task_info['video_url'],
+                "resolution": task_info['resolution'] or 'unknown',
                 "content_id": content_id
             }
         elif task_info['status'] == 'failed':
@@ -736,40 +971,13 @@ async def get_video_status(
                 "content_id": content_id
             }
         
-        # Otherwise, check with Veo API
-        video_task_id = task_info['video_task_id']
-        if not video_task_id:
-            raise HTTPException(status_code=500, detail="Missing video task ID")
-        
-        status_result = check_video_status(video_task_id)
-        
-        if status_result['status'] == 'completed':
-            # Update database with video URL
-            video_url = status_result.get('video_url')
-            update_video_generation_status(content_id, 'completed', video_url)
-            
-            return {
-                "status": "completed",
-                "video_url": video_url,
-                "resolution": status_result.get('resolution', 'unknown'),
-                "content_id": content_id
-            }
-        elif status_result['status'] == 'failed':
-            # Update database with failed status
-            update_video_generation_status(content_id, 'failed')
-            
-            return {
-                "status": "failed",
-                "error": status_result.get('error', 'Video generation failed'),
-                "content_id": content_id
-            }
-        else:
-            # Still generating
-            return {
-                "status": "generating",
-                "message": "Video is still being generated. Please check again in 15-30 seconds.",
-                "content_id": content_id
-            }
+        # Still generating: the task poller, the Kie.ai callback or the reconciler
+        # (video_reconciler.py) updates the row when the video is ready
+        return {
+            "status": "generating",
+            "message": "Video is still being generated. Please check again in 15-30 seconds.",
+            "content_id": content_id
+        }
         
     except HTTPException:
         raise
@@ -780,34 +988,83 @@ async def get_video_status(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/callbacks/kie/{kind}")
+async def kie_task_callback(kind: str, request: Request, ts: str = "", sig: str = ""):
+    """Completion callback for Kie.ai tasks created with a signed callBackUrl (see kie_callbacks.py)."""
+    if not kie_callbacks.verify(kind, ts, sig):
+        raise HTTPException(status_code=401, detail="Invalid callback signature")
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    
+    result = kie_callbacks.PARSERS[kind](body if isinstance(body, dict) else {})
+    if result is None:
+        return {"received": True}
+    print(f"📥 Kie.ai {kind} callback for task {result['task_id']}: {result['state']}")
+    
+    if kind == "video":
+        task_poller.poller.done(result['task_id'])
+        await reconciler.finish(result)
+    else:
+        # On Postgres the generation waiting on this task may run in any job worker process
+        if store.name == "postgres":
+            await kie_callbacks.notify(result)
+        else:
+            kie_callbacks.waiters.publish(result)
+    return {"received": True}
+
+
 @app.get("/brands/{brand_id}/generated-content")
-async def get_brand_generated_content(brand_id: int):
-    """Get all generated content for a brand"""
+async def get_brand_generated_content(brand_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Get generated content for a brand, newest first"""
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        content = get_generated_content_by_brand(brand_id)
-        return {"content": content}
+        content, next_cursor = paginate(await store.get_generated_content_by_brand(brand_id, size + 1, after), size)
+        return {"content": content, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/generated-content/me")
-async def get_my_generated_content(username: str = Depends(get_current_username)):
-    """Get all generated content for the authenticated user."""
+async def get_my_generated_content(request: Request, response: Response,
+                                   limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+                                   username: str = Depends(get_current_username)):
+    """Get generated content for the authenticated user, newest first."""
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        content = get_generated_content_by_conversation(username)
-        return {"content": content, "username": username}
+        headers = await _list_headers("generated_content", username, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        content, next_cursor = paginate(
+            await store.get_generated_content_by_conversation(username, size + 1, after), size
+        )
+        response.headers.update(headers or {})
+        return {"content": content, "username": username, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/generated-content/conversation/{conversation_id}")
-async def get_conversation_generated_content(conversation_id: str, username: str = Depends(get_current_username)):
-    """Get all generated content for a conversation; only allowed for own username."""
+async def get_conversation_generated_content(request: Request, response: Response,
+                                             conversation_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                             cursor: str = None, username: str = Depends(get_current_username)):
+    """Get generated content for a conversation; only allowed for own username."""
     if conversation_id != username:
         raise HTTPException(status_code=403, detail="Forbidden")
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        content = get_generated_content_by_conversation(conversation_id)
-        return {"content": content, "conversation_id": conversation_id}
+        headers = await _list_headers("generated_content", conversation_id, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        content, next_cursor = paginate(
+            await store.get_generated_content_by_conversation(conversation_id, size + 1, after), size
+        )
+        response.headers.update(headers or {})
+        return {"content": content, "conversation_id": conversation_id, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -820,22 +1077,11 @@ async def generate_caption(
     """Generate AI caption for social media post"""
     try:
         # Get brand details
-        from database import get_connection
-        from psycopg2.extras import RealDictCursor
-        
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("SELECT * FROM brands WHERE id = %s", (brand_id,))
-        brand = cur.fetchone()
-        cur.close()
-        conn.close()
+        brand_data = await _brand_profile(brand_id)
         
-        if not brand:
+        if not brand_data:
             raise HTTPException(status_code=404, detail="Brand not found")
         
-        brand_data = dict(brand)
-        
         # Generate caption
         caption = generate_caption_with_ai(brand_data)
         
@@ -876,8 +1122,8 @@ async def twitter_connect(username: str = Depends(get_current_username)):
         name = getattr(user, "name", user.screen_name)
         x_user_id = str(user.id) if getattr(user, "id", None) else None
 
-        create_conversation(username)
-        save_conversation_x_account(username, x_username, x_user_id)
+        await store.create_conversation(username)
+        await store.save_conversation_x_account(username, x_username, x_user_id)
 
         return {
             "success": True,
@@ -895,7 +1141,7 @@ async def twitter_connect(username: str = Depends(get_current_username)):
 async def twitter_connection(username: str = Depends(get_current_username)):
     """Return the X account linked to the authenticated user (if any)."""
     try:
-        row = get_conversation_x_account(username)
+        row = await store.get_conversation_x_account(username)
         if not row or not row.get("x_username"):
             return {"connected": False}
         return {
@@ -910,8 +1156,6 @@ async def twitter_connection(username: str = Depends(get_current_username)):
 @app.get("/twitter/user-insights")
 async def twitter_user_insights(username: str):
     """Fetch X user profile and stats from TweetAPI for the connected user"""
-    import requests as req
-
     api_key = os.getenv("TWEETAPI")
     if not api_key:
         raise HTTPException(
@@ -925,7 +1169,8 @@ async def twitter_user_insights(username: str):
     username = username.strip().lstrip("@")
 
     try:
-        r = req.get(
+        r = await http_client.async_request(
+            "GET",
             "https://api.tweetapi.com/tw-v2/user/by-username",
             params={"username": username},
             headers={"X-API-Key": api_key},
@@ -934,7 +1179,7 @@ async def twitter_user_insights(username: str):
         r.raise_for_status()
         data = r.json()
         return data
-    except req.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(status_code=404, detail="User not found")
         try:
@@ -945,15 +1190,13 @@ async def twitter_user_insights(username: str):
             )
         except Exception:
             raise HTTPException(status_code=e.response.status_code, detail=str(e))
-    except req.exceptions.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"TweetAPI error: {str(e)}")
 
 
 @app.get("/twitter/user-tweets")
 async def twitter_user_tweets(user_id: str):
     """Fetch recent tweets by user from TweetAPI (tw-v2/user/tweets)."""
-    import requests as req
-
     api_key = os.getenv("TWEETAPI")
     if not api_key:
         raise HTTPException(
@@ -967,7 +1210,8 @@ async def twitter_user_tweets(user_id: str):
     user_id = user_id.strip()
 
     try:
-        r = req.get(
+        r = await http_client.async_request(
+            "GET",
             "https://api.tweetapi.com/tw-v2/user/tweets",
             params={"userId": user_id},
             headers={"X-API-Key": api_key},
@@ -976,7 +1220,7 @@ async def twitter_user_tweets(user_id: str):
         r.raise_for_status()
         data = r.json()
         return data
-    except req.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(status_code=404, detail="User not found")
         try:
@@ -987,7 +1231,7 @@ async def twitter_user_tweets(user_id: str):
             )
         except Exception:
             raise HTTPException(status_code=e.response.status_code, detail=str(e))
-    except req.exceptions.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"TweetAPI error: {str(e)}")
 
 
@@ -999,22 +1243,7 @@ async def post_now(
 ):
     """Post immediately to X (Twitter) with the given content and caption."""
     try:
-        from database import get_connection
-        from psycopg2.extras import RealDictCursor
-
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(
-            """
-            SELECT gc.id, gc.generated_image_url
-            FROM generated_content gc
-            WHERE gc.id = %s AND gc.conversation_id = %s
-            """,
-            (content_id, username),
-        )
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        row = await store.get_generated_content_for_user(content_id, username)
         if not row:
             raise HTTPException(status_code=404, detail="Content not found or access denied")
         image_url = row.get("generated_image_url")
@@ -1047,7 +1276,10 @@ async def schedule_post(
     """Schedule a social media post for the authenticated user."""
     try:
         scheduled_dt = datetime.fromisoformat(scheduled_time.replace('Z', '+00:00'))
-        post_id = save_scheduled_post(
+        if scheduled_dt.tzinfo:
+            # scheduled_time is a naive UTC TIMESTAMP; asyncpg rejects aware datetimes for it
+            scheduled_dt = scheduled_dt.astimezone(timezone.utc).replace(tzinfo=None)
+        post_id = await store.save_scheduled_post(
             content_id=content_id,
             conversation_id=username,
             caption=caption,
@@ -1071,23 +1303,73 @@ async def schedule_post(
 
 
 @app.get("/scheduled-posts/me")
-async def get_my_scheduled_posts(username: str = Depends(get_current_username)):
-    """Get all scheduled posts for the authenticated user."""
+async def get_my_scheduled_posts(request: Request, response: Response,
+                                 limit: int = DEFAULT_PAGE_SIZE, cursor: str = None,
+                                 username: str = Depends(get_current_username)):
+    """Get scheduled posts for the authenticated user, soonest first."""
+    after = _keyset(cursor)
+    size = page_size(limit)
     try:
-        posts = get_scheduled_posts_by_conversation(username)
-        return {"posts": posts, "username": username}
+        headers = await _list_headers("scheduled_posts", username, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        posts, next_cursor = paginate(
+            await store.get_scheduled_posts_by_conversation(username, size + 1, after), size, "scheduled_time"
+        )
+        response.headers.update(headers or {})
+        return {"posts": posts, "username": username, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/scheduled-posts/conversation/{conversation_id}")
-async def get_conversation_scheduled_posts(conversation_id: str, username: str = Depends(get_current_username)):
+async def get_conversation_scheduled_posts(request: Request, response: Response,
+                                           conversation_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                           cursor: str = None, username: str = Depends(get_current_username)):
     """Get scheduled posts for a conversation; only allowed for own username."""
     if conversation_id != username:
         raise HTTPException(status_code=403, detail="Forbidden")
+    after = _keyset(cursor)
+    size = page_size(limit)
+    try:
+        headers = await _list_headers("scheduled_posts", conversation_id, size, cursor)
+        if headers and conditional.is_current(request.headers, headers):
+            return Response(status_code=304, headers=headers)
+        posts, next_cursor = paginate(
+            await store.get_scheduled_posts_by_conversation(conversation_id, size + 1, after), size, "scheduled_time"
+        )
+        response.headers.update(headers or {})
+        return {"posts": posts, "conversation_id": conversation_id, "next_cursor": next_cursor}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/workspace/export")
+async def export_my_workspace(username: str = Depends(get_current_username)):
+    """Stream the authenticated user's workspace (brands, content, posts, messages) as NDJSON."""
+    if store.name != "postgres":
+        raise HTTPException(status_code=501, detail="Workspace export needs the Postgres backend")
+    filename = f"{username}-{datetime.now():%Y%m%d-%H%M%S}.ndjson"
+    return StreamingResponse(
+        workspace_io.export_workspace(username),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/workspace/import")
+async def import_my_workspace(file: UploadFile = File(...), replace: bool = False,
+                              username: str = Depends(get_current_username)):
+    """Load a workspace export into the authenticated user's workspace (replace=true clears it first)."""
+    if store.name != "postgres":
+        raise HTTPException(status_code=501, detail="Workspace import needs the Postgres backend")
     try:
-        posts = get_scheduled_posts_by_conversation(conversation_id)
-        return {"posts": posts, "conversation_id": conversation_id}
+        counts = await workspace_io.import_workspace(workspace_io.iter_lines(file.read), username, replace)
+        return {"imported": counts, "username": username}
+    except workspace_io.WorkspaceNotEmpty as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except workspace_io.InvalidWorkspaceFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -29,7 +29,9 @@ try:
     # Now set up tables
     print("\nSetting up tables...")
     from database import setup_database
+    from migrations import apply_migrations
     setup_database()
+    apply_migrations()
     
 except psycopg2.OperationalError as e:
     print(f"❌ Error connecting to PostgreSQL: {e}")
@@ -0,0 +1,821 @@
+"""
+Embedded SQLite storage backend (STORAGE_BACKEND=sqlite).
+
+Same tables, columns and return values as the PostgreSQL schema, in one
+SQLite file (SQLITE_PATH) in WAL mode, so readers never wait for the
+writer. Queries run on a small thread pool with one connection per
+thread; write transactions start with BEGIN IMMEDIATE so concurrent
+writers queue on the lock (busy_timeout) instead of failing.
+
+Meant for load tests, profiling and CI. Postgres-only features (message
+write-behind, partitions, read replicas, the scheduled-post job) are not
+available on this backend.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import brand_cache
+from database import brand_records
+from storage import StorageBackend
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "brandsync.db")
+SQLITE_THREADS = int(os.getenv("SQLITE_THREADS", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Timestamps are stored as fixed-width ISO text, so they sort (and compare in keysets) correctly
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "microseconds"))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    conversation_id VARCHAR(255) UNIQUE NOT NULL,
+    started_at TIMESTAMP,
+    last_message_at TIMESTAMP,
+    status VARCHAR(50) DEFAULT 'active'
+);
+
+CREATE TABLE IF NOT EXISTS brands (
+    id INTEGER PRIMARY KEY,
+    conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+    brand_name VARCHAR(255) NOT NULL,
+    domain VARCHAR(255) NOT NULL,
+    logo_url TEXT,
+    product_service TEXT,
+    company_vibe TEXT,
+    target_audience TEXT,
+    industry VARCHAR(100),
+    description TEXT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    palette_hash TEXT,
+    UNIQUE(conversation_id, domain)
+);
+
+CREATE TABLE IF NOT EXISTS brand_colors (
+    id INTEGER PRIMARY KEY,
+    brand_id INTEGER REFERENCES brands(id) ON DELETE CASCADE,
+    color_name VARCHAR(50),
+    color_hex VARCHAR(7),
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS brand_social_links (
+    id INTEGER PRIMARY KEY,
+    brand_id INTEGER REFERENCES brands(id) ON DELETE CASCADE,
+    platform VARCHAR(50),
+    url TEXT,
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS generated_content (
+    id INTEGER PRIMARY KEY,
+    brand_id INTEGER REFERENCES brands(id) ON DELETE CASCADE,
+    conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+    content_type VARCHAR(50) DEFAULT 'ugc_image',
+    product_image_url TEXT,
+    generated_image_url TEXT,
+    prompt_used TEXT,
+    status VARCHAR(50) DEFAULT 'pending',
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    provider_task_id TEXT,
+    model TEXT,
+    aspect_ratio TEXT,
+    resolution TEXT,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    request_hash TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scheduled_posts (
+    id INTEGER PRIMARY KEY,
+    content_id INTEGER REFERENCES generated_content(id) ON DELETE CASCADE,
+    conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+    platform VARCHAR(50) DEFAULT 'twitter',
+    caption TEXT,
+    scheduled_time TIMESTAMP,
+    status VARCHAR(50) DEFAULT 'scheduled',
+    posted_at TIMESTAMP,
+    post_url TEXT,
+    error_message TEXT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id VARCHAR(255) REFERENCES conversations(conversation_id),
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS conversation_x_accounts (
+    id INTEGER PRIMARY KEY,
+    conversation_id VARCHAR(255) UNIQUE NOT NULL REFERENCES conversations(conversation_id),
+    x_username VARCHAR(255) NOT NULL,
+    x_user_id VARCHAR(255),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    token_hash VARCHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMP,
+    revoked_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created ON messages (conversation_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_brands_conversation_created ON brands (conversation_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_brands_created ON brands (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_brands_domain ON brands (domain, created_at);
+CREATE INDEX IF NOT EXISTS idx_brand_colors_brand ON brand_colors (brand_id);
+CREATE INDEX IF NOT EXISTS idx_brand_social_links_brand ON brand_social_links (brand_id);
+CREATE INDEX IF NOT EXISTS idx_generated_content_conversation_created ON generated_content (conversation_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_generated_content_brand_created ON generated_content (brand_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_generated_content_provider_task ON generated_content (provider_task_id)
+    WHERE provider_task_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_generated_content_generating_videos ON generated_content (id)
+    WHERE content_type = 'ugc_video' AND status = 'generating';
+CREATE INDEX IF NOT EXISTS idx_scheduled_posts_conversation_time ON scheduled_posts (conversation_id, scheduled_time, id);
+CREATE INDEX IF NOT EXISTS idx_scheduled_posts_due ON scheduled_posts (scheduled_time) WHERE status = 'scheduled';
+CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (LOWER(username));
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at);
+CREATE INDEX IF NOT EXISTS idx_brands_conversation_updated ON brands (conversation_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_generated_content_conversation_updated ON generated_content (conversation_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_scheduled_posts_conversation_updated ON scheduled_posts (conversation_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_generated_content_request_hash ON generated_content (conversation_id, request_hash, created_at)
+    WHERE request_hash IS NOT NULL;
+"""
+
+# Columns added after their table was first created: (table, column, type).
+# Added to existing files on start, before SCHEMA builds indexes on them.
+ADDED_COLUMNS = [
+    ("generated_content", "request_hash", "TEXT"),
+]
+
+
+def _create_schema(conn):
+    for table, column, column_type in ADDED_COLUMNS:
+        existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if existing and column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    conn.executescript(SCHEMA)
+
+
+BRAND_PROFILE_SQL = """
+    SELECT b.*,
+           (SELECT json_group_array(json_object('name', color_name, 'hex', color_hex))
+            FROM (SELECT color_name, color_hex FROM brand_colors WHERE brand_id = b.id ORDER BY id)
+           ) AS colors,
+           (SELECT json_group_array(json_object('platform', platform, 'url', url))
+            FROM (SELECT platform, url FROM brand_social_links WHERE brand_id = b.id ORDER BY id)
+           ) AS social_links
+    FROM brands b
+"""
+
+VIDEO_TASK_SQL = """
+    SELECT id AS content_id, provider_task_id AS video_task_id, prompt_used AS prompt,
+           status, generated_image_url AS video_url, conversation_id, model,
+           aspect_ratio, resolution, started_at, completed_at, created_at
+    FROM generated_content
+"""
+
+
+def _limit(limit):
+    return -1 if limit is None else limit
+
+
+def _brand(row):
+    if row is None:
+        return None
+    brand = dict(row)
+    brand['colors'] = json.loads(brand['colors'])
+    brand['social_links'] = json.loads(brand['social_links'])
+    return brand
+
+
+def _save_brands(cur, conversation_id: str, brands: list, records: list):
+    """Upsert brands; replace colors/social links only where palette_hash changed."""
+    now = datetime.now()
+    ids = {}
+    for record in records:
+        cur.execute("SELECT palette_hash FROM brands WHERE conversation_id = ? AND domain = ?",
+                    (conversation_id, record['domain']))
+        previous = cur.fetchone()
+        cur.execute("""
+            INSERT INTO brands (
+                conversation_id, brand_name, domain, logo_url,
+                product_service, company_vibe, target_audience,
+                industry, description, palette_hash, created_at, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (conversation_id, domain)
+            DO UPDATE SET
+                brand_name = excluded.brand_name,
+                logo_url = excluded.logo_url,
+                product_service = excluded.product_service,
+                company_vibe = excluded.company_vibe,
+                target_audience = excluded.target_audience,
+                industry = excluded.industry,
+                description = excluded.description,
+                palette_hash = excluded.palette_hash,
+                updated_at = excluded.updated_at
+            RETURNING id
+        """, (
+            conversation_id, record['brand_name'], record['domain'], record['logo_url'],
+            record['product_service'], record['company_vibe'], record['target_audience'],
+            record['industry'], record['description'], record['palette_hash'], now, now,
+        ))
+        brand_id = cur.fetchone()[0]
+        ids[record['domain']] = brand_id
+        if previous is not None and previous[0] == record['palette_hash']:
+            continue
+        cur.execute("DELETE FROM brand_colors WHERE brand_id = ?", (brand_id,))
+        cur.execute("DELETE FROM brand_social_links WHERE brand_id = ?", (brand_id,))
+        cur.executemany(
+            "INSERT INTO brand_colors (brand_id, color_name, color_hex, created_at) VALUES (?, ?, ?, ?)",
+            [(brand_id, c['name'], c['hex'], now) for c in record['colors']],
+        )
+        cur.executemany(
+            "INSERT INTO brand_social_links (brand_id, platform, url, created_at) VALUES (?, ?, ?, ?)",
+            [(brand_id, s['platform'], s['url'], now) for s in record['social_links']],
+        )
+    return [ids.get(b.get('domain')) for b in brands]
+
+
+class SQLiteUnitOfWork:
+    """UnitOfWork (see async_database.py) for the SQLite backend: one BEGIN IMMEDIATE transaction."""
+
+    def __init__(self, backend, conversation_id: str):
+        self.backend = backend
+        self.conversation_id = conversation_id
+        self.messages = []
+        self.brands = []
+        self.message_ids = []
+        self.brand_ids = []
+        self.statements = 0
+        self.db_time_ms = 0.0
+
+    def add_message(self, role: str, content: str):
+        self.messages.append((role, content, datetime.now()))
+
+    def add_brand(self, brand_data: dict):
+        self.brands.append(brand_data)
+
+    def _commit(self, cur):
+        last_message_at = max((m[2] for m in self.messages), default=datetime.now())
+        cur.execute("""
+            INSERT INTO conversations (conversation_id, started_at, last_message_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (conversation_id) DO UPDATE SET last_message_at = excluded.last_message_at
+        """, (self.conversation_id, datetime.now(), last_message_at))
+        message_ids = []
+        for role, content, created_at in self.messages:
+            cur.execute("""
+                INSERT INTO messages (conversation_id, role, content, created_at)
+                VALUES (?, ?, ?, ?)
+                RETURNING id
+            """, (self.conversation_id, role, content, created_at))
+            message_ids.append(cur.fetchone()[0])
+        brand_ids = []
+        records = brand_records(self.brands)
+        if records:
+            brand_ids = _save_brands(cur, self.conversation_id, self.brands, records)
+        return message_ids, brand_ids, 1 + len(self.messages) + len(records)
+
+    async def commit(self):
+        """Flush buffered writes. Returns False (and writes nothing) on error."""
+        if not self.messages and not self.brands:
+            return True
+        started = time.perf_counter()
+        try:
+            self.message_ids, self.brand_ids, statements = await self.backend._write(self._commit)
+            self.statements += statements
+            if self.brands:
+                brand_cache.invalidate(self.conversation_id)
+            self.messages, self.brands = [], []
+            return True
+        except Exception as e:
+            print(f"❌ Error committing writes for {self.conversation_id}: {e}")
+            return False
+        finally:
+            self.db_time_ms += (time.perf_counter() - started) * 1000
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite file in WAL mode."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH, threads: int = SQLITE_THREADS):
+        self.path = path
+        self.threads = threads
+        self._local = threading.local()
+        self._connections = []
+        self._executor = None
+        self.reads = 0
+        self.writes = 0
+
+    def UnitOfWork(self, conversation_id: str):
+        return SQLiteUnitOfWork(self, conversation_id)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None, check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            await self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _read(self, sql: str, params: tuple = (), one: bool = False):
+        def run():
+            cur = self._connection().execute(sql, params)
+            try:
+                return cur.fetchone() if one else cur.fetchall()
+            finally:
+                cur.close()
+        self.reads += 1
+        return await self._run(run)
+
+    async def _write(self, fn):
+        """Run fn(cursor) in one write transaction and return its result."""
+        def run():
+            conn = self._connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                result = fn(cur)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+        self.writes += 1
+        return await self._run(run)
+
+    async def _execute(self, sql: str, params: tuple = ()):
+        """Single-statement write; returns the first column of the first returned row, if any."""
+        def fn(cur):
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            return row[0] if row else None
+        return await self._write(fn)
+
+    async def start(self):
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="sqlite")
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: _create_schema(self._connection())
+        )
+        print(f"✅ SQLite storage ready at {self.path} (WAL, {self.threads} threads)")
+
+    async def stop(self):
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=True)
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self._local = threading.local()
+
+    def stats(self):
+        return {"backend": self.name, "path": self.path, "threads": self.threads,
+                "reads": self.reads, "writes": self.writes}
+
+    async def create_conversation(self, conversation_id: str):
+        try:
+            now = datetime.now()
+            return await self._execute("""
+                INSERT INTO conversations (conversation_id, started_at, last_message_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (conversation_id) DO NOTHING
+                RETURNING id
+            """, (conversation_id, now, now))
+        except Exception as e:
+            print(f"Error creating conversation: {e}")
+            return None
+
+    async def save_message(self, conversation_id: str, role: str, content: str):
+        def fn(cur):
+            now = datetime.now()
+            cur.execute("UPDATE conversations SET last_message_at = ? WHERE conversation_id = ?",
+                        (now, conversation_id))
+            cur.execute("""
+                INSERT INTO messages (conversation_id, role, content, created_at)
+                VALUES (?, ?, ?, ?)
+                RETURNING id
+            """, (conversation_id, role, content, now))
+            return cur.fetchone()[0]
+        try:
+            return await self._write(fn)
+        except Exception as e:
+            print(f"Error saving message: {e}")
+            return None
+
+    async def save_brands(self, conversation_id: str, brands: list):
+        records = brand_records(brands)
+        if not records:
+            return [None] * len(brands)
+        try:
+            ids = await self._write(lambda cur: _save_brands(cur, conversation_id, brands, records))
+            brand_cache.invalidate(conversation_id)
+            return ids
+        except Exception as e:
+            print(f"❌ Error saving brands: {e}")
+            return None
+
+    async def save_brand(self, conversation_id: str, brand_data: dict):
+        ids = await self.save_brands(conversation_id, [brand_data])
+        brand_id = ids[0] if ids else None
+        if brand_id:
+            print(f"✅ Brand saved successfully! Brand ID: {brand_id}")
+        return brand_id
+
+    async def get_brand_profile(self, brand_id: int, replica: bool = False):
+        try:
+            return _brand(await self._read(BRAND_PROFILE_SQL + " WHERE b.id = ?", (brand_id,), one=True))
+        except Exception as e:
+            print(f"Error retrieving brand {brand_id}: {e}")
+            return None
+
+    async def get_brand_by_domain(self, domain: str):
+        try:
+            return _brand(await self._read(BRAND_PROFILE_SQL + """
+                WHERE b.domain = ?
+                ORDER BY b.created_at DESC
+                LIMIT 1
+            """, (domain,), one=True))
+        except Exception as e:
+            print(f"Error retrieving brand: {e}")
+            return None
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 50,
+                                       before: tuple = None, after: tuple = None):
+        try:
+            keyset, params = "", [conversation_id]
+            if before:
+                keyset += " AND (created_at, id) < (?, ?)"
+                params += before
+            if after:
+                keyset += " AND (created_at, id) > (?, ?)"
+                params += after
+            order = "ASC" if after else "DESC"
+            rows = await self._read(f"""
+                SELECT id, role, content, created_at
+                FROM messages
+                WHERE conversation_id = ?{keyset}
+                ORDER BY created_at {order}, id {order}
+                LIMIT ?
+            """, (*params, limit))
+            messages = [dict(r) for r in rows]
+            return messages if after else messages[::-1]
+        except Exception as e:
+            print(f"Error retrieving conversation: {e}")
+            return []
+
+    async def get_all_brands(self, limit: int = None, after: tuple = None):
+        try:
+            keyset = "WHERE (created_at, id) < (?, ?)" if after else ""
+            rows = await self._read(f"""
+                SELECT id, brand_name, domain, logo_url, industry, created_at
+                FROM brands
+                {keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (*(after or ()), _limit(limit)))
+            return [dict(r) for r in rows]
+        except Exception as e:
+            print(f"Error retrieving brands: {e}")
+            return []
+
+    async def get_brands_by_conversation(self, conversation_id: str, limit: int = None, after: tuple = None):
+        try:
+            keyset = "AND (b.created_at, b.id) < (?, ?)" if after else ""
+            rows = await self._read(BRAND_PROFILE_SQL + f"""
+                WHERE b.conversation_id = ?
+                {keyset}
+                ORDER BY b.created_at DESC, b.id DESC
+                LIMIT ?
+            """, (conversation_id, *(after or ()), _limit(limit)))
+            return [_brand(r) for r in rows]
+        except Exception as e:
+            print(f"Error retrieving brands by conversation: {e}")
+            return []
+
+    async def save_generated_content(self, brand_id: int, conversation_id: str, product_image_url: str,
+                                     generated_image_url: str, prompt_used: str, content_type: str = 'ugc_image',
+                                     request_hash: str = None):
+        try:
+            now = datetime.now()
+            return await self._execute("""
+                INSERT INTO generated_content
+                (brand_id, conversation_id, content_type, product_image_url,
+                 generated_image_url, prompt_used, status, created_at, updated_at, request_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            """, (brand_id, conversation_id, content_type, product_image_url,
+                  generated_image_url, prompt_used, 'completed', now, now, request_hash))
+        except Exception as e:
+            print(f"Error saving generated content: {e}")
+            return None
+
+    async def get_generated_content_by_hash(self, conversation_id: str, request_hash: str, since):
+        try:
+            row = await self._read("""
+                SELECT * FROM generated_content
+                WHERE conversation_id = ? AND request_hash = ? AND created_at >= ?
+                  AND status = 'completed'
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (conversation_id, request_hash, since), one=True)
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error looking up generated content by hash: {e}")
+            return None
+
+    async def get_generated_content_by_brand(self, brand_id: int, limit: int = None, after: tuple = None):
+        try:
+            keyset = "AND (created_at, id) < (?, ?)" if after else ""
+            rows = await self._read(f"""
+                SELECT * FROM generated_content
+                WHERE brand_id = ?
+                {keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (brand_id, *(after or ()), _limit(limit)))
+            return [dict(r) for r in rows]
+        except Exception as e:
+            print(f"Error retrieving generated content: {e}")
+            return []
+
+    async def get_generated_content_by_conversation(self, conversation_id: str, limit: int = None,
+                                                    after: tuple = None):
+        try:
+            keyset = "AND (gc.created_at, gc.id) < (?, ?)" if after else ""
+            rows = await self._read(f"""
+                SELECT gc.*,
+                       b.brand_name,
+                       b.logo_url,
+                       b.industry,
+                       b.domain
+                FROM generated_content gc
+                JOIN brands b ON gc.brand_id = b.id
+                WHERE gc.conversation_id = ?
+                {keyset}
+                ORDER BY gc.created_at DESC, gc.id DESC
+                LIMIT ?
+            """, (conversation_id, *(after or ()), _limit(limit)))
+            return [dict(r) for r in rows]
+        except Exception as e:
+            print(f"Error retrieving generated content by conversation: {e}")
+            return []
+
+    async def get_generated_content_for_user(self, content_id: int, conversation_id: str):
+        row = await self._read("""
+            SELECT gc.id, gc.generated_image_url
+            FROM generated_content gc
+            WHERE gc.id = ? AND gc.conversation_id = ?
+        """, (content_id, conversation_id), one=True)
+        return dict(row) if row else None
+
+    async def save_scheduled_post(self, content_id: int, conversation_id: str, caption: str,
+                                  scheduled_time, platform: str = 'twitter'):
+        try:
+            now = datetime.now()
+            return await self._execute("""
+                INSERT INTO scheduled_posts
+                (content_id, conversation_id, platform, caption, scheduled_time,
+                 status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            """, (content_id, conversation_id, platform, caption, scheduled_time, 'scheduled', now, now))
+        except Exception as e:
+            print(f"Error saving scheduled post: {e}")
+            return None
+
+    async def get_scheduled_posts_by_conversation(self, conversation_id: str, limit: int = None,
+                                                  after: tuple = None):
+        try:
+            keyset = "AND (sp.scheduled_time, sp.id) > (?, ?)" if after else ""
+            rows = await self._read(f"""
+                SELECT sp.*, gc.generated_image_url, gc.product_image_url,
+                       b.brand_name
+                FROM scheduled_posts sp
+                JOIN generated_content gc ON sp.content_id = gc.id
+                JOIN brands b ON gc.brand_id = b.id
+                WHERE sp.conversation_id = ?
+                {keyset}
+                ORDER BY sp.scheduled_time ASC, sp.id ASC
+                LIMIT ?
+            """, (conversation_id, *(after or ()), _limit(limit)))
+            return [dict(r) for r in rows]
+        except Exception as e:
+            print(f"Error retrieving scheduled posts: {e}")
+            return []
+
+    async def get_list_version(self, conversation_id: str, tables: tuple):
+        try:
+            sql = " UNION ALL ".join(
+                f"SELECT '{table}', count(*), max(updated_at) FROM {table} WHERE conversation_id = ?"
+                for table in tables
+            )
+            rows = await self._read(sql, (conversation_id,) * len(tables))
+            # max() loses the column type, so the timestamp comes back as text
+            return [(table, count, datetime.fromisoformat(updated) if updated else None)
+                    for table, count, updated in rows]
+        except Exception as e:
+            print(f"Error reading list version: {e}")
+            return None
+
+    async def get_due_scheduled_posts(self, limit: int = 100):
+        try:
+            rows = await self._read("""
+                SELECT sp.id, sp.content_id, sp.conversation_id, sp.caption, sp.scheduled_time,
+                       gc.generated_image_url
+                FROM scheduled_posts sp
+                JOIN generated_content gc ON sp.content_id = gc.id
+                WHERE sp.status = 'scheduled'
+                  AND sp.scheduled_time <= ?
+                ORDER BY sp.scheduled_time ASC, sp.id ASC
+                LIMIT ?
+            """, (datetime.utcnow(), limit))
+            return [dict(r) for r in rows]
+        except Exception as e:
+            print(f"Error getting due scheduled posts: {e}")
+            return []
+
+    async def update_scheduled_post_after_publish(self, scheduled_post_id: int, success: bool,
+                                                  post_url: str = None, error_message: str = None):
+        try:
+            status = 'posted' if success else 'failed'
+            await self._execute("""
+                UPDATE scheduled_posts
+                SET status = ?, posted_at = ?, post_url = ?, error_message = ?, updated_at = ?
+                WHERE id = ?
+            """, (status, datetime.now() if success else None, post_url, error_message, datetime.now(),
+                  scheduled_post_id))
+        except Exception as e:
+            print(f"Error updating scheduled post {scheduled_post_id}: {e}")
+
+    async def save_conversation_x_account(self, conversation_id: str, x_username: str, x_user_id: str = None):
+        try:
+            now = datetime.now()
+            return await self._execute("""
+                INSERT INTO conversation_x_accounts (conversation_id, x_username, x_user_id, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (conversation_id) DO UPDATE SET
+                    x_username = excluded.x_username,
+                    x_user_id = excluded.x_user_id,
+                    updated_at = excluded.updated_at
+                RETURNING id
+            """, (conversation_id, x_username, x_user_id, now, now))
+        except Exception as e:
+            print(f"Error saving conversation X account: {e}")
+            return None
+
+    async def get_conversation_x_account(self, conversation_id: str):
+        try:
+            row = await self._read("""
+                SELECT x_username, x_user_id, created_at
+                FROM conversation_x_accounts
+                WHERE conversation_id = ?
+            """, (conversation_id,), one=True)
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting conversation X account: {e}")
+            return None
+
+    async def create_user(self, username: str, password_hash: str):
+        try:
+            return await self._execute("""
+                INSERT INTO users (username, password_hash, created_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (username) DO NOTHING
+                RETURNING id
+            """, (username.strip().lower(), password_hash, datetime.now()))
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            return None
+
+    async def revoke_token(self, token_hash: str, expires_at: datetime = None):
+        def fn(cur):
+            cur.execute("""
+                INSERT INTO revoked_tokens (token_hash, expires_at, revoked_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (token_hash) DO NOTHING
+            """, (token_hash, expires_at, datetime.now()))
+            cur.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (datetime.now(),))
+        await self._write(fn)
+
+    async def is_token_revoked(self, token_hash: str) -> bool:
+        row = await self._read("SELECT 1 FROM revoked_tokens WHERE token_hash = ?", (token_hash,), one=True)
+        return row is not None
+
+    async def get_user_by_username(self, username: str):
+        try:
+            row = await self._read(
+                "SELECT id, username, password_hash FROM users WHERE LOWER(username) = LOWER(?)",
+                (username.strip(),), one=True,
+            )
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting user: {e}")
+            return None
+
+    async def save_video_generation_task(self, brand_id: int, conversation_id: str, product_image_url: str,
+                                         prompt_used: str, video_task_id: str, model: str = None,
+                                         aspect_ratio: str = None):
+        try:
+            now = datetime.now()
+            return await self._execute("""
+                INSERT INTO generated_content
+                (brand_id, conversation_id, content_type, product_image_url,
+                 generated_image_url, prompt_used, status, provider_task_id, model,
+                 aspect_ratio, started_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            """, (brand_id, conversation_id, 'ugc_video', product_image_url, None, prompt_used,
+                  'generating', video_task_id, model, aspect_ratio, now, now, now))
+        except Exception as e:
+            print(f"Error saving video generation task: {e}")
+            return None
+
+    async def get_video_task_id(self, content_id: int):
+        try:
+            row = await self._read(VIDEO_TASK_SQL + " WHERE id = ? AND content_type = 'ugc_video'",
+                                   (content_id,), one=True)
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting video task ID: {e}")
+            return None
+
+    async def get_video_task_by_provider_id(self, video_task_id: str):
+        try:
+            row = await self._read(VIDEO_TASK_SQL + " WHERE provider_task_id = ?", (video_task_id,), one=True)
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting video task {video_task_id}: {e}")
+            return None
+
+    async def get_generating_video_tasks(self, after_id: int = 0, limit: int = 100):
+        try:
+            rows = await self._read(VIDEO_TASK_SQL + """
+                WHERE content_type = 'ugc_video' AND status = 'generating' AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, limit))
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting generating video tasks: {e}")
+            return []
+
+    async def update_video_generation_status(self, content_id: int, status: str, video_url: str = None,
+                                             resolution: str = None):
+        try:
+            now = datetime.now()
+            await self._execute("""
+                UPDATE generated_content
+                SET status = ?,
+                    generated_image_url = COALESCE(?, generated_image_url),
+                    resolution = COALESCE(?, resolution),
+                    completed_at = CASE WHEN ? IN ('completed', 'failed') THEN ? ELSE completed_at END,
+                    updated_at = ?
+                WHERE id = ? AND content_type = 'ugc_video'
+            """, (status, video_url, resolution, status, now, now, content_id))
+            return True
+        except Exception as e:
+            print(f"Error updating video generation status: {e}")
+            return False
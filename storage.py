@@ -0,0 +1,261 @@
+"""
+Storage backend used by the API routes.
+
+server.py talks to the database through one StorageBackend, chosen with
+STORAGE_BACKEND:
+
+- postgres (default): async_database.py (asyncpg) plus the psycopg2 pool,
+  the message write-behind log and read replicas.
+- sqlite: sqlite_storage.py, an embedded SQLite file in WAL mode with the
+  same tables and return values. No external services are needed, so the
+  server can be load-tested and profiled on a single box.
+
+Every backend implements the abstract methods below with the signatures and
+return values of the matching functions in async_database.py; a backend
+missing one cannot be instantiated.
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+import async_database as adb
+import brand_cache
+import database
+import message_log
+import migrations
+import token_cache
+
+BACKEND = os.getenv("STORAGE_BACKEND", "postgres").lower()
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends."""
+
+    name = None
+
+    # Request-scoped batch of writes: add_message(), add_brand(), await commit()
+    UnitOfWork = None
+
+    @abstractmethod
+    async def start(self):
+        """Open connections / create the schema (server startup)."""
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    @abstractmethod
+    async def create_conversation(self, conversation_id: str):
+        ...
+
+    @abstractmethod
+    async def save_message(self, conversation_id: str, role: str, content: str):
+        ...
+
+    @abstractmethod
+    async def save_brands(self, conversation_id: str, brands: list):
+        ...
+
+    @abstractmethod
+    async def save_brand(self, conversation_id: str, brand_data: dict):
+        ...
+
+    @abstractmethod
+    async def get_brand_profile(self, brand_id: int, replica: bool = False):
+        ...
+
+    @abstractmethod
+    async def get_brand_by_domain(self, domain: str):
+        ...
+
+    @abstractmethod
+    async def get_conversation_history(self, conversation_id: str, limit: int = 50,
+                                       before: tuple = None, after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def get_all_brands(self, limit: int = None, after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def get_brands_by_conversation(self, conversation_id: str, limit: int = None, after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def save_generated_content(self, brand_id: int, conversation_id: str, product_image_url: str,
+                                     generated_image_url: str, prompt_used: str, content_type: str = 'ugc_image',
+                                     request_hash: str = None):
+        ...
+
+    @abstractmethod
+    async def get_generated_content_by_hash(self, conversation_id: str, request_hash: str, since):
+        ...
+
+    @abstractmethod
+    async def get_generated_content_by_brand(self, brand_id: int, limit: int = None, after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def get_generated_content_by_conversation(self, conversation_id: str, limit: int = None,
+                                                    after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def get_generated_content_for_user(self, content_id: int, conversation_id: str):
+        ...
+
+    @abstractmethod
+    async def save_scheduled_post(self, content_id: int, conversation_id: str, caption: str,
+                                  scheduled_time, platform: str = 'twitter'):
+        ...
+
+    @abstractmethod
+    async def get_scheduled_posts_by_conversation(self, conversation_id: str, limit: int = None,
+                                                  after: tuple = None):
+        ...
+
+    @abstractmethod
+    async def get_list_version(self, conversation_id: str, tables: tuple):
+        ...
+
+    @abstractmethod
+    async def get_due_scheduled_posts(self, limit: int = 100):
+        ...
+
+    @abstractmethod
+    async def update_scheduled_post_after_publish(self, scheduled_post_id: int, success: bool,
+                                                  post_url: str = None, error_message: str = None):
+        ...
+
+    @abstractmethod
+    async def save_conversation_x_account(self, conversation_id: str, x_username: str, x_user_id: str = None):
+        ...
+
+    @abstractmethod
+    async def get_conversation_x_account(self, conversation_id: str):
+        ...
+
+    @abstractmethod
+    async def create_user(self, username: str, password_hash: str):
+        ...
+
+    @abstractmethod
+    async def get_user_by_username(self, username: str):
+        ...
+
+    @abstractmethod
+    async def revoke_token(self, token_hash: str, expires_at=None):
+        ...
+
+    @abstractmethod
+    async def is_token_revoked(self, token_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def save_video_generation_task(self, brand_id: int, conversation_id: str, product_image_url: str,
+                                         prompt_used: str, video_task_id: str, model: str = None,
+                                         aspect_ratio: str = None):
+        ...
+
+    @abstractmethod
+    async def get_video_task_id(self, content_id: int):
+        ...
+
+    @abstractmethod
+    async def get_video_task_by_provider_id(self, video_task_id: str):
+        ...
+
+    @abstractmethod
+    async def get_generating_video_tasks(self, after_id: int = 0, limit: int = 100):
+        ...
+
+    @abstractmethod
+    async def update_video_generation_status(self, content_id: int, status: str, video_url: str = None,
+                                             resolution: str = None):
+        ...
+
+
+class PostgresBackend(StorageBackend):
+    """PostgreSQL through async_database.py (asyncpg) and database.py (psycopg2)."""
+
+    name = "postgres"
+    UnitOfWork = adb.UnitOfWork
+
+    async def start(self):
+        # Later code relies on migrated columns and tables; refuse to serve on an old schema
+        migrations.check_schema()
+        try:
+            database.get_pool().prefill()
+        except Exception as e:
+            print(f"⚠️  Could not prefill database pool: {e}")
+        # Not caught: with MESSAGE_WRITE_BEHIND on, chat messages would silently not be saved
+        await message_log.start(await adb.init_pool())
+        # Writes in other API / job worker processes count for read-your-writes replica routing
+        database.replicas.start_sharing(database.DATABASE_URL)
+        # Brand writes in other workers invalidate this worker's cache
+        await brand_cache.start_listener(adb.connect)
+        # Logouts in other workers evict the token from this worker's cache
+        await token_cache.start_listener(adb.connect)
+
+    async def stop(self):
+        await token_cache.stop_listener()
+        await brand_cache.stop_listener()
+        await message_log.stop()
+        await adb.close_pool()
+        database.close_pool()
+
+    def stats(self):
+        return {"sync": database.pool_stats(), "async": adb.pool_stats(), "message_log": message_log.stats(),
+                "replicas": database.replicas.stats()}
+
+    create_conversation = staticmethod(adb.create_conversation)
+    save_message = staticmethod(adb.save_message)
+    save_brands = staticmethod(adb.save_brands)
+    save_brand = staticmethod(adb.save_brand)
+    get_brand_profile = staticmethod(adb.get_brand_profile)
+    get_brand_by_domain = staticmethod(adb.get_brand_by_domain)
+    get_conversation_history = staticmethod(adb.get_conversation_history)
+    get_all_brands = staticmethod(adb.get_all_brands)
+    get_brands_by_conversation = staticmethod(adb.get_brands_by_conversation)
+    save_generated_content = staticmethod(adb.save_generated_content)
+    get_generated_content_by_brand = staticmethod(adb.get_generated_content_by_brand)
+    get_generated_content_by_conversation = staticmethod(adb.get_generated_content_by_conversation)
+    get_generated_content_by_hash = staticmethod(adb.get_generated_content_by_hash)
+    get_generated_content_for_user = staticmethod(adb.get_generated_content_for_user)
+    save_scheduled_post = staticmethod(adb.save_scheduled_post)
+    get_scheduled_posts_by_conversation = staticmethod(adb.get_scheduled_posts_by_conversation)
+    get_list_version = staticmethod(adb.get_list_version)
+    get_due_scheduled_posts = staticmethod(adb.get_due_scheduled_posts)
+    update_scheduled_post_after_publish = staticmethod(adb.update_scheduled_post_after_publish)
+    save_conversation_x_account = staticmethod(adb.save_conversation_x_account)
+    get_conversation_x_account = staticmethod(adb.get_conversation_x_account)
+    create_user = staticmethod(adb.create_user)
+    get_user_by_username = staticmethod(adb.get_user_by_username)
+    revoke_token = staticmethod(adb.revoke_token)
+    is_token_revoked = staticmethod(adb.is_token_revoked)
+    save_video_generation_task = staticmethod(adb.save_video_generation_task)
+    get_video_task_id = staticmethod(adb.get_video_task_id)
+    get_video_task_by_provider_id = staticmethod(adb.get_video_task_by_provider_id)
+    get_generating_video_tasks = staticmethod(adb.get_generating_video_tasks)
+    update_video_generation_status = staticmethod(adb.update_video_generation_status)
+
+
+_backend = None
+
+
+def get_backend() -> StorageBackend:
+    """The backend selected by STORAGE_BACKEND (created on first use)."""
+    global _backend
+    if _backend is None:
+        if BACKEND == "sqlite":
+            from sqlite_storage import SQLiteBackend
+            _backend = SQLiteBackend()
+        elif BACKEND == "postgres":
+            _backend = PostgresBackend()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {BACKEND!r} (expected 'postgres' or 'sqlite')")
+    return _backend
@@ -0,0 +1,314 @@
+"""
+One asyncio poller per process for every Kie.ai task still in flight.
+
+Instead of each generation polling its own task on a fixed interval,
+generations register the task (`poller.track`) and wait for the result
+(kie_callbacks.waiters, or an on_done coroutine such as the video row
+update). The poller schedules one status check per task at a time:
+
+- the first check comes when the task should be about done: 60% of the
+  model's expected latency, which starts from a per-model default and
+  follows the completion times seen since (moving average);
+- every "still running" answer pushes the next check out by 1.5x, from
+  a fifth of the expected latency up to KIE_POLL_MAX_INTERVAL, with
+  +/-20% jitter so tasks started together spread out;
+- while Kie.ai callbacks are on (kie_callbacks.py) checks are only a
+  fallback and are never closer than KIE_FALLBACK_POLL_INTERVAL;
+- a check that fails (Kie.ai down, timeouts) counts as "still running".
+  Only Kie.ai itself can fail a task; image tasks stop being tracked
+  after MAX_TRACK_AGE and videos when video_reconciler.py expires them.
+
+Kie.ai has no batch status endpoint, so checks due at the same time go
+out together as one concurrent batch, capped by a global budget of
+KIE_POLL_BUDGET status requests per second (token bucket). When more are
+due than the budget allows, the rest move back; the provider request
+rate stays at or below the budget however many generations are running,
+and each task is just checked less often.
+
+The API runs the poller on its event loop; job_worker.py processes run
+one on a background thread.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import http_client
+import kie_callbacks
+
+KIE_API_BASE = os.getenv("KIE_API_BASE", "https://api.kie.ai").rstrip("/")
+BUDGET = float(os.getenv("KIE_POLL_BUDGET", "10"))
+MIN_INTERVAL = float(os.getenv("KIE_POLL_MIN_INTERVAL", "2"))
+MAX_INTERVAL = float(os.getenv("KIE_POLL_MAX_INTERVAL", "60"))
+
+# Typical seconds from createTask to result; refined by observed completions
+DEFAULT_LATENCY = {"google/nano-banana-edit": 20, "veo3_fast": 90, "veo3": 180}
+FALLBACK_LATENCY = 30
+MAX_TRACK_AGE = {"image": 300}  # videos are tracked until video_reconciler.py expires them
+
+STATUS_URLS = {
+    "image": f"{KIE_API_BASE}/api/v1/jobs/recordInfo",
+    "video": f"{KIE_API_BASE}/api/v1/veo/record-info",
+}
+STATUS_PARSERS = {"image": kie_callbacks.parse_image, "video": kie_callbacks.parse_video_record}
+
+
+class TaskPoller:
+    """Tracks in-flight Kie.ai tasks and checks them under one request budget."""
+
+    def __init__(self, budget: float = BUDGET):
+        self.budget = budget
+        self._tasks = {}  # task_id -> task
+        self._finished = OrderedDict()  # recently finished task ids, not to be tracked again
+        self._heap = []  # (due, seq, task_id)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._latency = dict(DEFAULT_LATENCY)
+        self._loop = None
+        self._wake = None
+        self._runner = None
+        self._tokens = budget
+        self._refilled = time.monotonic()
+        self.checks = 0
+        self.completed = 0
+        self.deferred = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    # --- Registration (any thread) ---
+
+    def expected_latency(self, model: str) -> float:
+        return self._latency.get(model, FALLBACK_LATENCY)
+
+    def _interval(self, task: dict) -> float:
+        base = max(MIN_INTERVAL, self.expected_latency(task["model"]) / 5)
+        interval = min(MAX_INTERVAL, base * 1.5 ** task["checks"])
+        if kie_callbacks.enabled():
+            interval = max(interval, kie_callbacks.FALLBACK_POLL_INTERVAL)
+        return interval * random.uniform(0.8, 1.2)
+
+    def _schedule(self, task: dict, delay: float):
+        task["interval"] = delay
+        task["due"] = time.monotonic() + delay
+        heapq.heappush(self._heap, (task["due"], next(self._seq), task["task_id"]))
+
+    def track(self, task_id: str, kind: str, model: str, on_done=None, age: float = 0) -> bool:
+        """Start checking a task. False if the poller isn't running in this process.
+
+        on_done(result) gets the normalised result (see kie_callbacks); it may be a
+        coroutine function. The default hands it to kie_callbacks.waiters. `age` is
+        how many seconds ago the task was created, for tasks picked up late.
+        """
+        if not self.running:
+            return False
+        with self._lock:
+            if task_id not in self._tasks and task_id not in self._finished:
+                task = {"task_id": task_id, "kind": kind, "model": model, "on_done": on_done,
+                        "started": time.monotonic() - age, "checks": 0, "errors": 0}
+                self._tasks[task_id] = task
+                first = self.expected_latency(model) * 0.6
+                if kie_callbacks.enabled():
+                    first = max(first, kie_callbacks.FALLBACK_POLL_INTERVAL)
+                self._schedule(task, max(0 if age else MIN_INTERVAL, first - age))
+        self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def tracking(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def done(self, task_id: str, completed: bool = True):
+        """Stop tracking a task whose result arrived some other way (callback) or that was given up on.
+
+        A task given up on (completed=False) can be tracked again, e.g. by a retried job.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if completed:
+                self._finish(task_id)
+            else:
+                self._tasks.pop(task_id, None)
+        if task is not None and completed:
+            self._observe(task)
+
+    def _finish(self, task_id: str):
+        self._tasks.pop(task_id, None)
+        self._finished[task_id] = True
+        if len(self._finished) > 1000:
+            self._finished.popitem(last=False)
+
+    def _observe(self, task: dict, elapsed: float = None):
+        if elapsed is None:
+            elapsed = time.monotonic() - task["started"]
+        model = task["model"]
+        self._latency[model] = 0.8 * self.expected_latency(model) + 0.2 * elapsed
+
+    # --- Loop ---
+
+    async def start(self):
+        """Run on the current event loop (API lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+        print(f"✅ Kie.ai task poller started (budget {self.budget:g} checks/s)")
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def start_in_thread(self):
+        """Run on a private event loop in a daemon thread (job worker processes)."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="kie-task-poller", daemon=True).start()
+        started.wait()
+        return self
+
+    def _take_tokens(self, wanted: int) -> int:
+        now = time.monotonic()
+        self._tokens = min(self.budget, self._tokens + (now - self._refilled) * self.budget)
+        self._refilled = now
+        granted = min(wanted, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+    def _due_tasks(self):
+        """Pop every task due now; returns (due tasks, seconds until the next one)."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_at, _, task_id = heapq.heappop(self._heap)
+                task = self._tasks.get(task_id)
+                if task is None or task["due"] != due_at:
+                    continue  # finished, or rescheduled since
+                max_age = MAX_TRACK_AGE.get(task["kind"])
+                if max_age is not None and now - task["started"] > max_age:
+                    self._tasks.pop(task_id, None)
+                    print(f"⚠️  Stopped polling Kie.ai task {task_id}: no result after {max_age}s")
+                    continue
+                due.append(task)
+            next_in = self._heap[0][0] - now if self._heap else None
+        return due, next_in
+
+    async def _run(self):
+        checks = set()
+        while True:
+            self._wake.clear()
+            due, next_in = self._due_tasks()
+            if due:
+                batch = due[:self._take_tokens(len(due))]
+                if len(batch) < len(due):
+                    # Over budget: spread the rest over the next seconds
+                    self.deferred += len(due) - len(batch)
+                    with self._lock:
+                        for i, task in enumerate(due[len(batch):]):
+                            self._schedule(task, i // max(1, int(self.budget)) + 1)
+                for task in batch:
+                    check = asyncio.create_task(self._check(task))
+                    checks.add(check)
+                    check.add_done_callback(checks.discard)
+                await asyncio.sleep(0 if batch else 1 / self.budget)
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=next_in)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _status(self, kind: str, task_id: str):
+        self.checks += 1
+        response = await http_client.async_request(
+            "GET", STATUS_URLS[kind], params={"taskId": task_id},
+            headers={"Authorization": f"Bearer {os.getenv('KIE_API_KEY', '')}"},
+        )
+        response.raise_for_status()
+        body = response.json()
+        if body.get("code") != 200:
+            raise Exception(f"Failed to query task: {body.get('msg')}")
+        return STATUS_PARSERS[kind](body)
+
+    async def status(self, kind: str, task_id: str):
+        """One status check outside the schedule, within the same budget.
+
+        Returns the normalised result, or None while the task is still running.
+        """
+        while not self._take_tokens(1):
+            await asyncio.sleep(1 / self.budget)
+        return await self._status(kind, task_id)
+
+    async def _check(self, task: dict):
+        task["checks"] += 1
+        result = None
+        try:
+            result = await self._status(task["kind"], task["task_id"])
+            task["errors"] = 0
+        except Exception as e:
+            # Not a result: check again later (with the usual backoff)
+            self.errors += 1
+            task["errors"] += 1
+            print(f"⚠️  Status check for Kie.ai task {task['task_id']} failed ({task['errors']} in a row): {e}")
+
+        with self._lock:
+            if self._tasks.get(task["task_id"]) is not task:
+                return  # finished elsewhere meanwhile
+            if result is None:
+                self._schedule(task, self._interval(task))
+            else:
+                self._finish(task["task_id"])
+        if result is None:
+            self._wake.set()  # the loop may be idle with nothing else scheduled
+            return
+        if result["state"] == "success":
+            # The task finished somewhere within the last interval; Kie.ai reports costTime for images
+            elapsed = time.monotonic() - task["started"] - task["interval"] / 2
+            self._observe(task, result["cost_time"] / 1000 if result.get("cost_time") else max(0, elapsed))
+        self.completed += 1
+        await self._deliver(task, result)
+
+    async def _deliver(self, task: dict, result: dict):
+        try:
+            if task["on_done"] is None:
+                kie_callbacks.waiters.publish(result)
+            else:
+                outcome = task["on_done"](result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+        except Exception as e:
+            print(f"❌ Could not deliver result of Kie.ai task {task['task_id']}: {e}")
+
+    def stats(self):
+        by_kind = {}
+        for task in list(self._tasks.values()):
+            by_kind[task["kind"]] = by_kind.get(task["kind"], 0) + 1
+        return {
+            "running": self.running,
+            "budget_per_second": self.budget,
+            "tracked": by_kind,
+            "checks": self.checks,
+            "completed": self.completed,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "expected_latency_s": {model: round(seconds, 1) for model, seconds in self._latency.items()},
+        }
+
+
+poller = TaskPoller()
@@ -0,0 +1,155 @@
+"""
+Cache of verified JWTs for get_current_username.
+
+After a token's signature and claims have been checked once, its
+username is kept until the token's own exp, so later requests with the
+same token cost a dict lookup instead of an HMAC verification. Tokens
+issued before exp was added have none; those are re-verified every
+LEGACY_TTL seconds.
+
+Revocation (logout) is stored in the revoked_tokens table by SHA-256 of
+the token, which get_current_username checks whenever it verifies a
+token. The revoking process also sends NOTIFY token_revocations
+'<hash>' and each process LISTENs (start_listener) and drops the token
+from its cache, so a revoked token stops working in every worker. While
+the listener is disconnected nothing is served from the cache.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+
+MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+LEGACY_TTL = float(os.getenv("TOKEN_CACHE_LEGACY_TTL", "300"))
+
+CHANNEL = "token_revocations"
+
+
+def token_hash(token: str) -> str:
+    """How revoked tokens are stored and announced (never the token itself)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """token -> (username, expires_at, token_hash), bounded, oldest evicted first."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._tokens = {}
+        self._revoked = {}  # token_hash -> expires_at
+        # While False (no LISTEN connection in a multi-worker setup) nothing is cached
+        self.listening = True
+        self.hits = 0
+        self.misses = 0
+        self.notifications = 0
+
+    def get(self, token: str):
+        """Username for a cached, unexpired token, else None."""
+        entry = self._tokens.get(token) if self.listening else None
+        if entry is not None and entry[1] > time.time():
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, username: str, exp=None, digest: str = None):
+        now = time.time()
+        expires_at = float(exp) if exp is not None else now + LEGACY_TTL
+        if expires_at <= now or not self.listening:
+            return
+        if len(self._tokens) >= self.max_entries:
+            # Dicts keep insertion order: drop the oldest entry
+            self._tokens.pop(next(iter(self._tokens)), None)
+        self._tokens[token] = (username, expires_at, digest or token_hash(token))
+
+    def is_revoked(self, digest: str) -> bool:
+        return digest in self._revoked
+
+    def evict(self, digest: str):
+        """Drop the token with this hash from the cache; the next request re-verifies it."""
+        for token in [t for t, entry in self._tokens.items() if entry[2] == digest]:
+            self._tokens.pop(token, None)
+
+    def revoke(self, digest: str, exp=None):
+        """Reject the token with this hash in this process (kept until its exp)."""
+        self.evict(digest)
+        now = time.time()
+        self._revoked = {d: e for d, e in self._revoked.items() if e > now}
+        # Legacy tokens never expire; after LEGACY_TTL the revoked_tokens row keeps rejecting them
+        self._revoked[digest] = float(exp) if exp is not None else now + LEGACY_TTL
+
+    def clear(self):
+        self._tokens.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "listening": self.listening,
+            "entries": len(self._tokens),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "revoked": len(self._revoked),
+            "notifications": self.notifications,
+        }
+
+
+cache = VerifiedTokenCache()
+
+
+async def notify(conn, digest: str):
+    """Queue a cross-process revocation on `conn` (asyncpg); sent when its transaction commits."""
+    await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, digest)
+
+
+def _on_notification(connection, pid, channel, payload):
+    # revoked_tokens is authoritative and checked on every cache miss, so evicting is enough
+    cache.notifications += 1
+    cache.evict(payload)
+
+
+def _on_terminate(connection):
+    print("⚠️  Token revocation listener disconnected; token cache paused")
+    cache.listening = False
+    cache.clear()
+
+
+_listener = None
+_listener_task = None
+
+
+async def start_listener(connect, retry_seconds: float = 5):
+    """LISTEN for revocations on a dedicated connection from `await connect()`, reconnecting as needed."""
+    global _listener_task
+
+    async def run():
+        global _listener
+        while True:
+            if _listener is None or _listener.is_closed():
+                try:
+                    _listener = await connect()
+                    _listener.add_termination_listener(_on_terminate)
+                    await _listener.add_listener(CHANNEL, _on_notification)
+                    # A token revoked while we were not listening may still be cached
+                    cache.clear()
+                    cache.listening = True
+                except Exception as e:
+                    cache.listening = False
+                    print(f"⚠️  Token revocation listener could not connect: {e}")
+            await asyncio.sleep(retry_seconds)
+
+    cache.listening = False
+    _listener_task = asyncio.create_task(run())
+
+
+async def stop_listener():
+    global _listener, _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        _listener_task = None
+    if _listener is not None and not _listener.is_closed():
+        _listener.remove_termination_listener(_on_terminate)
+        await _listener.close()
+    _listener = None
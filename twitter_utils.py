@@ -3,6 +3,8 @@ import time
 import requests
 from dotenv import load_dotenv
 
+import http_client
+
 load_dotenv()
 
 # Kie.ai Gemini 2.5 Flash (https://docs.kie.ai/market/gemini/gemini-2.5-flash)
@@ -60,7 +62,7 @@ Generate ONLY the caption text, nothing else."""
     last_error = None
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(KIE_CHAT_URL, headers=headers, json=data, timeout=60)
+            response = http_client.post(KIE_CHAT_URL, headers=headers, json=data, timeout=(http_client.CONNECT_TIMEOUT, 60))
             response.raise_for_status()
             result = response.json()
         except requests.RequestException as e:
@@ -135,7 +137,7 @@ def post_to_twitter(image_url: str, caption: str):
         )
 
         # 1) Download image and upload via v1.1 (media upload is allowed on limited access)
-        resp = requests.get(image_url, timeout=30)
+        resp = http_client.get(image_url, timeout=30)
         resp.raise_for_status()
         suffix = ".jpg"
         if "png" in (image_url or "").lower():
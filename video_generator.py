@@ -10,10 +10,14 @@ import requests
 import time
 from dotenv import load_dotenv
 
+import http_client
+import kie_callbacks
+import task_poller
+
 load_dotenv()
 
 # API Configuration
-VEO_API_BASE = "https://api.kie.ai"
+VEO_API_BASE = os.getenv("KIE_API_BASE", "https://api.kie.ai").rstrip("/")
 VEO_GENERATE_URL = f"{VEO_API_BASE}/api/v1/veo/generate"
 VEO_STATUS_URL = f"{VEO_API_BASE}/api/v1/veo/record-info"
 
@@ -114,6 +118,9 @@ def start_video_generation(product_image_url: str, brand_data: dict,
         "generationType": "FIRST_AND_LAST_FRAMES_2_VIDEO",
         "enableTranslation": True
     }
+    callback = kie_callbacks.callback_url("video")
+    if callback:
+        payload["callBackUrl"] = callback
     
     print(f"🎬 Starting video generation with Veo 3.1...")
     print(f"📸 Product image: {product_image_url}")
@@ -121,7 +128,7 @@ def start_video_generation(product_image_url: str, brand_data: dict,
     print(f"📝 Prompt: {prompt[:150]}...")
     
     try:
-        response = requests.post(VEO_GENERATE_URL, headers=headers, json=payload, timeout=30)
+        response = http_client.post(VEO_GENERATE_URL, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
         
         result = response.json()
@@ -185,7 +192,7 @@ def check_video_status(task_id: str) -> dict:
     }
     
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{VEO_STATUS_URL}?taskId={task_id}",
             headers=headers,
             timeout=30
@@ -262,8 +269,8 @@ def generate_video_with_polling(product_image_url: str, brand_data: dict,
     Generate a video and wait for completion (blocking).
     
     This is a convenience function that starts generation and polls until complete.
-    For API endpoints, prefer using start_video_generation() + check_video_status()
-    for non-blocking operation.
+    For API endpoints, prefer start_video_generation() and let the task poller
+    and video reconciler follow the task (non-blocking).
     
     Args:
         product_image_url: Public URL of the product image
@@ -290,6 +297,27 @@ def generate_video_with_polling(product_image_url: str, brand_data: dict,
     task_id = start_result['task_id']
     prompt = start_result['prompt']
     
+    # Let the shared task poller check the task when one runs in this process
+    if task_poller.poller.track(task_id, "video", model):
+        pushed = kie_callbacks.waiters.wait(task_id, max_wait_seconds)
+        task_poller.poller.done(task_id, completed=pushed is not None)
+        if pushed is None:
+            return {
+                'success': False,
+                'error': f'Video generation timed out after {max_wait_seconds} seconds',
+                'task_id': task_id,
+                'prompt': prompt
+            }
+        if pushed['state'] != 'success':
+            return {'success': False, 'error': pushed['error'], 'task_id': task_id, 'prompt': prompt}
+        return {
+            'success': True,
+            'video_url': pushed['urls'][0],
+            'task_id': task_id,
+            'prompt': prompt,
+            'resolution': pushed.get('resolution')
+        }
+    
     # Poll for completion
     start_time = time.time()
     attempt = 0
@@ -0,0 +1,152 @@
+"""
+Background reconciler for ugc_video rows still 'generating'.
+
+Every VIDEO_RECONCILE_INTERVAL seconds (and once at startup) it pages
+through those rows, VIDEO_RECONCILE_BATCH at a time in id order, and:
+
+- hands every task to the task poller (task_poller.py), which skips
+  the ones it already tracks. This picks up videos started by another
+  API process or before a restart, whether or not anyone asks about
+  them. Each task is scheduled from the row's started_at;
+- gives tasks older than VIDEO_TASK_EXPIRY seconds one last status
+  check, at most VIDEO_RECONCILE_CONCURRENCY at a time. Tasks Kie.ai
+  still reports as running are marked failed. When the check itself
+  fails (Kie.ai down, timeouts) the row stays 'generating' for the next
+  round, until the task is VIDEO_TASK_ERROR_GRACE seconds past expiry.
+
+Ages count from the row's started_at, or created_at for rows without one.
+
+Results reach the row through finish(), which the poller and the Kie.ai
+callback route share, so /video-status only reads the database. On
+Postgres one API process at a time runs a round (advisory lock).
+"""
+
+import asyncio
+import os
+from datetime import datetime
+
+import async_database as adb
+from task_poller import poller
+
+INTERVAL = float(os.getenv("VIDEO_RECONCILE_INTERVAL", "60"))
+BATCH = int(os.getenv("VIDEO_RECONCILE_BATCH", "100"))
+CONCURRENCY = int(os.getenv("VIDEO_RECONCILE_CONCURRENCY", "4"))
+EXPIRY = float(os.getenv("VIDEO_TASK_EXPIRY", str(3 * 3600)))
+ERROR_GRACE = float(os.getenv("VIDEO_TASK_ERROR_GRACE", str(24 * 3600)))
+
+# Arbitrary constant: one reconciler round at a time across API processes
+RECONCILE_LOCK_ID = 72_310_002
+
+
+class VideoReconciler:
+    """Moves generating videos to completed / failed without clients polling."""
+
+    def __init__(self, store):
+        self.store = store
+        self._runner = None
+        self.rounds = 0
+        self.handed_over = 0
+        self.finished = 0
+        self.expired = 0
+        self.check_errors = 0
+
+    async def finish(self, result: dict):
+        """Record a finished Veo task (normalised result, see kie_callbacks) on its ugc_video row.
+
+        Results only come from Kie.ai (callbacks, status checks), so 'fail' is a provider-reported failure.
+        """
+        task_info = await self.store.get_video_task_by_provider_id(result['task_id'])
+        if not task_info or task_info['status'] != 'generating':
+            return
+        if result['state'] == 'success':
+            await self.store.update_video_generation_status(
+                task_info['content_id'], 'completed', result['urls'][0], result.get('resolution')
+            )
+        else:
+            print(f"❌ Video generation failed: {result['error']}")
+            await self.store.update_video_generation_status(task_info['content_id'], 'failed')
+        self.finished += 1
+
+    async def _final_check(self, task: dict, age: float, limit: asyncio.Semaphore):
+        # From here on the reconciler checks the task once per round
+        poller.done(task['video_task_id'], completed=False)
+        async with limit:
+            try:
+                result = await poller.status("video", task['video_task_id'])
+            except Exception as e:
+                if age < EXPIRY + ERROR_GRACE:
+                    print(f"⚠️  Final status check for video task {task['video_task_id']} failed, "
+                          f"retrying next round: {e}")
+                    self.check_errors += 1
+                    return
+                print(f"⚠️  Final status check for video task {task['video_task_id']} failed: {e}")
+                result = None
+        if result is not None:
+            await self.finish(result)
+            return
+        print(f"⚠️  Video {task['content_id']} expired after {age:.0f}s in 'generating'")
+        await self.store.update_video_generation_status(task['content_id'], 'failed')
+        self.expired += 1
+
+    async def _round(self):
+        now = datetime.now()
+        limit = asyncio.Semaphore(CONCURRENCY)
+        after = 0
+        while True:
+            tasks = await self.store.get_generating_video_tasks(after, BATCH)
+            if not tasks:
+                break
+            after = tasks[-1]['content_id']
+            stale = []  # (task, age)
+            for task in tasks:
+                if not task['video_task_id']:
+                    continue
+                started = task['started_at'] or task['created_at']
+                # Rows with neither are past expiry and past the error grace
+                age = (now - started).total_seconds() if started else EXPIRY + ERROR_GRACE
+                if age >= EXPIRY:
+                    stale.append((task, age))
+                elif not poller.tracking(task['video_task_id']) and poller.track(
+                        task['video_task_id'], "video", task['model'], on_done=self.finish, age=age):
+                    self.handed_over += 1
+            await asyncio.gather(*(self._final_check(task, age, limit) for task, age in stale))
+            if len(tasks) < BATCH:
+                break
+        self.rounds += 1
+
+    async def run_once(self):
+        """One round; on Postgres skipped while another process holds the round."""
+        if self.store.name != "postgres":
+            return await self._round()
+        pool = await adb.get_pool()
+        async with pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", RECONCILE_LOCK_ID):
+                return
+            try:
+                await self._round()
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", RECONCILE_LOCK_ID)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"❌ Video reconciler round failed: {e}")
+            await asyncio.sleep(INTERVAL)
+
+    async def start(self):
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def stats(self):
+        return {"interval_s": INTERVAL, "rounds": self.rounds, "handed_over": self.handed_over,
+                "finished": self.finished, "expired": self.expired, "check_errors": self.check_errors}
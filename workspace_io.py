@@ -0,0 +1,313 @@
+"""
+Streaming export and COPY-based import of one workspace (conversation_id).
+
+Export writes NDJSON: a header line, then one line per row,
+
+    {"format": "brandpilot-workspace", "version": 1, "conversation_id": "...", "exported_at": "..."}
+    {"table": "brands", "row": {"id": 12, "conversation_id": "...", ...}}
+
+covering the tables from setup_database() in dependency order. Rows are
+serialized by Postgres (row_to_json) and read through a server-side
+cursor inside one REPEATABLE READ transaction, so the export is a
+consistent snapshot and memory stays constant however big it is.
+
+Import COPYs the lines into a temporary staging table, then inserts each
+table with INSERT ... SELECT jsonb_populate_record(...). Every row gets a
+new id and foreign keys (brand_id, content_id) are remapped, so a
+workspace can be loaded into another database, or under another
+conversation_id, without id clashes. The target must be empty unless
+replace=True, which deletes its current data first. It all runs in one
+transaction.
+
+Usage:
+    python workspace_io.py export <conversation_id> [file]
+    python workspace_io.py import <file> [--conversation-id ID] [--replace]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+
+import asyncpg
+
+import async_database as adb
+import brand_cache
+
+FORMAT = "brandpilot-workspace"
+VERSION = 1
+
+EXPORT_CHUNK_ROWS = 500
+IMPORT_BATCH_LINES = 10_000
+# Per-statement timeout for imports; the pool's command timeout is too short for millions of rows
+IMPORT_TIMEOUT = float(os.getenv("WORKSPACE_IMPORT_TIMEOUT", "3600"))
+
+# (table, export query); $1 is the conversation_id
+EXPORT_QUERIES = [
+    ("conversations", "SELECT row_to_json(t)::text FROM conversations t WHERE t.conversation_id = $1"),
+    ("brands", "SELECT row_to_json(t)::text FROM brands t WHERE t.conversation_id = $1 ORDER BY t.id"),
+    ("brand_colors", """
+        SELECT row_to_json(t)::text FROM brand_colors t
+        JOIN brands b ON b.id = t.brand_id
+        WHERE b.conversation_id = $1 ORDER BY t.id
+    """),
+    ("brand_social_links", """
+        SELECT row_to_json(t)::text FROM brand_social_links t
+        JOIN brands b ON b.id = t.brand_id
+        WHERE b.conversation_id = $1 ORDER BY t.id
+    """),
+    ("generated_content",
+     "SELECT row_to_json(t)::text FROM generated_content t WHERE t.conversation_id = $1 ORDER BY t.id"),
+    ("scheduled_posts",
+     "SELECT row_to_json(t)::text FROM scheduled_posts t WHERE t.conversation_id = $1 ORDER BY t.id"),
+    ("messages", """
+        SELECT row_to_json(t)::text FROM messages t
+        WHERE t.conversation_id = $1 ORDER BY t.created_at, t.id
+    """),
+    ("conversation_x_accounts",
+     "SELECT row_to_json(t)::text FROM conversation_x_accounts t WHERE t.conversation_id = $1"),
+]
+
+# Import order and the foreign keys to remap: {column: referenced table}
+IMPORT_TABLES = [
+    ("brands", {}),
+    ("brand_colors", {"brand_id": "brands"}),
+    ("brand_social_links", {"brand_id": "brands"}),
+    ("generated_content", {"brand_id": "brands"}),
+    ("scheduled_posts", {"content_id": "generated_content"}),
+    ("messages", {}),
+    ("conversation_x_accounts", {}),
+]
+REFERENCED_TABLES = ("brands", "generated_content")
+CONVERSATION_TABLES = ("brands", "generated_content", "scheduled_posts", "messages", "conversation_x_accounts")
+
+
+class InvalidWorkspaceFile(ValueError):
+    """The import file is not a workspace export this version can read."""
+
+
+class WorkspaceNotEmpty(ValueError):
+    """The target conversation already has data and replace was not requested."""
+
+
+async def export_workspace(conversation_id: str, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the workspace as NDJSON, `chunk_rows` lines per bytes chunk."""
+    pool = await adb.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            header = {"format": FORMAT, "version": VERSION, "conversation_id": conversation_id,
+                      "exported_at": datetime.now().isoformat()}
+            yield (json.dumps(header) + "\n").encode()
+            for table, sql in EXPORT_QUERIES:
+                prefix = f'{{"table": "{table}", "row": '
+                lines = []
+                async for (row,) in conn.cursor(sql, conversation_id, prefetch=chunk_rows):
+                    lines.append(prefix + row + "}\n")
+                    if len(lines) >= chunk_rows:
+                        yield "".join(lines).encode()
+                        lines = []
+                if lines:
+                    yield "".join(lines).encode()
+
+
+async def iter_lines(read, chunk_size: int = 1 << 20):
+    """Split the byte chunks returned by `await read(chunk_size)` into lines."""
+    pending = b""
+    while True:
+        chunk = await read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _check_header(line: bytes) -> dict:
+    try:
+        header = json.loads(line)
+    except ValueError:
+        raise InvalidWorkspaceFile("First line is not a workspace export header")
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise InvalidWorkspaceFile("First line is not a workspace export header")
+    if header.get("version") != VERSION:
+        raise InvalidWorkspaceFile(f"Unsupported workspace export version {header.get('version')}")
+    return header
+
+
+async def _clear_workspace(conn, conversation_id: str, timeout: float = None):
+    # Children (colors, links, scheduled posts) go with their parents via ON DELETE CASCADE
+    for table in ("scheduled_posts", "generated_content", "brands", "messages", "conversation_x_accounts"):
+        await conn.execute(f"DELETE FROM {table} WHERE conversation_id = $1", conversation_id, timeout=timeout)
+
+
+async def _insert_table(conn, table: str, foreign_keys: dict, conversation_id: str) -> int:
+    columns = [row["attname"] for row in await conn.fetch("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """, table)]
+    values = {column: f"p.{column}" for column in columns}
+    joins = ""
+    if table in REFERENCED_TABLES:
+        values["id"] = "m.new_id"
+        joins += f" JOIN import_ids m ON m.tbl = '{table}' AND m.old_id = p.id"
+    else:
+        values["id"] = f"nextval(pg_get_serial_sequence('{table}', 'id'))"
+    if table in CONVERSATION_TABLES:
+        values["conversation_id"] = "$1::text"
+    for i, (column, referenced) in enumerate(foreign_keys.items()):
+        # Unmatched references (rows outside the export) become NULL
+        joins += f" LEFT JOIN import_ids f{i} ON f{i}.tbl = '{referenced}' AND f{i}.old_id = p.{column}"
+        values[column] = f"f{i}.new_id"
+    status = await conn.execute(f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(values[column] for column in columns)}
+        FROM import_rows r
+        CROSS JOIN LATERAL jsonb_populate_record(NULL::{table}, r.row) p{joins}
+        WHERE r.tbl = '{table}'
+    """, *([conversation_id] if table in CONVERSATION_TABLES else []), timeout=IMPORT_TIMEOUT)
+    return int(status.split()[-1])
+
+
+async def import_workspace(lines, conversation_id: str = None, replace: bool = False) -> dict:
+    """Load an export from the async iterator `lines` (bytes or str, one JSON document each).
+
+    Imports under `conversation_id` (default: the one in the header).
+    Returns the number of rows inserted per table.
+    """
+    header = None
+    pool = await adb.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("CREATE TEMP TABLE import_lines (line text) ON COMMIT DROP")
+            batch = []
+            async for line in lines:
+                if isinstance(line, bytes):
+                    line = line.decode()
+                line = line.strip()
+                if not line:
+                    continue
+                if header is None:
+                    header = _check_header(line)
+                    continue
+                batch.append((line,))
+                if len(batch) >= IMPORT_BATCH_LINES:
+                    await conn.copy_records_to_table("import_lines", records=batch, columns=["line"],
+                                                    timeout=IMPORT_TIMEOUT)
+                    batch = []
+            if batch:
+                await conn.copy_records_to_table("import_lines", records=batch, columns=["line"],
+                                                 timeout=IMPORT_TIMEOUT)
+            if header is None:
+                raise InvalidWorkspaceFile("Empty workspace export")
+            conversation_id = conversation_id or header["conversation_id"]
+
+            try:
+                await conn.execute("""
+                    CREATE TEMP TABLE import_rows ON COMMIT DROP AS
+                    SELECT l->>'table' AS tbl, l->'row' AS row
+                    FROM (SELECT line::jsonb AS l FROM import_lines) s
+                """, timeout=IMPORT_TIMEOUT)
+            except asyncpg.exceptions.DataError as e:
+                raise InvalidWorkspaceFile(f"Malformed line in workspace export: {e}")
+            await conn.execute("DROP TABLE import_lines")
+            await conn.execute("ANALYZE import_rows")
+
+            if replace:
+                await _clear_workspace(conn, conversation_id, timeout=IMPORT_TIMEOUT)
+            else:
+                existing = await conn.fetchval("""
+                    SELECT EXISTS (SELECT 1 FROM brands WHERE conversation_id = $1)
+                        OR EXISTS (SELECT 1 FROM generated_content WHERE conversation_id = $1)
+                        OR EXISTS (SELECT 1 FROM messages WHERE conversation_id = $1)
+                """, conversation_id)
+                if existing:
+                    raise WorkspaceNotEmpty(f"Workspace {conversation_id} already has data")
+
+            counts = {}
+            status = await conn.execute("""
+                INSERT INTO conversations (conversation_id, started_at, last_message_at, status)
+                SELECT $1, (r.row->>'started_at')::timestamp, (r.row->>'last_message_at')::timestamp,
+                       COALESCE(r.row->>'status', 'active')
+                FROM import_rows r
+                WHERE r.tbl = 'conversations'
+                LIMIT 1
+                ON CONFLICT (conversation_id) DO UPDATE SET
+                    last_message_at = GREATEST(conversations.last_message_at, EXCLUDED.last_message_at)
+            """, conversation_id)
+            counts["conversations"] = int(status.split()[-1])
+            await conn.execute("""
+                INSERT INTO conversations (conversation_id, started_at, last_message_at)
+                VALUES ($1, now(), now())
+                ON CONFLICT (conversation_id) DO NOTHING
+            """, conversation_id)
+
+            await conn.execute("""
+                CREATE TEMP TABLE import_ids ON COMMIT DROP AS
+                SELECT tbl, (row->>'id')::int AS old_id,
+                       nextval(pg_get_serial_sequence(tbl, 'id'))::int AS new_id
+                FROM import_rows
+                WHERE tbl = ANY($1::text[])
+            """, list(REFERENCED_TABLES))
+            await conn.execute("CREATE INDEX ON import_ids (tbl, old_id)")
+            await conn.execute("ANALYZE import_ids")
+
+            for table, foreign_keys in IMPORT_TABLES:
+                counts[table] = await _insert_table(conn, table, foreign_keys, conversation_id)
+            await brand_cache.notify(conn, conversation_id)
+    brand_cache.invalidate(conversation_id)
+    return counts
+
+
+async def _export_to(conversation_id: str, path: str = None):
+    out = open(path, "wb") if path else sys.stdout.buffer
+    rows = 0
+    try:
+        async for chunk in export_workspace(conversation_id):
+            out.write(chunk)
+            rows += chunk.count(b"\n")
+    finally:
+        if path:
+            out.close()
+    print(f"✅ Exported {rows - 1:,} rows for {conversation_id}", file=sys.stderr)
+
+
+async def _import_from(path: str, conversation_id: str = None, replace: bool = False):
+    with open(path, "rb") as f:
+        async def read(size):
+            return f.read(size)
+        counts = await import_workspace(iter_lines(read), conversation_id, replace)
+    for table, count in counts.items():
+        print(f"  {table:<24} {count:>12,}")
+    print(f"✅ Imported {sum(counts.values()):,} rows")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export")
+    export.add_argument("conversation_id")
+    export.add_argument("file", nargs="?")
+    load = commands.add_parser("import")
+    load.add_argument("file")
+    load.add_argument("--conversation-id")
+    load.add_argument("--replace", action="store_true")
+    args = parser.parse_args()
+
+    await adb.init_pool()
+    try:
+        if args.command == "export":
+            await _export_to(args.conversation_id, args.file)
+        else:
+            await _import_from(args.file, args.conversation_id, args.replace)
+    finally:
+        await adb.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())